@@ -0,0 +1,67 @@
+"""Benchmark de recall@k y latencia: búsqueda IVF aproximada vs búsqueda exacta.
+
+Uso:
+    python benchmarks/ann_recall.py --rows 20000 --dim 256 --k 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.domain.entities import Insight
+from src.infrastructure.local_vector_db import LocalVectorDatabase
+
+def clustered_vectors(rng, rows, dim, clusters=64):
+    """Vectores sintéticos agrupados por temas, parecidos a embeddings de noticias."""
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=rows)
+    return centers[labels] + 0.6 * rng.normal(size=(rows, dim)).astype(np.float32)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    vectors = clustered_vectors(rng, args.rows, args.dim)
+    queries = clustered_vectors(rng, args.queries, args.dim)
+    insights = [Insight(title=str(i), content="", category="bench", url=f"bench://{i}", embedding=v) for i, v in enumerate(vectors)]
+
+    with tempfile.TemporaryDirectory() as exact_dir, tempfile.TemporaryDirectory() as ivf_dir:
+        exact = LocalVectorDatabase(directory=exact_dir, index_mode="exact")
+        exact.insert_insights(insights)
+
+        ann = LocalVectorDatabase(directory=ivf_dir, index_mode="ivf")
+        ann.insert_insights(insights)
+        start = time.perf_counter()
+        ann.rebuild()
+        print(f"Filas: {args.rows} | dim: {args.dim} | reconstrucción IVF: {time.perf_counter() - start:.2f}s")
+
+        def run(db, **kwargs):
+            ids, latencies = [], []
+            for q in queries:
+                t0 = time.perf_counter()
+                results = db.search_insights(q.tolist(), threshold=-1.0, count=args.k, **kwargs)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                ids.append({r.id for r in results})
+            return ids, float(np.median(latencies))
+
+        truth, exact_ms = run(exact)
+        print(f"{'modo':<12}{'recall@' + str(args.k):>12}{'p50 ms':>10}")
+        print(f"{'exacto':<12}{1.0:>12.3f}{exact_ms:>10.2f}")
+        for nprobe in args.nprobe:
+            found, ms = run(ann, nprobe=nprobe)
+            recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth) if t])
+            print(f"{'nprobe=' + str(nprobe):<12}{recall:>12.3f}{ms:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Dobles locales y deterministas de los servicios externos para los benchmarks.
+
+Cada doble simula la latencia de red (media + jitter) y una tasa de fallos configurable, y cuenta
+cuántas llamadas recibe. La decisión de fallar y el jitter dependen de un hash de la entrada, así
+que dos ejecuciones con la misma configuración hacen exactamente el mismo trabajo.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from src.domain.entities import Insight, WriteReport
+from src.domain.interfaces import EmbeddingService, LLMService, VectorDatabase
+from src.infrastructure.embeddings import pack_batches
+
+@dataclass
+class ServiceProfile:
+    latency_ms: float = 0.0
+    jitter: float = 0.2
+    failure_rate: float = 0.0
+
+def _unit(key: str) -> float:
+    """Número en [0, 1) derivado de `key` de forma estable."""
+    return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "big") / 2**64
+
+class _FakeService:
+    def __init__(self, profile: Optional[ServiceProfile] = None):
+        self.profile = profile or ServiceProfile()
+        self.calls = Counter()
+        self._calls_lock = threading.Lock()
+
+    def _call(self, method: str, key: str, units: int = 1) -> None:
+        with self._calls_lock:
+            self.calls[method] += 1
+        if self.profile.latency_ms:
+            # La latencia crece de forma sublineal con el tamaño del lote, como en una API real
+            scale = 1.0 + 0.1 * (units - 1)
+            time.sleep(self.profile.latency_ms * scale * (1 + self.profile.jitter * (2 * _unit("lat" + key) - 1)) / 1000)
+        if self.profile.failure_rate and _unit("fail" + key) < self.profile.failure_rate:
+            raise RuntimeError(f"500 INTERNAL (fallo simulado en {method})")
+
+class FakeDataProvider(_FakeService):
+    """Sustituye a DataProvider: `articles` noticias sintéticas repartidas en páginas.
+
+    Con `duplicate_rate` una fracción de las noticias republica el cuerpo de la anterior con otra URL
+    y una línea añadida, como las actualizaciones en vivo del Guardian.
+    """
+
+    TOPICS = ["inflation", "chips", "ai", "energy", "banks", "crypto", "housing", "trade"]
+    VOCABULARY = [f"term{k}" for k in range(400)]
+    BODY_WORDS = 200
+
+    def __init__(self, articles: int, page_size: int = 50, duplicate_rate: float = 0.0, profile: Optional[ServiceProfile] = None):
+        super().__init__(profile)
+        self.articles = articles
+        self.page_size = page_size
+        self.duplicate_rate = duplicate_rate
+
+    def _body(self, i: int) -> str:
+        if i > 0 and self.duplicate_rate and _unit(f"dup{i}") < self.duplicate_rate:
+            return self._body(i - 1) + " Updated with the latest figures."
+        topic = self.TOPICS[i % len(self.TOPICS)]
+        words = np.random.default_rng(i).choice(self.VOCABULARY, size=self.BODY_WORDS)
+        return f"Article about {topic} and the global economy. " + " ".join(words)
+
+    def iter_articles(self, since: Optional[datetime] = None, on_error: Optional[Callable[[Exception], None]] = None) -> Iterator[dict]:
+        base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        for start in range(0, self.articles, self.page_size):
+            try:
+                self._call("fetch_page", f"page{start}")
+            except Exception as e:
+                if on_error:
+                    on_error(e)
+                continue
+            for i in range(start, min(start + self.page_size, self.articles)):
+                topic = self.TOPICS[i % len(self.TOPICS)]
+                modified = (base + timedelta(minutes=i)).isoformat()
+                yield {
+                    "title": f"{topic.title()} update {i}",
+                    "content": self._body(i),
+                    "category": "Business",
+                    "url": f"bench://article/{i}",
+                    "published_at": modified,
+                    "last_modified": modified,
+                }
+
+class FakeEmbeddingService(_FakeService, EmbeddingService):
+    """Embeddings pseudoaleatorios derivados del texto (mismo texto -> mismo vector)."""
+
+    def __init__(self, dim: int = 768, batch_size: int = 100, batch_max_tokens: int = 16000, profile: Optional[ServiceProfile] = None):
+        super().__init__(profile)
+        self.dim = dim
+        self.batch_size = batch_size
+        self.batch_max_tokens = batch_max_tokens
+        self.model_name = "fake-embedding"
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        return np.random.default_rng(seed).normal(size=self.dim).astype(np.float32).tolist()
+
+    def generate_embedding(self, text: str, task_type: str = "RETRIEVAL_DOCUMENT") -> List[float]:
+        self._call("embed", text)
+        return self._vector(text)
+
+    def generate_embeddings(self, texts: List[str], task_type: str = "RETRIEVAL_DOCUMENT") -> List[Optional[List[float]]]:
+        embeddings = []
+        for _, batch in pack_batches(texts, self.batch_size, self.batch_max_tokens):
+            try:
+                self._call("embed_batch", batch[0], units=len(batch))
+                embeddings.extend(self._vector(t) for t in batch)
+            except Exception:
+                # Igual que GeminiEmbeddingService: si el lote falla se reintenta ítem por ítem
+                for text in batch:
+                    try:
+                        embeddings.append(self.generate_embedding(text, task_type))
+                    except Exception:
+                        embeddings.append(None)
+        return embeddings
+
+class FakeVectorDatabase(_FakeService, VectorDatabase):
+    """Base vectorial en memoria con búsqueda exacta por coseno."""
+
+    def __init__(self, profile: Optional[ServiceProfile] = None):
+        super().__init__(profile)
+        self._insights: List[Insight] = []
+        self._vectors: List[np.ndarray] = []
+        self._urls = set()
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return len(self._insights)
+
+    def insert_insights(self, insights: List[Insight]) -> None:
+        self._call("insert", insights[0].url if insights else "", units=len(insights))
+        with self._lock:
+            for insight in insights:
+                self._vectors.append(self._unit_vector(insight))
+                self._insights.append(self._stored(insight, len(self._insights) + 1))
+                self._urls.add(insight.url)
+
+    def update_insights(self, insights: List[Insight]) -> WriteReport:
+        self._call("update", insights[0].url if insights else "", units=len(insights))
+        with self._lock:
+            rows = {insight.url: row for row, insight in enumerate(self._insights)}
+            existing = [i for i in insights if i.url in rows]
+            for insight in existing:
+                row = rows[insight.url]
+                self._vectors[row] = self._unit_vector(insight)
+                self._insights[row] = self._stored(insight, row + 1)
+        new = [i for i in insights if i.url not in rows]
+        if new:
+            self.insert_insights(new)
+        return WriteReport(inserted=len(new), updated=len(existing))
+
+    @staticmethod
+    def _unit_vector(insight: Insight) -> np.ndarray:
+        vector = np.asarray(insight.embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    @staticmethod
+    def _stored(insight: Insight, row_id: int) -> Insight:
+        # Sin embedding: como las filas que devuelve la base real
+        return Insight(insight.title, insight.content, insight.category, insight.url, id=row_id, content_hash=insight.content_hash)
+
+    def search_insights(self, query_embedding: List[float], threshold: float = 0.5, count: int = 5) -> List[Insight]:
+        self._call("search", str(query_embedding[:4]))
+        with self._lock:
+            if not self._vectors:
+                return []
+            matrix = np.stack(self._vectors)
+            insights = list(self._insights)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        scores = matrix @ (query / (np.linalg.norm(query) or 1.0))
+        top = np.argsort(-scores)[:count]
+        return [insights[i] for i in top if scores[i] > threshold]
+
+    def get_existing_urls(self, urls: List[str]) -> List[str]:
+        self._call("get_existing_urls", urls[0] if urls else "")
+        with self._lock:
+            return [url for url in urls if url in self._urls]
+
+    def get_content_hashes(self, urls: List[str]) -> Dict[str, Optional[str]]:
+        self._call("get_content_hashes", urls[0] if urls else "")
+        with self._lock:
+            hashes = {i.url: i.content_hash for i in self._insights}
+        return {url: hashes[url] for url in urls if url in hashes}
+
+    def list_urls(self) -> List[str]:
+        self._call("list_urls", "")
+        with self._lock:
+            return list(self._urls)
+
+    def list_insights(self) -> Iterator[Insight]:
+        self._call("list_insights", "")
+        with self._lock:
+            return iter(list(self._insights))
+
+    def get_insight(self, url: str) -> Optional[Insight]:
+        self._call("get_insight", url)
+        with self._lock:
+            return next((i for i in self._insights if i.url == url), None)
+
+class FakeLLMService(_FakeService, LLMService):
+    """Respuestas fijas con la latencia de una generación."""
+
+    def __init__(self, profile: Optional[ServiceProfile] = None):
+        super().__init__(profile)
+        self.model_name = "fake-llm"
+
+    def generate_summary(self, texts: List[str]) -> str:
+        self._call("generate_summary", str(len(texts)), units=len(texts))
+        return f"Resumen sintético de {len(texts)} noticias."
+
+    def summarize_article(self, title: str, content: str) -> str:
+        self._call("summarize_article", title)
+        return content[:200]
+
+    def summarize_articles(self, articles: List[Tuple[str, str]]) -> List[Optional[str]]:
+        # Como GeminiLLMService: una sola generación por lote de artículos
+        self._call("summarize_articles", articles[0][0] if articles else "", units=len(articles))
+        return [content[:200] for _, content in articles]
+
+    def explain_relevance(self, query: str, insights: List[Insight]) -> List[str]:
+        self._call("explain_relevance", query, units=len(insights))
+        return [f"Relacionado con '{query}'." for _ in insights]
@@ -0,0 +1,81 @@
+"""Benchmark de memoria, recall@k y latencia: índice local float32 vs copias int8/float16.
+
+Uso:
+    python benchmarks/quantization.py --rows 20000 --dim 768 --k 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.config.settings import settings
+from src.domain.entities import Insight
+from src.infrastructure.local_vector_db import LocalVectorDatabase
+
+sys.path.append(os.path.dirname(__file__))
+from ann_recall import clustered_vectors
+
+def list_bytes(dim):
+    """Memoria de un embedding como List[float] de Python: la lista más un objeto float por posición."""
+    sample = [float(i) + 0.5 for i in range(dim)]
+    return sys.getsizeof(sample) + sum(sys.getsizeof(x) for x in sample)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, nargs="+", default=[1, 2, 4, 8], help="Valores de QUANT_RERANK_FACTOR")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    vectors = clustered_vectors(rng, args.rows, args.dim)
+    queries = clustered_vectors(rng, args.queries, args.dim)
+    insights = [Insight(title=str(i), content="", category="bench", url=f"bench://{i}", embedding=v) for i, v in enumerate(vectors)]
+
+    print(f"Filas: {args.rows} | dim: {args.dim}")
+    print(f"Embedding como List[float]: {list_bytes(args.dim) / args.dim:.1f} B/dim | float32: 4 B/dim | float16: 2 B/dim | int8: 1 B/dim (+4 B/fila de escala)")
+
+    def run(db):
+        ids, latencies = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            results = db.search_insights(q.tolist(), threshold=-1.0, count=args.k)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            ids.append({r.id for r in results})
+        return ids, float(np.median(latencies))
+
+    # Verdad de referencia por fuerza bruta sobre los vectores originales (ids = fila + 1)
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    truth = [set((np.argsort(-(normed @ (q / np.linalg.norm(q))))[:args.k] + 1).tolist()) for q in queries]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # index_mode="exact" explícito: con IVF todos los modos medirían además el sondeo aproximado.
+        # rebuild() aquí solo compacta la matriz para que "MB barrido" refleje las filas reales
+        exact = LocalVectorDatabase(directory=os.path.join(tmp, "none"), index_mode="exact", quantization="none")
+        exact.insert_insights(insights)
+        exact.rebuild()
+        found, exact_ms = run(exact)
+        exact_recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+
+        print(f"{'modo':<18}{'MB barrido':>12}{'recall@' + str(args.k):>12}{'p50 ms':>10}")
+        print(f"{'float32':<18}{exact._vectors.nbytes / 2**20:>12.1f}{exact_recall:>12.3f}{exact_ms:>10.2f}")
+        for mode in ("float16", "int8"):
+            db = LocalVectorDatabase(directory=os.path.join(tmp, mode), index_mode="exact", quantization=mode)
+            db.insert_insights(insights)
+            db.rebuild()
+            scan_mb = (db._quantized.nbytes + (db._scales.nbytes if db._scales is not None else 0)) / 2**20
+            for factor in args.rerank:
+                settings.QUANT_RERANK_FACTOR = factor
+                found, ms = run(db)
+                recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth) if t])
+                print(f"{mode + ' rerank x' + str(factor):<18}{scan_mb:>12.1f}{recall:>12.3f}{ms:>10.2f}")
+
+if __name__ == "__main__":
+    main()
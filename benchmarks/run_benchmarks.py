@@ -0,0 +1,183 @@
+"""Benchmark de extremo a extremo sin red: ingesta y búsqueda contra dobles locales (ver fakes.py).
+
+Mide artículos/s de la ingesta, latencias p50/p95/p99 de la búsqueda y llamadas por servicio
+externo, y guarda el resultado en JSON para comparar entre commits.
+
+Uso:
+    python benchmarks/run_benchmarks.py --articles 1000 --queries 200 --embed-latency-ms 80
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<commit>.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Optional
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.dirname(__file__))
+
+from src.config.settings import settings
+from src.application.pipeline import IngestionPipeline, SearchPipeline
+from src.infrastructure.kv_cache import SqliteKVCache
+from src.infrastructure.lexical_index import LexicalIndex
+from src.infrastructure.metrics import metrics
+from src.infrastructure.near_duplicates import NearDuplicateIndex
+from src.infrastructure.recent_articles import RecentArticleStore
+from src.infrastructure.state_store import StateStore
+from src.infrastructure.url_filter import UrlSeenFilter
+from fakes import FakeDataProvider, FakeEmbeddingService, FakeLLMService, FakeVectorDatabase, ServiceProfile
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def git_commit() -> Optional[str]:
+    """Commit corto de HEAD, o None fuera de un repositorio git (sin git, sin commits...)."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip() or None
+    except Exception:
+        return None
+
+def percentiles(latencies_ms):
+    if not latencies_ms:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+def run(args) -> dict:
+    provider = FakeDataProvider(args.articles, duplicate_rate=args.duplicate_rate,
+                                profile=ServiceProfile(args.fetch_latency_ms, failure_rate=args.fetch_failure_rate))
+    embeddings = FakeEmbeddingService(args.dim, profile=ServiceProfile(args.embed_latency_ms, failure_rate=args.embed_failure_rate))
+    database = FakeVectorDatabase(profile=ServiceProfile(args.db_latency_ms, failure_rate=args.db_failure_rate))
+    llm = FakeLLMService(profile=ServiceProfile(args.llm_latency_ms))
+
+    settings.SEARCH_MODE = args.search_mode
+    settings.INCREMENTAL_INGESTION = False
+    with tempfile.TemporaryDirectory() as tmp:
+        lexical = LexicalIndex(os.path.join(tmp, "lexical.sqlite3"))
+        kv_path = os.path.join(tmp, "kv.sqlite3")
+        ingest = IngestionPipeline(
+            embeddings, database, llm,
+            state_store=StateStore(os.path.join(tmp, "state.json")),
+            url_filter=UrlSeenFilter(os.path.join(tmp, "urls.bloom"), capacity=max(1000, args.articles * 2)),
+            summary_cache=SqliteKVCache(kv_path, "article_summaries"),
+            report_cache=SqliteKVCache(kv_path, "reports"),
+            lexical_index=lexical,
+            near_duplicate_index=NearDuplicateIndex(os.path.join(tmp, "near_dup.sqlite3")),
+            recent_articles=RecentArticleStore(os.path.join(tmp, "recent.sqlite3")),
+            data_provider=provider,
+        )
+
+        start = time.perf_counter()
+        try:
+            report = ingest.run_report()
+            ingest_error = None
+        except Exception as e:
+            report, ingest_error = None, str(e)
+        ingest_seconds = time.perf_counter() - start
+        ingest_run = metrics.last_run("ingestion")
+        ingest_calls = {"guardian": dict(provider.calls), "embedding": dict(embeddings.calls), "database": dict(database.calls), "llm": dict(llm.calls)}
+
+        search = SearchPipeline(embeddings, database, llm, lexical_index=lexical)
+        latencies, errors = [], 0
+        topics = FakeDataProvider.TOPICS
+        for i in range(args.queries):
+            # Consultas distintas: medimos búsquedas reales, no aciertos de la caché
+            query = f"{topics[i % len(topics)]} outlook {i}"
+            t0 = time.perf_counter()
+            try:
+                search.search(query, threshold=-1.0, count=5, explain=not args.lazy_explanations)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "ingest": {
+            "articles": args.articles,
+            "seconds": round(ingest_seconds, 3),
+            "articles_per_sec": round(args.articles / ingest_seconds, 1) if ingest_seconds else None,
+            "stored": database.count,
+            "near_duplicates": ingest_run.counters.get("ingest.near_duplicates", 0) if ingest_run else None,
+            "error": ingest_error,
+            "summary_from_cache": report.from_cache if report else None,
+            "calls": ingest_calls,
+            "stages": ingest_run.breakdown()["spans"] if ingest_run else {},
+        },
+        "search": {
+            "queries": args.queries,
+            "errors": errors,
+            "latency_ms": percentiles(latencies),
+        },
+        "calls": {"guardian": dict(provider.calls), "embedding": dict(embeddings.calls), "database": dict(database.calls), "llm": dict(llm.calls)},
+    }
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"\nComparación con {baseline['commit']} ({baseline['timestamp']}):")
+    rows = [("ingesta artículos/s", ("ingest", "articles_per_sec"), True)]
+    rows += [(f"búsqueda {p} ms", ("search", "latency_ms", p), False) for p in ("p50", "p95", "p99")]
+    for label, path, higher_is_better in rows:
+        old, new = baseline, current
+        for key in path:
+            old, new = (old or {}).get(key), (new or {}).get(key)
+        if old is None or new is None or not old:
+            continue
+        delta = (new - old) / old * 100
+        better = delta > 0 if higher_is_better else delta < 0
+        print(f"  {label:<22}{old:>10}{new:>10}  {delta:+.1f}% {'✅' if better else '⚠️' if abs(delta) > 5 else ''}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--search-mode", default="hybrid", choices=["vector", "hybrid", "lexical"])
+    parser.add_argument("--lazy-explanations", action="store_true", help="Buscar con explain=False")
+    parser.add_argument("--fetch-latency-ms", type=float, default=50)
+    parser.add_argument("--embed-latency-ms", type=float, default=80)
+    parser.add_argument("--db-latency-ms", type=float, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--duplicate-rate", type=float, default=0.0, help="Fracción de artículos republicados con otra URL")
+    parser.add_argument("--fetch-failure-rate", type=float, default=0.0)
+    parser.add_argument("--embed-failure-rate", type=float, default=0.0)
+    parser.add_argument("--db-failure-rate", type=float, default=0.0)
+    parser.add_argument("--output", default=None, help="Ruta del JSON (por defecto benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="JSON de una ejecución anterior para comparar")
+    args = parser.parse_args()
+
+    output, baseline_path = args.output, args.compare
+    del args.output, args.compare
+    # El nombre por defecto es el commit: sin él, dos ejecuciones distintas se pisarían en el mismo archivo
+    if output is None and git_commit() is None:
+        parser.error("no se pudo resolver el commit actual (git rev-parse HEAD); indique la ruta con --output")
+    result = run(args)
+
+    output = output or os.path.join(RESULTS_DIR, f"{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    ingest, search = result["ingest"], result["search"]
+    print(f"Ingesta: {ingest['articles']} artículos en {ingest['seconds']}s ({ingest['articles_per_sec']} art/s)")
+    if ingest["near_duplicates"]:
+        print(f"  {ingest['near_duplicates']} casi-duplicados enlazados sin vectorizar")
+    if ingest["error"]:
+        print(f"⚠️ La ingesta falló: {ingest['error']}")
+    print(f"Búsqueda ({search['queries']} consultas, {search['errors']} errores): {search['latency_ms']}")
+    for service, calls in result["calls"].items():
+        print(f"  {service:<10}{sum(calls.values()):>6} llamadas  {calls}")
+    print(f"Resultado guardado en {output}")
+
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+if __name__ == "__main__":
+    main()
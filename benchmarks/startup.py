@@ -0,0 +1,82 @@
+"""Benchmark de arranque en frío: importación de la aplicación y construcción perezosa de servicios.
+
+Cada muestra corre en un intérprete nuevo (sin módulos en caché de sys.modules) con claves falsas y el
+índice local en un directorio temporal, así que no hace red. Mide:
+  - import: `import src.application.services`
+  - registry: crear el ServiceRegistry
+  - search_ready: construir el pipeline de búsqueda (lo que paga el primer usuario del buscador)
+y lista los SDKs pesados que quedaron importados (deberían cargarse recién en la primera llamada).
+
+Uso:
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --max-import-ms 400   # sale con código 1 si el import empeora
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+HEAVY_MODULES = ("google.genai", "supabase", "streamlit")
+
+_CHILD = f"""
+import json, sys, time
+sys.path.insert(0, {ROOT!r})
+t0 = time.perf_counter()
+import src.application.services as services
+t1 = time.perf_counter()
+registry = services.ServiceRegistry()
+t2 = time.perf_counter()
+registry.search_pipeline
+t3 = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (t1 - t0) * 1000,
+    "registry_ms": (t2 - t1) * 1000,
+    "search_ready_ms": (t3 - t2) * 1000,
+    "built": registry.built(),
+    "heavy_modules": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+def sample(cache_dir: str) -> dict:
+    env = {
+        **os.environ,
+        "CACHE_DIR": cache_dir,
+        "VECTOR_BACKEND": "local",
+        "SUPABASE_URL": "https://bench.invalid",
+        "SUPABASE_KEY": "bench",
+        "GEMINI_API_KEY": "bench",
+        "GUARDIAN_API_KEY": "bench",
+    }
+    output = subprocess.check_output([sys.executable, "-c", _CHILD], env=env, cwd=ROOT, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+def measure(runs: int = 5) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        samples = [sample(tmp) for _ in range(runs)]
+    result = {key: round(statistics.median(s[key] for s in samples), 1) for key in ("import_ms", "registry_ms", "search_ready_ms")}
+    result["built"] = samples[-1]["built"]
+    result["heavy_modules"] = sorted({m for s in samples for m in s["heavy_modules"]})
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None, help="Umbral de regresión para el import")
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    print(f"Mediana de {args.runs} arranques en frío:")
+    print(f"  import servicios   {result['import_ms']:>8} ms")
+    print(f"  crear registro     {result['registry_ms']:>8} ms")
+    print(f"  buscador listo     {result['search_ready_ms']:>8} ms  (construidos: {', '.join(result['built'])})")
+    print(f"  SDKs importados    {', '.join(result['heavy_modules']) or 'ninguno'}")
+    if args.max_import_ms is not None and result["import_ms"] > args.max_import_ms:
+        print(f"⚠️ El import supera el umbral de {args.max_import_ms} ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
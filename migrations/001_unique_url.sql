@@ -0,0 +1,12 @@
+-- 001: índice único sobre tech_insights.url
+-- La ingesta escribe con upsert(on_conflict="url"): PostgREST necesita un índice o restricción única
+-- sobre esa columna, si no cada tramo del upsert falla.
+
+-- 1. Eliminar duplicados existentes por url (se conserva la fila más antigua, la de menor id)
+delete from tech_insights a
+using tech_insights b
+where a.url = b.url
+  and a.id > b.id;
+
+-- 2. Índice único (las filas sin url siguen permitidas: NULL no choca con NULL)
+create unique index if not exists tech_insights_url_key on tech_insights (url);
@@ -0,0 +1,14 @@
+-- 002: columna content_hash en tech_insights
+-- La ingesta guarda el hash del texto de cada noticia para detectar ediciones sin volver a descargar
+-- el contenido. Sin esta columna la app sigue funcionando (la omite al escribir), pero cada ejecución
+-- relee el texto de las filas que reaparecen.
+
+-- 1. Columna (nullable: las filas antiguas se completan abajo o, si no, en la siguiente ingesta)
+alter table tech_insights add column if not exists content_hash text;
+
+-- 2. Relleno de las filas existentes con el mismo hash que src/domain/hashing.py
+--    (sha256 hex del texto con los espacios colapsados). Es opcional: la ingesta completa y guarda
+--    el hash de las filas antiguas que vuelva a ver.
+update tech_insights
+set content_hash = encode(sha256(convert_to(regexp_replace(btrim(coalesce(content, '')), '\s+', ' ', 'g'), 'UTF8')), 'hex')
+where content_hash is null;
@@ -0,0 +1,61 @@
+-- 003: tabla de fragmentos y RPC match_insight_chunks (opcional)
+-- Solo hace falta con SUPABASE_CHUNKS_TABLE=tech_insight_chunks. La ingesta guarda un embedding por
+-- fragmento de cada artículo y la búsqueda devuelve los fragmentos más similares; la app se queda con
+-- el mejor de cada artículo. Requiere la extensión pgvector (la misma que usa match_insights).
+
+-- 1. Fragmentos: se borran con su artículo
+create table if not exists tech_insight_chunks (
+  id bigserial primary key,
+  parent_id bigint not null references tech_insights (id) on delete cascade,
+  chunk_index integer not null,
+  content text not null,
+  embedding vector(768) not null
+);
+
+-- 2. La ingesta reemplaza los fragmentos de un artículo borrando por parent_id
+create index if not exists tech_insight_chunks_parent_idx on tech_insight_chunks (parent_id);
+
+-- 3. Índice aproximado para la búsqueda por coseno (opcional con pocas filas)
+create index if not exists tech_insight_chunks_embedding_idx
+  on tech_insight_chunks using hnsw (embedding vector_cosine_ops);
+
+-- 4. Relleno: cada artículo ya ingerido entra como un fragmento único con su embedding y su texto.
+--    Sin esto, al definir SUPABASE_CHUNKS_TABLE la búsqueda (que solo lee esta tabla) no los encontraría.
+--    Es idempotente: los artículos que ya tienen fragmentos no se tocan. La ingesta reemplaza estas filas
+--    por los fragmentos reales cuando vuelve a escribir el artículo.
+insert into tech_insight_chunks (parent_id, chunk_index, content, embedding)
+select t.id, 0, coalesce(t.content, ''), t.embedding
+from tech_insights t
+where t.embedding is not null
+  and not exists (select 1 from tech_insight_chunks c where c.parent_id = t.id);
+
+-- 5. Búsqueda: un registro por fragmento con los datos de su artículo, ordenado por similitud.
+--    match_count ya viene multiplicado por CHUNK_SEARCH_FANOUT desde la app.
+create or replace function match_insight_chunks (
+  query_embedding vector(768),
+  match_threshold float,
+  match_count int
+)
+returns table (
+  parent_id bigint,
+  title text,
+  content text,
+  category text,
+  url text,
+  similarity float
+)
+language sql stable
+as $$
+  select
+    c.parent_id,
+    i.title,
+    c.content,
+    i.category,
+    i.url,
+    1 - (c.embedding <=> query_embedding) as similarity
+  from tech_insight_chunks c
+  join tech_insights i on i.id = c.parent_id
+  where 1 - (c.embedding <=> query_embedding) > match_threshold
+  order by c.embedding <=> query_embedding
+  limit match_count;
+$$;
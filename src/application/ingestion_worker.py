@@ -0,0 +1,162 @@
+"""Worker de ingesta desacoplado de Streamlit.
+
+Procesa la cola persistente de trabajos (JobStore) con un lock exclusivo entre procesos, de modo que
+nunca corren dos ingestas a la vez aunque haya varias pestañas, la UI y un daemon externo.
+
+Uso:
+    python -m src.application.ingestion_worker run-once
+    python -m src.application.ingestion_worker daemon --interval 60
+    python -m src.application.ingestion_worker status
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+from typing import Optional
+from src.domain.entities import IngestionJob
+from src.application.pipeline import IngestionPipeline
+from src.infrastructure.file_lock import SingleFlightLock
+from src.infrastructure.job_store import JobStore
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class IngestionWorker:
+    # Cada cuánto se persiste el resumen parcial mientras se genera (evita una escritura por fragmento)
+    PROGRESS_FLUSH_SECONDS = 0.5
+
+    def __init__(self, pipeline: IngestionPipeline, jobs: Optional[JobStore] = None, lock: Optional[SingleFlightLock] = None):
+        self.pipeline = pipeline
+        self.jobs = jobs or JobStore()
+        self.lock = lock or SingleFlightLock(settings.INGEST_LOCK_PATH)
+        self._stop = threading.Event()
+
+    def process_pending(self) -> int:
+        """Procesa los trabajos en cola; devuelve cuántos ejecutó (0 si otro proceso tiene el lock)."""
+        if not self.lock.acquire():
+            return 0
+        try:
+            self._fail_orphans()
+            return self._drain()
+        finally:
+            self.lock.release()
+
+    def run_once(self, source: str = "cli") -> Optional[IngestionJob]:
+        """Encola (o reutiliza) un trabajo, lo procesa y devuelve su estado final.
+
+        Si otro worker tiene el lock, el trabajo queda en cola para él y se devuelve como `queued`.
+        """
+        if not self.lock.acquire():
+            return self.jobs.enqueue(source)
+        try:
+            # Primero cerramos los huérfanos: si no, encolar devolvería el trabajo del worker muerto
+            self._fail_orphans()
+            job = self.jobs.enqueue(source)
+            self._drain()
+        finally:
+            self.lock.release()
+        return self.jobs.get(job.id)
+
+    def _fail_orphans(self) -> None:
+        # Con el lock tomado, cualquier `running` es de un worker que murió a medias
+        orphans = self.jobs.fail_orphans()
+        if orphans:
+            logger.warning(f"{orphans} trabajos de ingesta interrumpidos se marcaron como fallidos.")
+
+    def _drain(self) -> int:
+        processed = 0
+        while not self._stop.is_set() and (job := self.jobs.claim_next()) is not None:
+            self._execute(job)
+            processed += 1
+        return processed
+
+    def serve(self, interval_minutes: float = 0, poll_seconds: Optional[float] = None) -> None:
+        """Bucle del daemon: atiende la cola y, si `interval_minutes` > 0, encola una ingesta periódica."""
+        poll_seconds = poll_seconds if poll_seconds is not None else settings.INGEST_WORKER_POLL_SECONDS
+        next_scheduled = time.monotonic()
+        while not self._stop.is_set():
+            self.jobs.heartbeat()
+            if interval_minutes > 0 and time.monotonic() >= next_scheduled:
+                self.jobs.enqueue("scheduler")
+                next_scheduled = time.monotonic() + interval_minutes * 60
+            try:
+                self.process_pending()
+            except Exception as e:
+                # Un fallo de la cola no debe matar al daemon: se reintenta en la siguiente vuelta
+                logger.error(f"Error en el worker de ingesta: {e}")
+            self._stop.wait(poll_seconds)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _execute(self, job: IngestionJob) -> None:
+        print(f"Ejecutando ingesta #{job.id} (origen: {job.source})...")
+        state = {"progress": {}, "partial_summary": "", "flushed_at": 0.0}
+
+        def flush(force: bool = False) -> None:
+            now = time.monotonic()
+            if force or now - state["flushed_at"] >= self.PROGRESS_FLUSH_SECONDS:
+                state["flushed_at"] = now
+                self.jobs.update_progress(job.id, {**state["progress"], "partial_summary": state["partial_summary"]})
+
+        def on_progress(progress: dict) -> None:
+            state["progress"] = progress
+            flush(force=progress.get("stage") == "done")
+
+        def on_summary_chunk(chunk: str) -> None:
+            state["partial_summary"] += chunk
+            flush()
+
+        try:
+            report = self.pipeline.run_report(on_summary_chunk=on_summary_chunk, on_progress=on_progress)
+        except Exception as e:
+            logger.error(f"La ingesta #{job.id} falló: {e}")
+            self.jobs.fail(job.id, str(e))
+            return
+        self.jobs.finish(job.id, report)
+        print(f"✅ Ingesta #{job.id} completada.")
+
+def _print_status(jobs: JobStore) -> None:
+    heartbeat = jobs.last_heartbeat()
+    print(f"Último latido del worker: {time.ctime(heartbeat) if heartbeat else 'nunca'}")
+    for job in jobs.recent():
+        progress = {k: v for k, v in job.progress.items() if k != "partial_summary"}
+        print(f"#{job.id:<5}{job.status:<11}{job.source:<10}{time.ctime(job.requested_at)}  {progress or ''} {job.error or ''}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("run-once", help="Ejecuta una ingesta ahora y termina")
+    daemon = commands.add_parser("daemon", help="Atiende la cola de trabajos de forma continua")
+    daemon.add_argument("--interval", type=float, default=settings.INGEST_SCHEDULE_MINUTES,
+                        help="Minutos entre ingestas programadas (0 = solo las encoladas)")
+    daemon.add_argument("--poll", type=float, default=settings.INGEST_WORKER_POLL_SECONDS, help="Segundos entre consultas a la cola")
+    commands.add_parser("status", help="Muestra los últimos trabajos")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    jobs = JobStore()
+    if args.command == "status":
+        _print_status(jobs)
+        return 0
+
+    from src.application.services import ServiceRegistry
+    worker = IngestionWorker(ServiceRegistry().ingest_pipeline, jobs)
+    if args.command == "run-once":
+        job = worker.run_once()
+        if job is None or job.status != "succeeded":
+            print(f"⚠️ La ingesta no se completó: {job.error or f'estado {job.status} (otro worker tiene el lock)' if job else 'trabajo no encontrado'}")
+            return 1
+        print(job.report.summary)
+        return 0
+
+    print(f"Worker de ingesta iniciado (intervalo: {args.interval or 'sin programar'} min).")
+    try:
+        worker.serve(args.interval, args.poll)
+    except KeyboardInterrupt:
+        worker.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
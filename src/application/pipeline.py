@@ -1,82 +1,776 @@
-from typing import List, Optional
-from src.domain.entities import Insight
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from src.domain.entities import Chunk, Insight, IngestionReport, WriteReport
 from src.domain.interfaces import EmbeddingService, VectorDatabase, LLMService
+from src.domain.hashing import content_hash
+from src.domain.chunking import iter_chunk_spans
 from src.infrastructure.api_client import DataProvider
+from src.infrastructure.embeddings import pack_batches
+from src.infrastructure.state_store import StateStore
+from src.infrastructure.url_filter import UrlSeenFilter
+from src.infrastructure.kv_cache import SqliteKVCache
+from src.infrastructure.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from src.infrastructure.near_duplicates import NearDuplicateIndex
+from src.infrastructure.recent_articles import RecentArticleStore
+from src.infrastructure.metrics import metrics
+from src.application.query_cache import ExplanationCache, QueryResultCache
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class _IngestionRun:
+    """Estado compartido por las etapas de una ejecución de ingesta."""
+    since: Optional[datetime]
+    newest: Optional[datetime]
+    raw_data: List[dict] = field(default_factory=list)
+    seen_urls: set = field(default_factory=set)
+    fetch_errors: List[Exception] = field(default_factory=list)
+    errors: List[Exception] = field(default_factory=list)
+    existing_count: int = 0
+    write_report: WriteReport = field(default_factory=WriteReport)
+    failed: int = 0
+    embedded: int = 0
+    # URL -> marca de tiempo de lo leído y URLs que no llegaron a guardarse (vectorización o escritura fallida)
+    timestamps: Dict[str, Optional[datetime]] = field(default_factory=dict)
+    failed_urls: set = field(default_factory=set)
+    # Las fallas de escritura son de la base, no de una noticia: no cuentan como intentos de esa noticia
+    write_failed_urls: set = field(default_factory=set)
+    near_duplicates: int = 0
+    on_progress: Optional[Callable[[dict], None]] = None
+
+    def report_progress(self, stage: str) -> None:
+        if self.on_progress is None:
+            return
+        try:
+            self.on_progress({
+                "stage": stage,
+                "fetched": len(self.raw_data),
+                "near_duplicates": self.near_duplicates,
+                "existing": self.existing_count,
+                "embedded": self.embedded,
+                "embedding_failed": self.failed,
+                "inserted": self.write_report.inserted,
+                "updated": self.write_report.updated,
+                "skipped": self.write_report.skipped,
+                "write_failed": self.write_report.failed,
+            })
+        except Exception as e:
+            # El progreso es informativo: nunca debe tumbar la ingesta
+            logger.warning(f"No se pudo reportar el progreso de la ingesta: {e}")
 
 class IngestionPipeline:
-    def __init__(self, embedding_service: EmbeddingService, database: VectorDatabase, llm_service: LLMService):
+    WATERMARK_KEY = "watermark"
+    # URL -> ejecuciones en que falló (solo mientras sigue fallando)
+    FAILED_URLS_KEY = "failed_urls"
+    CORPUS_VERSION_KEY = "corpus_version"
+
+    def __init__(self, embedding_service: EmbeddingService, database: VectorDatabase, llm_service: LLMService,
+                 state_store: Optional[StateStore] = None, url_filter: Optional[UrlSeenFilter] = None,
+                 summary_cache: Optional[SqliteKVCache] = None, report_cache: Optional[SqliteKVCache] = None,
+                 lexical_index: Optional[LexicalIndex] = None, near_duplicate_index: Optional[NearDuplicateIndex] = None,
+                 recent_articles: Optional[RecentArticleStore] = None, data_provider=DataProvider):
         self.embedding_service = embedding_service
         self.database = database
         self.llm_service = llm_service
+        # Cualquier objeto con iter_articles(since, on_error) (p. ej. un doble local en los benchmarks)
+        self.data_provider = data_provider
+        self.state_store = state_store or StateStore()
+        if url_filter is None and settings.URL_FILTER_ENABLED:
+            url_filter = UrlSeenFilter()
+        self.url_filter = url_filter
+        if lexical_index is None and settings.LEXICAL_INDEX_ENABLED:
+            lexical_index = LexicalIndex()
+        self.lexical_index = lexical_index
+        if near_duplicate_index is None and settings.NEAR_DUP_ENABLED:
+            near_duplicate_index = NearDuplicateIndex()
+        self.near_duplicate_index = near_duplicate_index
+        # El informe cubre toda la ventana reciente, no solo lo que trajo la ingesta incremental
+        self.recent_articles = recent_articles or RecentArticleStore()
+        self.summary_cache = summary_cache or SqliteKVCache(settings.KV_CACHE_PATH, "article_summaries")
+        self.report_cache = report_cache or SqliteKVCache(settings.KV_CACHE_PATH, "reports", ttl_seconds=settings.REPORT_CACHE_TTL_SECONDS)
 
     def run(self) -> tuple[str, list]:
-        # 1. Fetch Data
-        raw_data = DataProvider.fetch_data()
-        
-        if not raw_data:
-            return "No se encontraron noticias recientes.", []
+        """Versión síncrona: ejecuta el pipeline por etapas en su propio event loop."""
+        report = self.run_report()
+        return report.summary, report.articles
 
-        # Deduplication Logic
-        urls = [item.get('url') for item in raw_data if item.get('url')]
-        existing_urls = set(self.database.get_existing_urls(urls))
-        
-        insights = []
-        texts_for_summary = []
-        new_items_count = 0
-        
-        print(f"Procesando {len(raw_data)} noticias (Ya existen: {len(existing_urls)})...")
-        
-        for item in raw_data:
-            # Siempre añadimos al contexto del resumen para tener el panorama completo
-            texts_for_summary.append(f"Title: {item['title']}\nContent: {item['content']}")
-            
-            # Solo procesamos (embedding + insert) si NO existe en la BD
-            if item.get('url') not in existing_urls:
-                # 2. Embed
-                emb = self.embedding_service.generate_embedding(item['content'], task_type="RETRIEVAL_DOCUMENT")
-                
-                # 3. Create Entity
-                insight = Insight(
-                    title=item['title'],
-                    content=item['content'],
-                    category=item['category'],
-                    url=item.get('url'),
-                    embedding=emb
-                )
-                insights.append(insight)
-                new_items_count += 1
-        
-        # 4. Save (Only new items)
-        if insights:
-            self.database.insert_insights(insights)
-            print(f"✅ Se insertaron {len(insights)} nuevas noticias.")
-        else:
+    def run_report(self, on_summary_chunk: Optional[Callable[[str], None]] = None,
+                   on_progress: Optional[Callable[[dict], None]] = None) -> IngestionReport:
+        """Como `run`, pero indica además si el informe se sirvió desde la caché.
+
+        Con `on_summary_chunk` el resumen se genera en streaming y cada fragmento se entrega a ese
+        callback (desde un hilo de trabajo) a medida que llega. `on_progress` recibe los contadores
+        de cada etapa (noticias leídas, nuevas, vectorizadas, guardadas) cada vez que avanzan.
+        """
+        with metrics.run("ingestion"):
+            return asyncio.run(self.run_async(on_summary_chunk, on_progress))
+
+    async def run_async(self, on_summary_chunk: Optional[Callable[[str], None]] = None,
+                        on_progress: Optional[Callable[[dict], None]] = None) -> IngestionReport:
+        """Fetch -> dedupe -> embed -> write como etapas solapadas unidas por colas acotadas.
+
+        Las colas limitan cuántos lotes hay en vuelo (backpressure) y cada etapa tiene su propio
+        número de workers. El resumen arranca en cuanto termina el fetch, en paralelo con la escritura.
+        """
+        # Solo pedimos lo publicado/modificado desde la última ejecución exitosa
+        since = self._load_watermark() if settings.INCREMENTAL_INGESTION else None
+        run = _IngestionRun(since=since, newest=since, on_progress=on_progress)
+        run.report_progress("fetch")
+        await asyncio.to_thread(self._ensure_url_filter)
+        await asyncio.to_thread(self._ensure_lexical_index)
+        await asyncio.to_thread(self._ensure_near_duplicate_index)
+
+        dedupe_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+
+        # Los lotes viajan como (ítems, es_actualización): las noticias editadas se re-vectorizan y sobrescriben
+        async def dedupe(batch: List[dict]) -> None:
+            new_items, changed_items, existing = await asyncio.to_thread(self._dedupe, batch)
+            run.existing_count += existing
+            run.report_progress("dedupe")
+            if new_items:
+                await embed_queue.put((new_items, False))
+            if changed_items:
+                await embed_queue.put((changed_items, True))
+
+        async def embed(job: Tuple[List[dict], bool]) -> None:
+            items, update = job
+            insights, failed = await asyncio.to_thread(self._embed, items)
+            run.failed += len(failed)
+            run.failed_urls.update(item.get('url') for item in failed)
+            run.embedded += len(insights)
+            run.report_progress("embed")
+            if insights:
+                await write_queue.put((insights, update))
+
+        async def write(job: Tuple[List[Insight], bool]) -> None:
+            report = await asyncio.to_thread(self._write, *job)
+            run.write_report = run.write_report.merge(report)
+            if report.failed:
+                # No sabemos qué filas del lote fallaron: todas retienen la marca de agua
+                run.write_failed_urls.update(i.url for i in job[0])
+            run.report_progress("write")
+
+        workers = [
+            *(asyncio.create_task(self._consume(dedupe_queue, dedupe, run)) for _ in range(settings.INGEST_DEDUPE_WORKERS)),
+            *(asyncio.create_task(self._consume(embed_queue, embed, run)) for _ in range(settings.INGEST_EMBED_WORKERS)),
+            *(asyncio.create_task(self._consume(write_queue, write, run)) for _ in range(settings.INGEST_WRITE_WORKERS)),
+        ]
+
+        summary_task, report_articles = None, []
+        try:
+            # 1. Fetch Data (streaming): cada lote entra a la cola en cuanto llega
+            await self._fetch(run, dedupe_queue)
+
+            # 5. Generate Summary sobre toda la ventana reciente (lo recién traído más lo de ejecuciones
+            # anteriores) mientras se termina de escribir; con la misma ventana sale de la caché de informes
+            report_articles = await asyncio.to_thread(self.recent_articles.window)
+            if report_articles:
+                print("Generando resumen de insights...")
+                run.report_progress("summarize")
+                summary_task = asyncio.create_task(asyncio.to_thread(self._cached_summary, report_articles, on_summary_chunk))
+
+            # Las colas se drenan en orden: cuando una queda vacía ya no puede recibir más trabajo
+            await dedupe_queue.join()
+            await embed_queue.join()
+            await write_queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        if run.errors:
+            if summary_task:
+                summary_task.cancel()
+            raise run.errors[0]
+
+        if not report_articles:
+            return IngestionReport("No se encontraron noticias recientes.")
+        if not run.raw_data and since is not None and not run.fetch_errors:
+            print("No hay noticias nuevas desde la última ejecución.")
+
+        print(f"Procesadas {len(run.raw_data)} noticias (Ya existían: {run.existing_count})...")
+        if run.near_duplicates:
+            print(f"🔁 {run.near_duplicates} casi-duplicados se enlazaron a su noticia original y se omitieron.")
+        if run.failed:
+            print(f"⚠️ {run.failed} noticias no pudieron vectorizarse y se omitieron.")
+        report = run.write_report
+        if report.failed:
+            print(f"⚠️ {report.failed} noticias no pudieron guardarse y se reintentarán.")
+        if report.updated:
+            print(f"✏️ Se re-vectorizaron {report.updated} noticias editadas desde la última ingesta.")
+        if report.inserted:
+            print(f"✅ Se insertaron {report.inserted} nuevas noticias (omitidas por duplicadas: {report.skipped}).")
+        elif not report.updated:
             print("✨ Todas las noticias ya existían en la base de datos. No se duplicó información.")
-            
-        # 5. Generate Summary (Based on ALL fetched news, fresh or old)
-        print("Generando resumen de insights...")
-        summary = self.llm_service.generate_summary(texts_for_summary)
-        return summary, raw_data
+
+        # La marca de agua no pasa de lo que quedó pendiente: con páginas fallidas no avanza y con noticias
+        # fallidas se queda justo antes de la más antigua que todavía se reintenta
+        watermark = self._next_watermark(run)
+        if watermark and (since is None or watermark > since) and not run.fetch_errors:
+            self.state_store.set(self.WATERMARK_KEY, watermark.isoformat())
+
+        summary, from_cache = await summary_task
+        run.report_progress("done")
+        return IngestionReport(summary, report_articles, from_cache=from_cache)
+
+    async def _fetch(self, run: _IngestionRun, outbox: asyncio.Queue) -> None:
+        articles = self.data_provider.iter_articles(since=run.since, on_error=run.fetch_errors.append)
+        batches = self._batched(articles, settings.INGEST_BATCH_SIZE)
+        while True:
+            # El generador es bloqueante (HTTP), así que lo avanzamos en un hilo
+            with metrics.span("ingest.fetch"):
+                batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+
+            # La misma noticia puede aparecer en dos páginas si se publica algo durante la paginación
+            batch = [item for item in batch if not item.get('url') or item['url'] not in run.seen_urls]
+            run.seen_urls.update(item['url'] for item in batch if item.get('url'))
+            # Sin cuerpo no hay nada que vectorizar (y fallaría en cada ejecución): se descarta aquí
+            empty = [item for item in batch if not (item.get('content') or "").strip()]
+            if empty:
+                metrics.inc("ingest.empty_body", len(empty))
+                batch = [item for item in batch if (item.get('content') or "").strip()]
+            if self.near_duplicate_index is not None and batch:
+                # Antes de todo lo demás: un casi-duplicado no se vectoriza, ni se guarda, ni entra al resumen
+                batch, linked = await asyncio.to_thread(self._link_near_duplicates, batch)
+                run.near_duplicates += linked
+            run.raw_data.extend(batch)
+            if batch:
+                await asyncio.to_thread(self.recent_articles.add_many, ((item, self._published_at(item)) for item in batch))
+            metrics.inc("ingest.articles", len(batch))
+            run.report_progress("fetch")
+            for item in batch:
+                ts = self._article_timestamp(item)
+                run.timestamps[item.get('url')] = ts
+                if ts and (run.newest is None or ts > run.newest):
+                    run.newest = ts
+
+            if batch:
+                # Si las etapas siguientes van atrasadas, esto bloquea (backpressure)
+                await outbox.put(batch)
+
+    @staticmethod
+    async def _consume(queue: asyncio.Queue, process, run: _IngestionRun) -> None:
+        while True:
+            item = await queue.get()
+            try:
+                await process(item)
+            except Exception as e:
+                logger.error(f"Error en una etapa de la ingesta: {e}")
+                run.errors.append(e)
+            finally:
+                queue.task_done()
+
+    @metrics.traced("ingest.near_dedupe")
+    def _link_near_duplicates(self, batch: List[dict]) -> tuple[List[dict], int]:
+        """Enlaza cada casi-duplicado (SimHash del cuerpo) con su artículo canónico y lo saca del lote."""
+        canonicals = self.near_duplicate_index.assign_many((item.get('url'), item.get('content', '')) for item in batch)
+        kept = [item for item, canonical in zip(batch, canonicals) if canonical is None]
+        linked = len(batch) - len(kept)
+        metrics.inc("ingest.near_duplicates", linked)
+        return kept, linked
+
+    @metrics.traced("ingest.dedupe")
+    def _dedupe(self, batch: List[dict]) -> tuple[List[dict], List[dict], int]:
+        """Separa el lote en (nuevas, editadas, cuántas ya existían sin cambios)."""
+        # Sin prefiltro, el upsert por `url` descarta los duplicados al escribir (y la caché de embeddings
+        # evita pagar de nuevo por los textos ya vectorizados); las ediciones no se detectan
+        if not settings.INGEST_PREFILTER_EXISTING:
+            return batch, [], 0
+
+        # Deduplication Logic: el filtro local descarta las URLs seguro nuevas y solo
+        # preguntamos a la base de datos por las que "quizás" ya se vieron (con su hash, en bloque)
+        urls = [item.get('url') for item in batch if item.get('url')]
+        if self.url_filter is not None:
+            urls = [url for url in urls if url in self.url_filter]
+        stored_hashes = self.database.get_content_hashes(urls) if urls else {}
+        metrics.inc("ingest.db_url_checks", len(urls))
+
+        new_items, changed_items = [], []
+        for item in batch:
+            url = item.get('url')
+            if url not in stored_hashes:
+                new_items.append(item)
+            # Sin hash guardado no sabemos si cambió: se trata como no modificada
+            elif stored_hashes[url] is not None and stored_hashes[url] != content_hash(item['content']):
+                changed_items.append(item)
+        metrics.inc("ingest.changed", len(changed_items))
+        return new_items, changed_items, len(stored_hashes) - len(changed_items)
+
+    @metrics.traced("ingest.embed")
+    def _embed(self, items: List[dict]) -> tuple[List[Insight], List[dict]]:
+        # 2. Embed: cada artículo se parte en fragmentos acotados por tokens y todos van en lotes al servicio
+        spans = [list(self._chunk(item['content'])) for item in items]
+        texts = [item['content'][start:end] for item, item_spans in zip(items, spans) for start, end in item_spans]
+        metrics.inc("ingest.chunks", len(texts))
+        embeddings = iter(self.embedding_service.generate_embeddings(texts, task_type="RETRIEVAL_DOCUMENT"))
+
+        insights, failed = [], []
+        for item, item_spans in zip(items, spans):
+            vectors = [next(embeddings) for _ in item_spans]
+            # Los ítems con algún fragmento sin embedding se reintentarán completos en la próxima ejecución
+            if any(v is None for v in vectors):
+                failed.append(item)
+                continue
+
+            chunks = None
+            embedding = vectors[0]
+            if len(vectors) > 1:
+                chunks = [Chunk(index, start, end, v) for index, ((start, end), v) in enumerate(zip(item_spans, vectors))]
+                embedding = self._mean_embedding(vectors)
+
+            # 3. Create Entity
+            insights.append(Insight(
+                title=item['title'],
+                content=item['content'],
+                category=item['category'],
+                url=item.get('url'),
+                embedding=embedding,
+                content_hash=content_hash(item['content']),
+                chunks=chunks,
+            ))
+        metrics.inc("ingest.embedding_failed", len(failed))
+        return insights, failed
+
+    @staticmethod
+    def _chunk(content: str) -> Iterator[Tuple[int, int]]:
+        if not settings.CHUNKING_ENABLED:
+            return iter([(0, len(content))])
+        return iter_chunk_spans(content, settings.CHUNK_MAX_TOKENS, settings.CHUNK_OVERLAP_TOKENS)
+
+    @staticmethod
+    def _mean_embedding(vectors: List[List[float]]) -> np.ndarray:
+        """Vector del artículo para backends de un vector por fila: promedio de sus fragmentos normalizados."""
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).mean(axis=0)
+
+    @metrics.traced("ingest.write")
+    def _write(self, insights: List[Insight], update: bool = False) -> WriteReport:
+        # 4. Save: las nuevas van por upsert (las URLs que ya existan se omiten); las editadas sobrescriben su fila
+        report = self.database.update_insights(insights) if update else self.database.upsert_insights(insights)
+        metrics.inc("ingest.inserted", report.inserted)
+        metrics.inc("ingest.updated", report.updated)
+        metrics.inc("ingest.skipped", report.skipped)
+        metrics.inc("ingest.write_failed", report.failed)
+        # Si algún tramo falló no sabemos cuáles URLs quedaron guardadas: no las marcamos como vistas
+        if self.url_filter is not None and not report.failed:
+            self.url_filter.add_many(i.url for i in insights)
+        if self.lexical_index is not None:
+            if update:
+                self.lexical_index.replace_many(insights)
+            else:
+                # Idempotente por URL: las ya indexadas (duplicadas u omitidas por el upsert) se ignoran
+                self.lexical_index.add_many(insights)
+        if report.inserted or report.updated:
+            # Nueva versión del corpus: las búsquedas cacheadas dejan de ser válidas
+            self.state_store.set(self.CORPUS_VERSION_KEY, self.corpus_version() + 1)
+        return report
+
+    def corpus_version(self) -> int:
+        return self.state_store.get(self.CORPUS_VERSION_KEY, 0)
+
+    def _ensure_url_filter(self) -> None:
+        if self.url_filter is None:
+            return
+        if self.url_filter.loaded:
+            # Otro proceso (UI o run-once) pudo agregar URLs desde la última ejecución
+            self.url_filter.refresh()
+            return
+        try:
+            urls = self.database.list_urls()
+        except Exception as e:
+            # Sin filtro seguimos funcionando: todas las URLs se consultan a la base de datos
+            logger.warning(f"No se pudo reconstruir el filtro de URLs: {e}")
+            self.url_filter = None
+            return
+        self.url_filter.rebuild(urls)
+        print(f"Filtro de URLs reconstruido con {len(urls)} URLs.")
+
+    @metrics.traced("ingest.summarize")
+    def _cached_summary(self, articles: List[dict], on_chunk: Optional[Callable[[str], None]] = None) -> tuple[str, bool]:
+        # Mismo conjunto de artículos y mismo modelo -> mismo informe: evitamos la llamada al LLM
+        key = self._report_key(articles)
+        cached = self.report_cache.get(key)
+        metrics.inc("cache.hits" if cached is not None else "cache.misses", cache="reports")
+        if cached is not None:
+            print("Informe servido desde la caché.")
+            if on_chunk:
+                on_chunk(cached)
+            return cached, True
+        try:
+            summary = self._summarize(articles, on_chunk)
+        except Exception as e:
+            # Solo el modo streaming propaga errores del LLM (el texto parcial ya se mostró)
+            logger.error(f"Error generando el resumen en streaming: {e}")
+            return f"Error al generar el resumen de insights: {e}", False
+        # GeminiLLMService devuelve el error como texto: ese resultado no se cachea
+        if not summary.startswith("Error al generar"):
+            self.report_cache.set(key, summary)
+        return summary, False
+
+    def _report_key(self, articles: List[dict]) -> str:
+        entries = sorted(f"{item.get('url')}\t{content_hash(item['content'])}" for item in articles)
+        digest = hashlib.sha256("\n".join(entries).encode("utf-8")).hexdigest()
+        return f"{self._model_name()}:{settings.SUMMARY_MODE}:{digest}"
+
+    def _model_name(self) -> str:
+        return getattr(self.llm_service, "model_name", type(self.llm_service).__name__)
+
+    def _ensure_lexical_index(self) -> None:
+        if self.lexical_index is None or self.lexical_index.count:
+            return
+        try:
+            added = self.lexical_index.rebuild(self.database.list_insights())
+        except Exception as e:
+            # Sin backfill el índice se irá llenando con las próximas ingestas
+            logger.warning(f"No se pudo reconstruir el índice léxico: {e}")
+            return
+        if added:
+            print(f"Índice léxico reconstruido con {added} noticias.")
+
+    def _ensure_near_duplicate_index(self) -> None:
+        if self.near_duplicate_index is None or self.near_duplicate_index.backfilled:
+            return
+        try:
+            added = self.near_duplicate_index.rebuild(self.database.list_insights())
+        except Exception as e:
+            # Sin backfill, las noticias ya guardadas no sirven de canónicas hasta que se vuelvan a ver
+            logger.warning(f"No se pudo reconstruir el índice de casi-duplicados: {e}")
+            return
+        if added:
+            print(f"Índice de casi-duplicados reconstruido con {added} noticias.")
+
+    def _summarize(self, articles: List[dict], on_chunk: Optional[Callable[[str], None]] = None) -> str:
+        # Siempre usamos todas las noticias como contexto del resumen para tener el panorama completo
+        if settings.SUMMARY_MODE != "map_reduce":
+            texts_for_summary = [f"Title: {item['title']}\nContent: {item['content']}" for item in articles]
+            return self._generate_summary(texts_for_summary, on_chunk)
+
+        # Map: un resumen corto por artículo, cacheado por URL + hash del contenido. Los que faltan se
+        # agrupan en prompts acotados por tokens (en paralelo): unas pocas llamadas, no una por artículo
+        article_summaries = self._summarize_articles(articles)
+
+        # Reduce: el informe final se construye sobre los resúmenes, no sobre el texto completo
+        texts_for_summary = [f"Title: {item['title']}\nSummary: {summary}" for item, summary in zip(articles, article_summaries)]
+        return self._generate_summary(texts_for_summary, on_chunk)
+
+    def _generate_summary(self, texts: List[str], on_chunk: Optional[Callable[[str], None]]) -> str:
+        if on_chunk is None:
+            return self.llm_service.generate_summary(texts)
+        chunks = []
+        for chunk in self.llm_service.stream_summary(texts):
+            chunks.append(chunk)
+            on_chunk(chunk)
+        return "".join(chunks)
+
+    @metrics.traced("ingest.summarize_articles")
+    def _summarize_articles(self, articles: List[dict]) -> List[str]:
+        keys = [f"{self._model_name()}:{item.get('url')}:{content_hash(item['content'])}" for item in articles]
+        summaries = [self.summary_cache.get(key) for key in keys]
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+        metrics.inc("cache.hits", len(articles) - len(missing), cache="article_summaries")
+        metrics.inc("cache.misses", len(missing), cache="article_summaries")
+
+        texts = [f"{articles[i]['title']}\n{articles[i]['content'][:settings.SUMMARY_MAP_MAX_CHARS]}" for i in missing]
+        batches = [missing[start:start + len(batch)]
+                   for start, batch in pack_batches(texts, settings.SUMMARY_MAP_BATCH_SIZE, settings.SUMMARY_MAP_BATCH_TOKENS)]
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(settings.SUMMARY_MAP_CONCURRENCY, len(batches))) as executor:
+                for batch, results in zip(batches, executor.map(self._summarize_batch, [[articles[i] for i in b] for b in batches])):
+                    for i, summary in zip(batch, results):
+                        if summary:
+                            self.summary_cache.set(keys[i], summary)
+                            summaries[i] = summary
+
+        # Si falla el "map" de un artículo usamos un fragmento, sin cachearlo
+        return [summary or item['content'][:1000] for item, summary in zip(articles, summaries)]
+
+    def _summarize_batch(self, items: List[dict]) -> List[Optional[str]]:
+        metrics.inc("ingest.summary_map_calls")
+        try:
+            return self.llm_service.summarize_articles([(item['title'], item['content']) for item in items])
+        except Exception as e:
+            logger.warning(f"No se pudo resumir un lote de {len(items)} artículos: {e}")
+            return [None] * len(items)
+
+    def _next_watermark(self, run: _IngestionRun) -> Optional[datetime]:
+        """Modificación más nueva leída, sin pasar de justo antes de la noticia fallida más antigua.
+
+        Una noticia que falla al vectorizarse en INGEST_MAX_ITEM_ATTEMPTS ejecuciones (sin que el servicio
+        esté caído para todas) se da por perdida y deja de retener la marca de agua; si no, una sola noticia
+        rota frenaría la ingesta para siempre. Las fallas de escritura siempre retienen.
+        """
+        previous = self.state_store.get(self.FAILED_URLS_KEY, {})
+        # Lo que se leyó y no falló ya no necesita reintentos
+        attempts = {url: n for url, n in previous.items() if url not in run.timestamps or url in run.failed_urls}
+        # Si fallaron varias y no se vectorizó ninguna, el servicio está caído: no es culpa de cada noticia
+        if run.embedded or len(run.failed_urls) == 1:
+            for url in run.failed_urls - run.write_failed_urls:
+                attempts[url] = attempts.get(url, 0) + 1
+        pending = run.write_failed_urls | {url for url in run.failed_urls if attempts.get(url, 0) < settings.INGEST_MAX_ITEM_ATTEMPTS}
+        given_up = run.failed_urls - pending
+        if given_up:
+            metrics.inc("ingest.given_up", len(given_up))
+            logger.warning(f"{len(given_up)} noticias fallaron en {settings.INGEST_MAX_ITEM_ATTEMPTS} ejecuciones y ya no retienen la marca de agua: {sorted(given_up)}")
+        if attempts != previous:
+            self.state_store.set(self.FAILED_URLS_KEY, attempts)
+
+        watermark = run.newest
+        for url in pending:
+            ts = run.timestamps.get(url)
+            if ts is None:
+                # Sin fecha no sabemos hasta dónde avanzar sin saltarla
+                return None
+            watermark = min(watermark, ts - timedelta(seconds=1))
+        return watermark
+
+    def _load_watermark(self) -> Optional[datetime]:
+        value = self.state_store.get(self.WATERMARK_KEY)
+        return datetime.fromisoformat(value) if value else None
+
+    @staticmethod
+    def _published_at(item: dict) -> Optional[datetime]:
+        value = item.get('published_at') or item.get('last_modified')
+        try:
+            return datetime.fromisoformat(value) if value else None
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _article_timestamp(item: dict) -> Optional[datetime]:
+        value = item.get('last_modified') or item.get('published_at')
+        try:
+            return datetime.fromisoformat(value) if value else None
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _batched(items: Iterable[dict], size: int) -> Iterator[List[dict]]:
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
 class SearchPipeline:
-    def __init__(self, embedding_service: EmbeddingService, database: VectorDatabase, llm_service: Optional[LLMService] = None):
+    def __init__(self, embedding_service: EmbeddingService, database: VectorDatabase, llm_service: Optional[LLMService] = None,
+                 cache: Optional[QueryResultCache] = None, explanation_cache: Optional[ExplanationCache] = None,
+                 lexical_index: Optional[LexicalIndex] = None):
         self.embedding_service = embedding_service
         self.database = database
         self.llm_service = llm_service
+        self.lexical_index = lexical_index
+        self.cache = cache or QueryResultCache(settings.SEARCH_CACHE_MAX_ENTRIES, settings.SEARCH_CACHE_TTL_SECONDS)
+        self.explanations = explanation_cache or ExplanationCache(settings.EXPLANATION_CACHE_MAX_ENTRIES)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._vector_executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight: dict = {}
+        self._lock = threading.Lock()
 
-    def search(self, query: str) -> List[Insight]:
-        # 1. Embed query
-        query_embedding = self.embedding_service.generate_embedding(query, task_type="RETRIEVAL_QUERY")
-        
-        # 2. Search DB
-        results = self.database.search_insights(query_embedding, threshold=0.4, count=5)
+    def search(self, query: str, threshold: float = 0.4, count: int = 5, explain: bool = True) -> List[Insight]:
+        """Búsqueda vectorial. Con `explain=False` vuelve sin esperar al LLM: las explicaciones
+        ya conocidas se aplican desde la caché y el resto se pide con `explain`/`explain_in_background`."""
+        with metrics.run("search"):
+            return self._search(query, threshold, count, explain)
+
+    def _search(self, query: str, threshold: float, count: int, explain: bool) -> List[Insight]:
+        # 0. Cache: una búsqueda repetida (p. ej. un rerun de Streamlit) no vuelve a llamar a ningún servicio
+        cache_key = self.cache.make_key(query, threshold, count)
+        if not explain:
+            cache_key += ("sin_explicacion",)
+        cached = self.cache.get(cache_key)
+        metrics.inc("cache.hits" if cached is not None else "cache.misses", cache="search")
+        if cached is not None:
+            if not explain:
+                self.fill_explanations(query, cached)
+            return cached
+
+        results, complete = self._retrieve(query, threshold, count)
+        if not explain:
+            if complete:
+                self.cache.put(cache_key, results)
+            self.fill_explanations(query, results)
+            return results
         
         # 3. Enhance with AI Explanation (if available)
         if results and self.llm_service:
-            explanations = self.llm_service.explain_relevance(query, results)
+            with metrics.span("search.explain"):
+                explanations = self.llm_service.explain_relevance(query, results)
             for i, res in enumerate(results):
                 # Ensure we don't index out of bounds
                 if i < len(explanations):
                     res.relevance = explanations[i]
+                    self.explanations.put(query, res, explanations[i])
         
+        if complete:
+            self.cache.put(cache_key, results)
         return results
+
+    def search_stream(self, query: str, threshold: float = 0.4, count: int = 5) -> Tuple[List[Insight], Iterator[Tuple[int, str]]]:
+        """Devuelve los resultados en cuanto termina la búsqueda vectorial y un iterador de
+        (índice, explicación) que va completando `relevance` a medida que el LLM responde."""
+        cache_key = self.cache.make_key(query, threshold, count)
+        cached = self.cache.get(cache_key)
+        metrics.inc("cache.hits" if cached is not None else "cache.misses", cache="search")
+        if cached is not None:
+            return cached, iter(())
+
+        with metrics.run("search"):
+            results, complete = self._retrieve(query, threshold, count)
+        if not results or not self.llm_service:
+            if complete:
+                self.cache.put(cache_key, results)
+            return results, iter(())
+        return results, self._stream_relevance(cache_key if complete else None, query, results)
+
+    def fill_explanations(self, query: str, results: List[Insight]) -> List[int]:
+        """Aplica las explicaciones ya cacheadas y devuelve los índices que siguen pendientes."""
+        pending = []
+        for i, res in enumerate(results):
+            text = self.explanations.get(query, res)
+            if text is not None:
+                res.relevance = text
+            elif not res.relevance:
+                pending.append(i)
+        return pending
+
+    def explain(self, query: str, insight: Insight) -> str:
+        """Explicación bajo demanda de un único resultado (cacheada por query + insight)."""
+        text = self.explanations.get(query, insight)
+        if text is None:
+            text = self.llm_service.explain_relevance(query, [insight])[0]
+            self.explanations.put(query, insight, text)
+        insight.relevance = text
+        return text
+
+    def explain_in_background(self, query: str, results: List[Insight]) -> Optional[Future]:
+        """Pide en segundo plano (una sola llamada al LLM) las explicaciones que falten.
+
+        Devuelve None si no falta ninguna; una misma petición en curso se reutiliza entre reruns.
+        """
+        if not self.llm_service:
+            return None
+        missing = [res for res in results if self.explanations.get(query, res) is None]
+        if not missing:
+            return None
+        key = (" ".join(query.lower().split()), tuple(self.explanations.make_key(query, r)[1] for r in missing))
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None or future.done():
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=settings.EXPLANATION_WORKERS, thread_name_prefix="explain")
+                future = self._executor.submit(self._explain_batch, query, missing)
+                self._in_flight[key] = future
+        # Fuera del lock: si la tarea ya terminó, el callback se ejecuta en este mismo hilo
+        future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    @metrics.traced("search.explain_background")
+    def _explain_batch(self, query: str, insights: List[Insight]) -> None:
+        try:
+            explanations = self.llm_service.explain_relevance(query, insights)
+        except Exception as e:
+            # Cacheamos un texto genérico para que quien sondea no relance la petición indefinidamente
+            logger.error(f"Error generando explicaciones en segundo plano: {e}")
+            explanations = ["Información relevante encontrada."] * len(insights)
+        for res, text in zip(insights, explanations):
+            self.explanations.put(query, res, text)
+
+    def _forget(self, key: tuple) -> None:
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None and future.done():
+                del self._in_flight[key]
+
+    def _retrieve(self, query: str, threshold: float, count: int) -> Tuple[List[Insight], bool]:
+        """Resultados según SEARCH_MODE y si son completos (False si el híbrido degradó a solo BM25:
+        ese resultado no se cachea para que la próxima búsqueda vuelva a intentar la parte vectorial)."""
+        mode = settings.SEARCH_MODE if self.lexical_index is not None else "vector"
+        if mode == "lexical":
+            with metrics.span("search.lexical"):
+                return self._with_ids(self.lexical_index.search(query, count)), True
+        if mode != "hybrid":
+            return self._vector_search(query, threshold, count), True
+
+        # Híbrido: BM25 es local e inmediato; el embedding remoto corre en paralelo con un tope de espera
+        candidates = max(count, settings.HYBRID_CANDIDATES)
+        if self._vector_executor is None:
+            self._vector_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vector")
+        vector_future = self._vector_executor.submit(self._vector_search, query, threshold, candidates)
+        with metrics.span("search.lexical"):
+            scored = self.lexical_index.search_scored(query, candidates)
+        try:
+            vector = vector_future.result(timeout=settings.HYBRID_EMBED_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            logger.warning("El embedding de la consulta tarda demasiado: respondemos solo con BM25.")
+            metrics.inc("search.lexical_fallback", reason="timeout")
+            return self._with_ids(self._lexical_hits(scored, [])[:count]), False
+        except Exception as e:
+            # Cuota agotada o servicio caído: la búsqueda léxica sigue funcionando
+            logger.warning(f"Búsqueda vectorial no disponible, respondemos solo con BM25: {e}")
+            metrics.inc("search.lexical_fallback", reason="error")
+            return self._with_ids(self._lexical_hits(scored, [])[:count]), False
+        # El ranking vectorial va primero: sus Insight traen el id de la base de datos
+        fused = reciprocal_rank_fusion([vector, self._lexical_hits(scored, vector)], count, k=settings.RRF_K)
+        return self._with_ids(fused), True
+
+    @staticmethod
+    def _lexical_hits(scored: List[Tuple[Insight, float]], vector: List[Insight]) -> List[Insight]:
+        """Candidatos BM25 que entran a la fusión: los que también vio la búsqueda vectorial (ya pasaron
+        su threshold) y los que, sin ese respaldo, cubren bien la consulta (HYBRID_LEXICAL_MIN_SCORE)."""
+        agreed = {i.url or i.title for i in vector}
+        hits = [insight for insight, score in scored
+                if (insight.url or insight.title) in agreed or score >= settings.HYBRID_LEXICAL_MIN_SCORE]
+        metrics.inc("search.lexical_dropped", len(scored) - len(hits))
+        return hits
+
+    def _with_ids(self, results: List[Insight]) -> List[Insight]:
+        """Completa el id de la base de datos en resultados léxicos indexados sin él (y lo guarda en el índice)."""
+        resolved = {}
+        for insight in results:
+            if insight.id is None and insight.url:
+                try:
+                    stored = self.database.get_insight(insight.url)
+                except Exception as e:
+                    logger.warning(f"No se pudo resolver el id de {insight.url}: {e}")
+                    continue
+                if stored is not None and stored.id is not None:
+                    insight.id = resolved[insight.url] = stored.id
+        if resolved:
+            self.lexical_index.set_ids(resolved)
+        return results
+
+    def _vector_search(self, query: str, threshold: float, count: int) -> List[Insight]:
+        # 1. Embed query
+        with metrics.span("search.embed_query"):
+            query_embedding = self.embedding_service.generate_embedding(query, task_type="RETRIEVAL_QUERY")
+        
+        # 2. Search DB
+        with metrics.span("search.vector"):
+            return self.database.search_insights(query_embedding, threshold=threshold, count=count)
+
+    def _stream_relevance(self, cache_key: Optional[tuple], query: str, results: List[Insight]) -> Iterator[Tuple[int, str]]:
+        for i, text in self.llm_service.stream_explanations(query, results):
+            if i < len(results):
+                results[i].relevance = text
+                self.explanations.put(query, results[i], text)
+                yield i, text
+        # Solo se cachea cuando llegaron todas las explicaciones
+        if cache_key is not None:
+            self.cache.put(cache_key, results)
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Callable, List, Optional
+from src.domain.entities import Insight
+
+class QueryResultCache:
+    """Caché LRU con TTL para resultados de búsqueda (incluidas sus explicaciones de relevancia).
+
+    Cada entrada recuerda la versión del corpus con la que se calculó; cuando la ingesta inserta
+    filas nuevas la versión cambia y las entradas anteriores dejan de servirse.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600, version_provider: Optional[Callable[[], int]] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._version = 0
+        self._version_provider = version_provider or (lambda: self._version)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(query: str, threshold: float, count: int) -> tuple:
+        # Normalizamos mayúsculas y espacios para que "IA  " y "ia" compartan entrada
+        return (" ".join(query.lower().split()), round(threshold, 4), count)
+
+    def get(self, key: tuple) -> Optional[List[Insight]]:
+        version = self._version_provider()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic() or entry[1] != version:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Copias: quien llama puede modificar los Insight sin tocar la caché
+            return [replace(r) for r in entry[2]]
+
+    def put(self, key: tuple, results: List[Insight]) -> None:
+        version = self._version_provider()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, version, [replace(r) for r in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """Invalida todo lo cacheado en este proceso (cuando no hay un version_provider externo)."""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+class ExplanationCache:
+    """Caché LRU de explicaciones de relevancia por (query normalizada, insight).
+
+    A diferencia de QueryResultCache no depende de la versión del corpus: la explicación de un
+    artículo concreto para una búsqueda no cambia aunque se inserten artículos nuevos.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str, insight: Insight) -> tuple:
+        # Sin id (p. ej. resultados sin persistir) usamos la URL como identificador estable
+        return (" ".join(query.lower().split()), insight.id if insight.id is not None else insight.url or insight.title)
+
+    def get(self, query: str, insight: Insight) -> Optional[str]:
+        key = self.make_key(query, insight)
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+            return text
+
+    def put(self, query: str, insight: Insight, text: str) -> None:
+        key = self.make_key(query, insight)
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,101 @@
+import functools
+import threading
+from typing import Callable, Dict, List, TypeVar
+from src.config.settings import settings
+from src.application.pipeline import SearchPipeline, IngestionPipeline
+from src.application.query_cache import QueryResultCache
+
+T = TypeVar("T")
+
+def _lazy(build: Callable[["ServiceRegistry"], T]) -> property:
+    """Propiedad que construye el servicio en el primer acceso (una sola vez aunque accedan varios hilos)."""
+    name = build.__name__
+
+    @functools.wraps(build)
+    def getter(self: "ServiceRegistry") -> T:
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = build(self)
+            return self._instances[name]
+    return property(getter)
+
+class ServiceRegistry:
+    """Raíz de composición perezosa: cada servicio se construye (e importa su SDK) al pedirlo por primera vez.
+
+    La UI comparte una instancia entre todas las sesiones y el worker de ingesta crea la suya, así
+    abrir solo el buscador no paga la construcción del pipeline de ingesta ni al revés.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._instances: Dict[str, object] = {}
+        self._validated = False
+
+    def _validate(self) -> None:
+        if not self._validated:
+            settings.validate()
+            self._validated = True
+
+    @_lazy
+    def database(self):
+        self._validate()
+        # Importamos aquí el backend elegido: el otro (p. ej. supabase) nunca llega a cargarse
+        if settings.VECTOR_BACKEND == "local":
+            from src.infrastructure.local_vector_db import LocalVectorDatabase
+            return LocalVectorDatabase()
+        from src.infrastructure.database import SupabaseDatabase
+        return SupabaseDatabase()
+
+    @_lazy
+    def embedding_service(self):
+        self._validate()
+        from src.infrastructure.embeddings import GeminiEmbeddingService
+        from src.infrastructure.embedding_cache import CachedEmbeddingService
+        return CachedEmbeddingService(GeminiEmbeddingService())
+
+    @_lazy
+    def llm_service(self):
+        self._validate()
+        from src.infrastructure.llm_service import GeminiLLMService
+        return GeminiLLMService()
+
+    @_lazy
+    def lexical_index(self):
+        # El índice BM25 lo alimenta la ingesta y lo consulta el buscador (modo híbrido o léxico)
+        if not settings.LEXICAL_INDEX_ENABLED:
+            return None
+        from src.infrastructure.lexical_index import LexicalIndex
+        return LexicalIndex()
+
+    @_lazy
+    def state_store(self):
+        from src.infrastructure.state_store import StateStore
+        return StateStore()
+
+    @_lazy
+    def ingest_pipeline(self) -> IngestionPipeline:
+        return IngestionPipeline(self.embedding_service, self.database, self.llm_service,
+                                 state_store=self.state_store, lexical_index=self.lexical_index)
+
+    @_lazy
+    def search_pipeline(self) -> SearchPipeline:
+        # La caché de búsquedas se versiona con el corpus: cada ingesta con filas nuevas la invalida.
+        # Leemos la versión del StateStore directamente para no construir el pipeline de ingesta.
+        state_store = self.state_store
+        search_cache = QueryResultCache(settings.SEARCH_CACHE_MAX_ENTRIES, settings.SEARCH_CACHE_TTL_SECONDS,
+                                        version_provider=lambda: state_store.get(IngestionPipeline.CORPUS_VERSION_KEY, 0))
+        return SearchPipeline(self.embedding_service, self.database, self.llm_service, cache=search_cache, lexical_index=self.lexical_index)
+
+    def built(self) -> List[str]:
+        """Servicios ya construidos (útil para medir el arranque)."""
+        with self._lock:
+            return list(self._instances)
+
+    def reset(self) -> None:
+        """Descarta las instancias: el siguiente acceso las reconstruye (p. ej. para reabrir índices locales)."""
+        with self._lock:
+            self._instances.clear()
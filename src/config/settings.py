@@ -14,6 +14,140 @@ class Settings:
     EMBEDDING_MODEL = "text-embedding-004"
     GENERATION_MODEL = "gemini-2.5-flash"
     TABLE_NAME = "tech_insights"
+
+    # Solo desarrollo: recarga los módulos de la aplicación en cada rerun de Streamlit (lento)
+    DEV_RELOAD = os.getenv("DEV_RELOAD", "false").lower() == "true"
+
+    # Escrituras en Supabase: upsert por `url` en tramos acotados, reintentando cada tramo
+    SUPABASE_UPSERT_MAX_ROWS = int(os.getenv("SUPABASE_UPSERT_MAX_ROWS", "100"))
+    SUPABASE_UPSERT_MAX_BYTES = int(os.getenv("SUPABASE_UPSERT_MAX_BYTES", str(2 * 1024 * 1024)))
+    SUPABASE_WRITE_RETRIES = int(os.getenv("SUPABASE_WRITE_RETRIES", "3"))
+    SUPABASE_IN_FILTER_SIZE = int(os.getenv("SUPABASE_IN_FILTER_SIZE", "200"))
+
+    # The Guardian: paginación y requests simultáneos
+    GUARDIAN_PAGE_SIZE = int(os.getenv("GUARDIAN_PAGE_SIZE", "50"))
+    GUARDIAN_MAX_PAGES = int(os.getenv("GUARDIAN_MAX_PAGES", "10"))
+    GUARDIAN_MAX_CONCURRENCY = int(os.getenv("GUARDIAN_MAX_CONCURRENCY", "4"))
+
+    # Ingesta incremental: marca de agua persistida y solape para no perder artículos en el borde
+    INCREMENTAL_INGESTION = os.getenv("INCREMENTAL_INGESTION", "true").lower() == "true"
+    WATERMARK_OVERLAP_MINUTES = int(os.getenv("WATERMARK_OVERLAP_MINUTES", "30"))
+    # Ejecuciones en que una noticia puede fallar al vectorizarse antes de dejar de retener la marca de agua
+    INGEST_MAX_ITEM_ATTEMPTS = int(os.getenv("INGEST_MAX_ITEM_ATTEMPTS", "3"))
+    # Días de noticias que cubre el informe ejecutivo (y la primera ingesta, sin marca de agua)
+    RECENT_WINDOW_DAYS = int(os.getenv("RECENT_WINDOW_DAYS", "3"))
+
+    # Tamaño de los lotes que procesa la ingesta mientras siguen llegando páginas
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "50"))
+    # Consultar qué URLs ya existen antes de vectorizar (evita embeddings innecesarios)
+    INGEST_PREFILTER_EXISTING = os.getenv("INGEST_PREFILTER_EXISTING", "true").lower() == "true"
+
+    # Pipeline por etapas: lotes en vuelo entre etapas y workers por etapa
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+    INGEST_DEDUPE_WORKERS = int(os.getenv("INGEST_DEDUPE_WORKERS", "2"))
+    INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+    INGEST_WRITE_WORKERS = int(os.getenv("INGEST_WRITE_WORKERS", "1"))
+
+    # Embeddings en lote: textos por request y requests simultáneos
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+    EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+    EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+    # Tokens estimados por request de embeddings: un lote se corta al llegar a EMBEDDING_BATCH_SIZE o a este límite
+    EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "16000"))
+
+    # Fragmentos (chunks) por artículo: el modelo de embeddings trunca textos largos en silencio, así que
+    # los cuerpos se parten en tramos acotados por tokens (~4 caracteres por token) con solape entre ellos
+    CHUNKING_ENABLED = os.getenv("CHUNKING_ENABLED", "true").lower() == "true"
+    CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+    CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+    # Candidatos por resultado pedidos al índice antes de agrupar los fragmentos por artículo
+    CHUNK_SEARCH_FANOUT = int(os.getenv("CHUNK_SEARCH_FANOUT", "4"))
+
+    # Cuotas de Gemini (requests y tokens por minuto) compartidas por todo el proceso
+    GEMINI_EMBEDDING_RPM = int(os.getenv("GEMINI_EMBEDDING_RPM", "1500"))
+    GEMINI_EMBEDDING_TPM = int(os.getenv("GEMINI_EMBEDDING_TPM", "1000000"))
+    GEMINI_GENERATION_RPM = int(os.getenv("GEMINI_GENERATION_RPM", "10"))
+    GEMINI_GENERATION_TPM = int(os.getenv("GEMINI_GENERATION_TPM", "250000"))
+    GENERATION_MAX_CONCURRENCY = int(os.getenv("GENERATION_MAX_CONCURRENCY", "4"))
+
+    # Almacenamiento local (cachés e índices)
+    CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+    KV_CACHE_PATH = os.path.join(CACHE_DIR, "kv_cache.sqlite3")
+    # Entradas por namespace de la caché clave/valor (resúmenes por artículo, informes); 0 = sin límite
+    KV_CACHE_MAX_ENTRIES = int(os.getenv("KV_CACHE_MAX_ENTRIES", "20000"))
+    EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "embeddings.sqlite3")
+    EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+    INGEST_STATE_PATH = os.path.join(CACHE_DIR, "ingestion_state.json")
+    RECENT_ARTICLES_PATH = os.path.join(CACHE_DIR, "recent_articles.sqlite3")
+
+    # Worker de ingesta: "embedded" (hilo dentro del servidor de Streamlit) o "external"
+    # (`python -m src.application.ingestion_worker daemon`); en ambos casos la UI solo encola y consulta
+    INGEST_WORKER_MODE = os.getenv("INGEST_WORKER_MODE", "embedded")
+    INGEST_JOBS_PATH = os.path.join(CACHE_DIR, "ingestion_jobs.sqlite3")
+    INGEST_LOCK_PATH = os.path.join(CACHE_DIR, "ingestion.lock")
+    INGEST_SCHEDULE_MINUTES = int(os.getenv("INGEST_SCHEDULE_MINUTES", "0"))  # 0 = sin ejecución periódica
+    INGEST_WORKER_POLL_SECONDS = float(os.getenv("INGEST_WORKER_POLL_SECONDS", "2"))
+
+    # Filtro de Bloom local con las URLs ya ingeridas
+    URL_FILTER_ENABLED = os.getenv("URL_FILTER_ENABLED", "true").lower() == "true"
+    URL_FILTER_PATH = os.path.join(CACHE_DIR, "seen_urls.bloom")
+    URL_FILTER_CAPACITY = int(os.getenv("URL_FILTER_CAPACITY", "200000"))
+    URL_FILTER_ERROR_RATE = float(os.getenv("URL_FILTER_ERROR_RATE", "0.01"))
+
+    # Casi-duplicados (SimHash de 64 bits sobre el cuerpo normalizado) antes de vectorizar
+    NEAR_DUP_ENABLED = os.getenv("NEAR_DUP_ENABLED", "true").lower() == "true"
+    NEAR_DUP_PATH = os.path.join(CACHE_DIR, "near_duplicates.sqlite3")
+    NEAR_DUP_MAX_DISTANCE = int(os.getenv("NEAR_DUP_MAX_DISTANCE", "3"))  # bits distintos (Hamming) para considerar duplicado
+    NEAR_DUP_SHINGLE_SIZE = int(os.getenv("NEAR_DUP_SHINGLE_SIZE", "3"))
+    NEAR_DUP_MIN_TOKENS = int(os.getenv("NEAR_DUP_MIN_TOKENS", "30"))  # textos más cortos no se comparan
+
+    # Resumen: "single" (un prompt con fragmentos) o "map_reduce" (resumen por artículo cacheado + reduce)
+    # map_reduce es opt-in: aun en lotes hace varias llamadas más que "single" (ver GEMINI_GENERATION_RPM)
+    SUMMARY_MODE = os.getenv("SUMMARY_MODE", "single")
+    SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4"))
+    SUMMARY_MAP_MAX_CHARS = int(os.getenv("SUMMARY_MAP_MAX_CHARS", "8000"))
+    # Artículos por prompt "map": el lote se corta al llegar a cualquiera de los dos límites
+    SUMMARY_MAP_BATCH_SIZE = int(os.getenv("SUMMARY_MAP_BATCH_SIZE", "20"))
+    SUMMARY_MAP_BATCH_TOKENS = int(os.getenv("SUMMARY_MAP_BATCH_TOKENS", "24000"))
+    # Informe ejecutivo cacheado por conjunto de artículos (URL + hash del contenido) y modelo
+    REPORT_CACHE_TTL_SECONDS = int(os.getenv("REPORT_CACHE_TTL_SECONDS", "3600"))
+
+    # Búsqueda: "vector", "hybrid" (BM25 + vectorial fusionados con RRF) o "lexical" (solo BM25, sin embedding)
+    SEARCH_MODE = os.getenv("SEARCH_MODE", "vector")
+    LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "true").lower() == "true"
+    LEXICAL_INDEX_PATH = os.path.join(CACHE_DIR, "lexical_index.sqlite3")
+    # En modo híbrido, si el embedding de la consulta tarda más que esto se responde solo con BM25
+    HYBRID_EMBED_TIMEOUT_SECONDS = float(os.getenv("HYBRID_EMBED_TIMEOUT_SECONDS", "3"))
+    HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+    # Un resultado solo-BM25 (sin respaldo vectorial) debe cubrir al menos esta fracción de la consulta (0-1)
+    HYBRID_LEXICAL_MIN_SCORE = float(os.getenv("HYBRID_LEXICAL_MIN_SCORE", "0.3"))
+    RRF_K = int(os.getenv("RRF_K", "60"))
+
+    # Caché de resultados de búsqueda (se invalida cuando la ingesta inserta filas nuevas)
+    SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "256"))
+    SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "600"))
+
+    # Explicaciones de relevancia: "stream" (se completan al llegar), "background" (worker en segundo
+    # plano) u "on_demand" (botón por tarjeta). En los dos últimos la búsqueda no espera al LLM.
+    SEARCH_EXPLAIN_MODE = os.getenv("SEARCH_EXPLAIN_MODE", "stream")
+    EXPLANATION_CACHE_MAX_ENTRIES = int(os.getenv("EXPLANATION_CACHE_MAX_ENTRIES", "2048"))
+    EXPLANATION_WORKERS = int(os.getenv("EXPLANATION_WORKERS", "2"))
+
+    # Backend vectorial: "supabase" (RPC match_insights) o "local" (índice NumPy en disco)
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "supabase")
+    # Tabla de fragmentos en Supabase + RPC match_insight_chunks (migrations/003_insight_chunks.sql).
+    # Vacío = una fila por artículo con el embedding promedio de sus fragmentos
+    SUPABASE_CHUNKS_TABLE = os.getenv("SUPABASE_CHUNKS_TABLE", "")
+    LOCAL_INDEX_DIR = os.path.join(CACHE_DIR, "vector_index")
+
+    # Búsqueda aproximada (IVF) en el índice local: "exact" o "ivf"
+    VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "exact")
+    IVF_LISTS = int(os.getenv("IVF_LISTS", "0"))  # 0 = automático (~4·sqrt(n))
+    IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+    IVF_MIN_TRAIN_SIZE = int(os.getenv("IVF_MIN_TRAIN_SIZE", "2048"))
+    # Copia compacta para el barrido del índice local: "none", "int8" o "float16" (re-ranking final en float32)
+    VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+    QUANT_RERANK_FACTOR = int(os.getenv("QUANT_RERANK_FACTOR", "4"))
     
     @classmethod
     def validate(cls):
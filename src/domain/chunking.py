@@ -0,0 +1,51 @@
+import re
+from typing import Iterator, Tuple
+
+# Misma aproximación que rate_limiter.estimate_tokens: ~4 caracteres por token
+CHARS_PER_TOKEN = 4
+_WORD = re.compile(r"\S+")
+_SENTENCE_END = ".!?…"
+
+def iter_chunk_spans(text: str, max_tokens: int, overlap_tokens: int = 0) -> Iterator[Tuple[int, int]]:
+    """Genera tramos (inicio, fin) de `text` de a lo sumo `max_tokens` estimados, solapados `overlap_tokens`.
+
+    Los cortes caen entre palabras y, si no se pierde más de medio tramo, al final de una oración.
+    Se devuelven posiciones y no copias, así cada fragmento se reconstruye como text[inicio:fin].
+    """
+    text = text or ""
+    budget = max(1, max_tokens) * CHARS_PER_TOKEN
+    if len(text) <= budget:
+        yield 0, len(text)
+        return
+    # El solape nunca llega a medio tramo: cada fragmento avanza sobre el anterior
+    overlap = min(max(0, overlap_tokens), max(1, max_tokens) // 2) * CHARS_PER_TOKEN
+    words = [m.span() for m in _WORD.finditer(text)]
+
+    i = 0
+    while i < len(words):
+        start = words[i][0]
+        j, sentence_end = i, None
+        while j < len(words) and words[j][1] - start <= budget:
+            if text[words[j][1] - 1] in _SENTENCE_END:
+                sentence_end = j
+            j += 1
+
+        if j == i:
+            # Una "palabra" más larga que el tramo (URLs, tablas): se corta en seco
+            end = start + budget
+            yield start, end
+            words[i] = (end, words[i][1])
+            continue
+
+        if j < len(words) and sentence_end is not None and words[sentence_end][1] - start >= budget // 2:
+            j = sentence_end + 1
+        end = words[j - 1][1]
+        yield start, end
+        if j == len(words):
+            return
+
+        # El siguiente arranca en la primera palabra dentro de la ventana de solape (siempre después de `i`)
+        k = j
+        while k - 1 > i and end - words[k - 1][0] <= overlap:
+            k -= 1
+        i = k
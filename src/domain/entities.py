@@ -1,12 +1,104 @@
+from array import array
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Any, ClassVar, Dict, List, Optional, Sequence
 
-@dataclass
+@dataclass(slots=True)
 class Insight:
     title: str
     content: str
     category: str
     url: Optional[str] = None
-    embedding: Optional[List[float]] = field(default=None)
+    # array('f') contiguo: ~4 bytes por dimensión frente a ~32 de un List[float]
+    embedding: Optional[array] = field(default=None)
     relevance: Optional[str] = None
     id: Optional[int] = None
+    # Hash del texto vectorizado (ver domain.hashing.content_hash): detecta ediciones sin re-vectorizar todo
+    content_hash: Optional[str] = None
+    # Fragmentos de artículos largos (ver domain.chunking); `embedding` queda como el promedio de los suyos
+    chunks: Optional[List["Chunk"]] = None
+
+    def __post_init__(self):
+        if self.embedding is not None and not isinstance(self.embedding, array):
+            self.embedding = to_float_array(self.embedding)
+
+@dataclass(slots=True)
+class Chunk:
+    """Tramo content[start:end] de un artículo con su propio embedding."""
+    index: int
+    start: int
+    end: int
+    embedding: Optional[array] = None
+
+    def __post_init__(self):
+        if self.embedding is not None and not isinstance(self.embedding, array):
+            self.embedding = to_float_array(self.embedding)
+
+def to_float_array(values: Sequence[float]) -> array:
+    """Convierte una lista o un ndarray en array('f') sin pasar por objetos float de Python."""
+    if hasattr(values, "astype"):
+        return array("f", values.astype("float32", copy=False).tobytes())
+    return array("f", values)
+
+@dataclass(frozen=True, slots=True)
+class InsightView:
+    """Proyección ligera para la UI: sin cuerpo completo ni embedding (el texto se pide aparte por `url`)."""
+    SNIPPET_CHARS: ClassVar[int] = 300
+
+    title: str
+    category: str
+    url: Optional[str] = None
+    snippet: str = ""
+    id: Optional[int] = None
+    relevance: Optional[str] = None
+
+    @staticmethod
+    def _snippet(content: str) -> str:
+        content = content or ""
+        return content[:InsightView.SNIPPET_CHARS] + "..." if len(content) > InsightView.SNIPPET_CHARS else content
+
+    @classmethod
+    def from_insight(cls, insight: Insight) -> "InsightView":
+        return cls(insight.title, insight.category, insight.url, cls._snippet(insight.content), insight.id, insight.relevance)
+
+    @classmethod
+    def from_article(cls, item: dict) -> "InsightView":
+        return cls(item.get("title", ""), item.get("category", ""), item.get("url"), cls._snippet(item.get("content", "")))
+
+@dataclass
+class WriteReport:
+    inserted: int = 0
+    skipped: int = 0
+    failed: int = 0
+    updated: int = 0
+
+    def merge(self, other: "WriteReport") -> "WriteReport":
+        return WriteReport(self.inserted + other.inserted, self.skipped + other.skipped, self.failed + other.failed,
+                           self.updated + other.updated)
+
+@dataclass
+class IngestionReport:
+    summary: str
+    # Artículos crudos (dict) al salir del pipeline; InsightView una vez compactado para persistir/mostrar
+    articles: List[Any] = field(default_factory=list)
+    from_cache: bool = False
+
+    def compact(self) -> "IngestionReport":
+        """Copia con los artículos proyectados a InsightView: su tamaño no depende del cuerpo de las noticias."""
+        views = [a if isinstance(a, InsightView) else InsightView.from_article(a) for a in self.articles]
+        return IngestionReport(self.summary, views, self.from_cache)
+
+@dataclass
+class IngestionJob:
+    id: int
+    status: str  # queued | running | succeeded | failed
+    source: str
+    requested_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    report: Optional[IngestionReport] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
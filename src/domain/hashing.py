@@ -0,0 +1,6 @@
+import hashlib
+
+def content_hash(text: str) -> str:
+    """Hash estable del contenido de un artículo (ignora diferencias de espacios en blanco)."""
+    normalized = " ".join((text or "").split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
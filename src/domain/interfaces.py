@@ -1,12 +1,22 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
-from .entities import Insight
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from .entities import Insight, WriteReport
 
 class EmbeddingService(ABC):
     @abstractmethod
     def generate_embedding(self, text: str, task_type: str = "RETRIEVAL_DOCUMENT") -> List[float]:
         pass
 
+    def generate_embeddings(self, texts: List[str], task_type: str = "RETRIEVAL_DOCUMENT") -> List[Optional[List[float]]]:
+        """Genera embeddings para varios textos preservando el orden. Los ítems que fallan se devuelven como None."""
+        embeddings = []
+        for text in texts:
+            try:
+                embeddings.append(self.generate_embedding(text, task_type=task_type))
+            except Exception:
+                embeddings.append(None)
+        return embeddings
+
 class VectorDatabase(ABC):
     @abstractmethod
     def insert_insights(self, insights: List[Insight]) -> None:
@@ -20,13 +30,70 @@ class VectorDatabase(ABC):
     def get_existing_urls(self, urls: List[str]) -> List[str]:
         pass
 
+    @abstractmethod
+    def list_urls(self) -> List[str]:
+        """Todas las URLs almacenadas (para reconstruir índices locales)."""
+        pass
+
+    @abstractmethod
+    def list_insights(self) -> Iterator[Insight]:
+        """Todos los insights almacenados, sin embedding (para reconstruir índices locales)."""
+        pass
+
+    def get_content_hashes(self, urls: List[str]) -> Dict[str, Optional[str]]:
+        """Hash del contenido guardado para cada URL existente (None si la fila no lo tiene).
+
+        Por defecto solo sabe qué URLs existen: sin hash, una noticia existente se da por no modificada.
+        """
+        return {url: None for url in self.get_existing_urls(urls)}
+
+    @abstractmethod
+    def update_insights(self, insights: List[Insight]) -> WriteReport:
+        """Reemplaza texto, embedding y hash de filas existentes (por URL); las que no existan se insertan."""
+        pass
+
+    @abstractmethod
+    def get_insight(self, url: str) -> Optional[Insight]:
+        """Un insight completo (con su texto) por URL; la UI lo pide solo cuando el usuario lo abre."""
+        pass
+
+    def upsert_insights(self, insights: List[Insight]) -> WriteReport:
+        """Inserta solo los insights cuya URL no existe todavía y devuelve cuántos se insertaron/omitieron."""
+        existing = set(self.get_existing_urls([i.url for i in insights if i.url]))
+        new = [i for i in insights if i.url not in existing]
+        if new:
+            self.insert_insights(new)
+        return WriteReport(inserted=len(new), skipped=len(insights) - len(new))
+
 class LLMService(ABC):
     @abstractmethod
     def generate_summary(self, texts: List[str]) -> str:
         """Genera un resumen analítico correlacionando los textos proporcionados."""
         pass
 
+    def stream_summary(self, texts: List[str]) -> Iterator[str]:
+        """Como `generate_summary`, pero entrega el texto en fragmentos a medida que se genera."""
+        yield self.generate_summary(texts)
+
+    def summarize_article(self, title: str, content: str) -> str:
+        """Resume un único artículo (fase "map" del resumen jerárquico)."""
+        return content[:1000]
+
+    def summarize_articles(self, articles: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """Resume varios (título, texto) en una sola llamada cuando el proveedor lo permite; None si uno falla."""
+        summaries = []
+        for title, content in articles:
+            try:
+                summaries.append(self.summarize_article(title, content))
+            except Exception:
+                summaries.append(None)
+        return summaries
+
     @abstractmethod
     def explain_relevance(self, query: str, insights: List[Any]) -> List[str]:
         """Genera una breve explicación de por qué cada insight es relevante para la query."""
         pass
+
+    def stream_explanations(self, query: str, insights: List[Any]) -> Iterator[Tuple[int, str]]:
+        """Entrega (índice, explicación) en cuanto cada explicación está completa."""
+        yield from enumerate(self.explain_relevance(query, insights))
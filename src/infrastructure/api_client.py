@@ -1,52 +1,164 @@
 import httpx
 import logging
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator, List, Optional
 from src.config.settings import settings
+from src.infrastructure.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
 class DataProvider:
+    BASE_URL = "https://content.guardianapis.com/search"
+
+    # Cliente compartido por todo el proceso: reutiliza conexiones (keep-alive) entre páginas y ejecuciones
+    _client: Optional[httpx.Client] = None
+    _client_lock = threading.Lock()
+
+    @classmethod
+    def _get_client(cls) -> httpx.Client:
+        with cls._client_lock:
+            if cls._client is None:
+                limits = httpx.Limits(
+                    max_connections=settings.GUARDIAN_MAX_CONCURRENCY,
+                    max_keepalive_connections=settings.GUARDIAN_MAX_CONCURRENCY,
+                )
+                cls._client = httpx.Client(timeout=10.0, limits=limits)
+            return cls._client
+
     @staticmethod
-    def fetch_data():
-        """Extrae noticias de tecnología y negocios de The Guardian de las últimas 24 horas."""
-        
-        # 1. Calcular rango de fechas (últimos 3 días para asegurar volumen)
-        today = datetime.now()
-        three_days_ago = (today - timedelta(days=3)).strftime('%Y-%m-%d')
-        today_str = today.strftime('%Y-%m-%d')
-        
-        url = "https://content.guardianapis.com/search"
-        
-        params = {
+    def _build_params(window: dict, page: int) -> dict:
+        return {
             "api-key": settings.GUARDIAN_API_KEY,
             "section": "technology|business",
-            "from-date": three_days_ago,
-            "to-date": today_str,
             "q": "technology OR business OR economy OR ai OR tech",
-            "show-fields": "bodyText",
-            "page-size": 50 # Pedimos 50 para asegurar mínimo 30 útiles
+            "show-fields": "bodyText,lastModified",
+            "page-size": settings.GUARDIAN_PAGE_SIZE,
+            "page": page,
+            **window,
+        }
+
+    @staticmethod
+    def _build_window(since: Optional[datetime]) -> dict:
+        if since is None:
+            # 1. Calcular rango de fechas (últimos RECENT_WINDOW_DAYS días para asegurar volumen)
+            today = datetime.now()
+            return {
+                "from-date": (today - timedelta(days=settings.RECENT_WINDOW_DAYS)).strftime('%Y-%m-%d'),
+                "to-date": today.strftime('%Y-%m-%d'),
+                "order-by": "newest",
+            }
+
+        # Ingesta incremental: desde la marca de agua (con solape) y por fecha de modificación, filtrando y
+        # ordenando por esa misma fecha (order-date), de lo más antiguo a lo más nuevo
+        overlap = timedelta(minutes=settings.WATERMARK_OVERLAP_MINUTES)
+        return {
+            "from-date": (since.astimezone(timezone.utc) - overlap).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "use-date": "last-modified",
+            "order-date": "last-modified",
+            "order-by": "oldest",
         }
 
+    @staticmethod
+    def _normalize(art: dict) -> dict:
+        return {
+            "title": art.get("webTitle"),
+            "content": art.get("fields", {}).get("bodyText", ""),
+            "category": art.get("sectionName"),
+            "url": art.get("webUrl"),
+            "published_at": art.get("webPublicationDate"),
+            "last_modified": art.get("fields", {}).get("lastModified"),
+        }
+
+    @staticmethod
+    def _modified_at(art: dict) -> Optional[datetime]:
+        value = art.get("fields", {}).get("lastModified")
         try:
-            logger.info(f"Conectando a The Guardian API ({three_days_ago} a {today_str})")
-            response = httpx.get(url, params=params, timeout=10.0)
+            return datetime.fromisoformat(value) if value else None
+        except ValueError:
+            return None
+
+    @classmethod
+    def _fetch_page(cls, window: dict, page: int) -> dict:
+        with metrics.span("guardian.fetch_page"):
+            response = cls._get_client().get(cls.BASE_URL, params=cls._build_params(window, page))
             response.raise_for_status()
-            
-            data = response.json()
-            results = data.get("response", {}).get("results", [])
-            
-            formatted_data = []
-            for art in results:
-                formatted_data.append({
-                    "title": art.get("webTitle"),
-                    "content": art.get("fields", {}).get("bodyText", ""),
-                    "category": art.get("sectionName"),
-                    "url": art.get("webUrl")
-                })
-            
-            logger.info(f"Se extrajeron {len(formatted_data)} noticias exitosamente.")
-            return formatted_data
+        metrics.observe("guardian.response_bytes", len(response.content))
+        return response.json().get("response", {})
 
+    @classmethod
+    def iter_articles(cls, since: Optional[datetime] = None, on_error: Optional[Callable[[Exception], None]] = None) -> Iterator[dict]:
+        """Recorre todas las páginas de resultados y produce artículos normalizados a medida que llegan.
+
+        Sin `since` se usa una ventana fija de RECENT_WINDOW_DAYS días; con `since` solo se pide lo modificado desde esa
+        marca de agua. `on_error` se invoca por cada página que no se pudo obtener.
+
+        Si la ingesta incremental supera GUARDIAN_MAX_PAGES solo se entregan artículos modificados hasta
+        la última modificación de la última página leída: la marca de agua (la modificación más nueva
+        vista) no puede saltar por encima de las páginas que quedaron sin pedir.
+        """
+        window = cls._build_window(since)
+
+        try:
+            logger.info(f"Conectando a The Guardian API (desde {window['from-date']})")
+            first = cls._fetch_page(window, 1)
         except Exception as e:
             logger.error(f"Error al extraer datos de The Guardian: {e}")
-            return []
\ No newline at end of file
+            if on_error:
+                on_error(e)
+            return
+
+        pages = min(first.get("pages", 1), settings.GUARDIAN_MAX_PAGES)
+        ceiling, last, prefetched = None, [], False
+        if since is not None and first.get("pages", 1) > pages:
+            prefetched = True
+            logger.warning(f"La ingesta incremental supera {pages} páginas: el resto se leerá en la próxima ejecución.")
+            metrics.inc("guardian.truncated")
+            # Leemos primero la última página para saber hasta qué modificación llega lo que sí se pidió
+            try:
+                last = first.get("results", []) if pages == 1 else cls._fetch_page(window, pages).get("results", [])
+                ceiling = max(filter(None, map(cls._modified_at, last)), default=None)
+            except Exception as e:
+                # La página fallida ya impide avanzar la marca de agua: no hace falta recortar
+                logger.error(f"Error al extraer la página {pages} de The Guardian: {e}")
+                if on_error:
+                    on_error(e)
+
+        def emit(results: List[dict]) -> Iterator[dict]:
+            for art in results:
+                modified = cls._modified_at(art)
+                if ceiling is None or modified is None or modified <= ceiling:
+                    yield cls._normalize(art)
+
+        yield from emit(first.get("results", []))
+
+        # 2. El resto de páginas se piden en paralelo y se entregan en orden de llegada
+        if pages <= 1:
+            return
+        yield from emit(last)
+        remaining = range(2, pages) if prefetched else range(2, pages + 1)
+
+        executor = ThreadPoolExecutor(max_workers=settings.GUARDIAN_MAX_CONCURRENCY)
+        try:
+            futures = {executor.submit(cls._fetch_page, window, page): page for page in remaining}
+            for future in as_completed(futures):
+                try:
+                    results = future.result().get("results", [])
+                except Exception as e:
+                    # Una página fallida no invalida las demás
+                    logger.error(f"Error al extraer la página {futures[future]} de The Guardian: {e}")
+                    if on_error:
+                        on_error(e)
+                    continue
+                yield from emit(results)
+        finally:
+            # Si el consumidor deja de iterar, no esperamos a las páginas pendientes
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def fetch_data(cls) -> List[dict]:
+        """Extrae noticias de tecnología y negocios de The Guardian (todas las páginas, materializadas en una lista)."""
+        formatted_data = list(cls.iter_articles())
+        logger.info(f"Se extrajeron {len(formatted_data)} noticias exitosamente.")
+        return formatted_data
@@ -1,34 +1,195 @@
-from supabase import create_client, Client
-from typing import List
+import functools
+from typing import Dict, Iterator, List, Optional, Tuple
 from src.domain.interfaces import VectorDatabase
-from src.domain.entities import Insight
+from src.domain.entities import Chunk, Insight, WriteReport
+from src.domain.hashing import content_hash
 from src.config.settings import settings
+from src.infrastructure.metrics import metrics
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 class SupabaseDatabase(VectorDatabase):
+    """Tabla `tech_insights` (una fila por artículo) y, opcionalmente, una tabla de fragmentos.
+
+    Con SUPABASE_CHUNKS_TABLE configurada cada fragmento se guarda con el id de su artículo y la búsqueda
+    usa la RPC `match_insight_chunks` (tabla y función en migrations/003_insight_chunks.sql). Sin ella,
+    el embedding del artículo es el promedio de sus fragmentos y se busca con `match_insights` como siempre.
+    """
+
+    # Pasa a False si la tabla no tiene la columna `content_hash` (migrations/002_content_hash.sql sin aplicar)
+    content_hash_column = True
+
     def __init__(self):
-        self.client: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
         self.table_name = settings.TABLE_NAME
+        self.chunks_table = settings.SUPABASE_CHUNKS_TABLE
+
+    @functools.cached_property
+    def client(self):
+        # supabase (y postgrest/httpx) se importan en la primera consulta, no al arrancar la app
+        from supabase import create_client
+        return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+
+    @staticmethod
+    def _to_row(i: Insight) -> dict:
+        return {
+            "title": i.title,
+            "content": i.content,
+            "category": i.category,
+            "url": i.url,
+            "embedding": i.embedding.tolist() if i.embedding is not None else None,
+            # Columna de migrations/002_content_hash.sql; si no existe se quita antes de escribir
+            "content_hash": i.content_hash or content_hash(i.content),
+        }
+
+    def _rows(self, insights: List[Insight]) -> List[dict]:
+        rows = [self._to_row(i) for i in insights]
+        return rows if self.content_hash_column else self._without_hash(rows)
+
+    @staticmethod
+    def _without_hash(rows: List[dict]) -> List[dict]:
+        return [{k: v for k, v in row.items() if k != "content_hash"} for row in rows]
+
+    def _missing_hash_column(self, error: Exception) -> bool:
+        """True (y se deja de enviar la columna) si el error es de PostgREST/Postgres por `content_hash` inexistente."""
+        if not self.content_hash_column or "content_hash" not in str(error):
+            return False
+        self.content_hash_column = False
+        logger.warning(
+            f"La tabla {self.table_name} no tiene la columna content_hash: se escribe sin ella y los cambios "
+            f"de contenido se detectan releyendo el texto. Aplique migrations/002_content_hash.sql."
+        )
+        return True
 
     def insert_insights(self, insights: List[Insight]) -> None:
-        data = [
-            {
-                "title": i.title,
-                "content": i.content,
-                "category": i.category,
-                "url": i.url,
-                "embedding": i.embedding
-            }
-            for i in insights
-        ]
+        data = self._rows(insights)
         self.client.table(self.table_name).insert(data).execute()
 
+    def upsert_insights(self, insights: List[Insight]) -> WriteReport:
+        """Upsert por `url` en tramos acotados por filas y bytes; cada tramo se reintenta por separado."""
+        report, written = WriteReport(), []
+        for chunk in self._chunk_rows(self._rows(insights)):
+            chunk_report, rows = self._upsert_chunk(chunk)
+            report = report.merge(chunk_report)
+            written.extend(rows)
+        self._assign_ids(insights, written)
+        self._write_chunks(insights, written)
+        return report
+
+    def update_insights(self, insights: List[Insight]) -> WriteReport:
+        """Upsert que sí sobrescribe las filas existentes (texto, embedding y hash) de las noticias editadas."""
+        report, written = WriteReport(), []
+        for chunk in self._chunk_rows(self._rows(insights)):
+            chunk_report, rows = self._upsert_chunk(chunk, overwrite=True)
+            report = report.merge(chunk_report)
+            written.extend(rows)
+        self._assign_ids(insights, written)
+        self._write_chunks(insights, written)
+        return report
+
+    @staticmethod
+    def _assign_ids(insights: List[Insight], rows: List[dict]) -> None:
+        # El upsert devuelve las filas escritas: su id viaja con el Insight (p. ej. al índice léxico)
+        ids = {row['url']: row['id'] for row in rows if row.get('url') and row.get('id') is not None}
+        for insight in insights:
+            if insight.url in ids:
+                insight.id = ids[insight.url]
+
+    def _write_chunks(self, insights: List[Insight], written: List[dict]) -> None:
+        """Reemplaza los fragmentos de los artículos que el upsert escribió de verdad (`written`, las filas
+        que devolvió); las URLs omitidas o de tramos fallidos conservan sus fragmentos."""
+        urls = {row.get('url') for row in written}
+        insights = [i for i in insights if i.url and i.url in urls and i.embedding is not None]
+        if not self.chunks_table or not insights:
+            return
+        try:
+            ids = {i.url: i.id for i in insights if i.id is not None}
+            missing = [i.url for i in insights if i.id is None]
+            if missing:
+                ids.update(self._ids_by_url(missing))
+            parent_ids = list(ids.values())
+            for start in range(0, len(parent_ids), settings.SUPABASE_IN_FILTER_SIZE):
+                self.client.table(self.chunks_table).delete().in_("parent_id", parent_ids[start:start + settings.SUPABASE_IN_FILTER_SIZE]).execute()
+            rows = [
+                {
+                    "parent_id": ids[i.url],
+                    "chunk_index": c.index,
+                    "content": i.content[c.start:c.end],
+                    "embedding": c.embedding.tolist(),
+                }
+                # Un artículo de un solo fragmento también tiene su fila: la búsqueda solo mira esta tabla
+                for i in insights if i.url in ids
+                for c in (i.chunks or [Chunk(0, 0, len(i.content), i.embedding)])
+            ]
+            for chunk in self._chunk_rows(rows):
+                with metrics.span("supabase.insert_chunks"):
+                    self.client.table(self.chunks_table).insert(chunk).execute()
+        except Exception as e:
+            metrics.inc("supabase.chunk_write_failed", len(insights))
+            logger.error(f"No se pudieron guardar los fragmentos de {len(insights)} noticias: {e}")
+
+    def _ids_by_url(self, urls: List[str]) -> Dict[str, int]:
+        ids: Dict[str, int] = {}
+        for start in range(0, len(urls), settings.SUPABASE_IN_FILTER_SIZE):
+            result = self.client.table(self.table_name).select("id, url").in_("url", urls[start:start + settings.SUPABASE_IN_FILTER_SIZE]).execute()
+            ids.update((item['url'], item['id']) for item in result.data or [])
+        return ids
+
+    def _upsert_chunk(self, rows: List[dict], overwrite: bool = False) -> Tuple[WriteReport, List[dict]]:
+        """Escribe un tramo y devuelve su balance junto con las filas que la base confirma como escritas."""
+        metrics.observe("supabase.upsert_rows", len(rows))
+        if not self.content_hash_column:
+            rows = self._without_hash(rows)
+        for attempt in range(settings.SUPABASE_WRITE_RETRIES):
+            try:
+                # Requiere el índice único de migrations/001_unique_url.sql.
+                # ignore_duplicates: las URLs existentes se omiten y solo vuelven las filas insertadas.
+                # Con overwrite se actualizan: no distinguimos insertadas de actualizadas, todas cuentan como updated
+                with metrics.span("supabase.upsert"):
+                    result = self.client.table(self.table_name).upsert(
+                        rows, on_conflict="url", ignore_duplicates=not overwrite
+                    ).execute()
+                data = result.data or []
+                if overwrite:
+                    return WriteReport(updated=len(rows)), data
+                return WriteReport(inserted=len(data), skipped=len(rows) - len(data)), data
+            except Exception as e:
+                if self._missing_hash_column(e):
+                    # Base sin migrar: el mismo tramo sin la columna (no consume un reintento)
+                    return self._upsert_chunk(rows, overwrite)
+                metrics.inc("supabase.retries", operation="upsert")
+                logger.warning(f"Intento {attempt + 1}/{settings.SUPABASE_WRITE_RETRIES} de upsert fallido ({len(rows)} filas): {e}")
+                if attempt < settings.SUPABASE_WRITE_RETRIES - 1:
+                    time.sleep(2 ** attempt)
+        logger.error(f"Se descartó un tramo de {len(rows)} filas tras {settings.SUPABASE_WRITE_RETRIES} intentos.")
+        return WriteReport(failed=len(rows)), []
+
+    @staticmethod
+    def _chunk_rows(rows: List[dict]) -> Iterator[List[dict]]:
+        # Estimamos el tamaño de cada fila serializada para no superar el límite del request
+        chunk, chunk_bytes = [], 0
+        for row in rows:
+            row_bytes = len(json.dumps(row, ensure_ascii=False).encode("utf-8"))
+            if chunk and (len(chunk) >= settings.SUPABASE_UPSERT_MAX_ROWS or chunk_bytes + row_bytes > settings.SUPABASE_UPSERT_MAX_BYTES):
+                yield chunk
+                chunk, chunk_bytes = [], 0
+            chunk.append(row)
+            chunk_bytes += row_bytes
+        if chunk:
+            yield chunk
+
     def search_insights(self, query_embedding: List[float], threshold: float = 0.5, count: int = 5) -> List[Insight]:
-        result = self.client.rpc("match_insights", {
-            "query_embedding": query_embedding,
-            "match_threshold": threshold,
-            "match_count": count
-        }).execute()
-        
+        if self.chunks_table:
+            return self._search_chunks(query_embedding, threshold, count)
+        with metrics.span("supabase.match_insights"):
+            result = self.client.rpc("match_insights", {
+                "query_embedding": query_embedding,
+                "match_threshold": threshold,
+                "match_count": count
+            }).execute()
+
         insights = []
         if result.data:
             for item in result.data:
@@ -41,14 +202,118 @@ class SupabaseDatabase(VectorDatabase):
                 ))
         return insights
 
+    def _search_chunks(self, query_embedding: List[float], threshold: float, count: int) -> List[Insight]:
+        # Pedimos más fragmentos que resultados y nos quedamos con el primero (el mejor) de cada artículo
+        with metrics.span("supabase.match_insight_chunks"):
+            result = self.client.rpc("match_insight_chunks", {
+                "query_embedding": query_embedding,
+                "match_threshold": threshold,
+                "match_count": count * max(1, settings.CHUNK_SEARCH_FANOUT)
+            }).execute()
+
+        insights, seen = [], set()
+        for item in result.data or []:
+            if item['parent_id'] in seen:
+                continue
+            seen.add(item['parent_id'])
+            insights.append(Insight(
+                title=item['title'],
+                content=item['content'],
+                category=item['category'],
+                url=item.get('url'),
+                id=item['parent_id']
+            ))
+            if len(insights) == count:
+                break
+        return insights
+
     def get_existing_urls(self, urls: List[str]) -> List[str]:
         if not urls:
             return []
-        
-        # Filtramos en la base de datos qué URLs de la lista ya existen
+
+        # Filtramos en la base de datos qué URLs de la lista ya existen (por tramos para no generar un `in_` gigante)
+        existing = []
         try:
-            result = self.client.table(self.table_name).select("url").in_("url", urls).execute()
-            return [item['url'] for item in result.data] if result.data else []
+            for start in range(0, len(urls), settings.SUPABASE_IN_FILTER_SIZE):
+                chunk = urls[start:start + settings.SUPABASE_IN_FILTER_SIZE]
+                with metrics.span("supabase.get_existing_urls"):
+                    result = self.client.table(self.table_name).select("url").in_("url", chunk).execute()
+                existing.extend(item['url'] for item in result.data or [])
+            return existing
         except Exception as e:
             print(f"Error checking existing URLs: {e}")
-            return []
+            return existing
+
+    def get_content_hashes(self, urls: List[str]) -> Dict[str, Optional[str]]:
+        """Hash guardado por URL; las filas anteriores a la columna `content_hash` lo derivan de su texto."""
+        hashes: Dict[str, Optional[str]] = {}
+        try:
+            for start in range(0, len(urls), settings.SUPABASE_IN_FILTER_SIZE):
+                chunk = urls[start:start + settings.SUPABASE_IN_FILTER_SIZE]
+                rows = self._stored_hashes(chunk)
+                hashes.update((item['url'], item.get('content_hash')) for item in rows)
+                legacy = [item['url'] for item in rows if not item.get('content_hash')]
+                if legacy:
+                    # Solo para filas sin hash traemos el texto; el hash calculado se guarda para no repetirlo
+                    result = self.client.table(self.table_name).select("url, content").in_("url", legacy).execute()
+                    computed = {item['url']: content_hash(item['content']) for item in result.data or []}
+                    hashes.update(computed)
+                    self._store_hashes(computed)
+            return hashes
+        except Exception as e:
+            # Igual que get_existing_urls: lo no comprobado se trata como nuevo y el upsert omite duplicados
+            print(f"Error checking content hashes: {e}")
+            return hashes
+
+    def _stored_hashes(self, urls: List[str]) -> List[dict]:
+        """Filas {url, content_hash} existentes; sin la columna todas vuelven sin hash."""
+        if self.content_hash_column:
+            try:
+                with metrics.span("supabase.get_content_hashes"):
+                    return self.client.table(self.table_name).select("url, content_hash").in_("url", urls).execute().data or []
+            except Exception as e:
+                if not self._missing_hash_column(e):
+                    raise
+        result = self.client.table(self.table_name).select("url").in_("url", urls).execute()
+        return [{'url': item['url'], 'content_hash': None} for item in result.data or []]
+
+    def _store_hashes(self, hashes: Dict[str, str]) -> None:
+        # Relleno perezoso de filas antiguas: si falla, la próxima ejecución lo vuelve a intentar
+        if not self.content_hash_column:
+            return
+        try:
+            for url, value in hashes.items():
+                self.client.table(self.table_name).update({"content_hash": value}).eq("url", url).execute()
+            metrics.inc("supabase.content_hash_backfilled", len(hashes))
+        except Exception as e:
+            if not self._missing_hash_column(e):
+                logger.warning(f"No se pudieron guardar los hashes de {len(hashes)} filas antiguas: {e}")
+
+    def list_urls(self) -> List[str]:
+        # Paginamos con range() porque PostgREST limita las filas por respuesta
+        urls, page_size, start = [], 1000, 0
+        while True:
+            result = self.client.table(self.table_name).select("url").order("id").range(start, start + page_size - 1).execute()
+            rows = result.data or []
+            urls.extend(item['url'] for item in rows if item.get('url'))
+            if len(rows) < page_size:
+                return urls
+            start += page_size
+
+    def get_insight(self, url: str) -> Optional[Insight]:
+        result = self.client.table(self.table_name).select("id, title, content, category, url").eq("url", url).limit(1).execute()
+        if not result.data:
+            return None
+        item = result.data[0]
+        return Insight(title=item['title'], content=item['content'], category=item['category'], url=item.get('url'), id=item.get('id'))
+
+    def list_insights(self) -> Iterator[Insight]:
+        start, page_size = 0, 1000
+        while True:
+            result = self.client.table(self.table_name).select("id, title, content, category, url").order("id").range(start, start + page_size - 1).execute()
+            rows = result.data or []
+            for item in rows:
+                yield Insight(title=item['title'], content=item['content'], category=item['category'], url=item.get('url'), id=item.get('id'))
+            if len(rows) < page_size:
+                return
+            start += page_size
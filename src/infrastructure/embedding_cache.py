@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional
+from src.domain.interfaces import EmbeddingService
+from src.config.settings import settings
+from src.infrastructure.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class CachedEmbeddingService(EmbeddingService):
+    """Decorador de EmbeddingService con caché persistente en SQLite direccionada por contenido.
+
+    La clave es (modelo, task_type, sha256 del texto) y los vectores se guardan como blobs float32.
+    Cuando el tamaño total supera `max_bytes` se eliminan las entradas usadas hace más tiempo (LRU).
+    """
+
+    def __init__(self, inner: EmbeddingService, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.inner = inner
+        self.model_name = getattr(inner, "model_name", type(inner).__name__)
+        self.path = path or settings.EMBEDDING_CACHE_PATH
+        self.max_bytes = max_bytes if max_bytes is not None else settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._clock = 0.0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                task_type TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, task_type, text_hash)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def _tick(self) -> float:
+        # Reloj estrictamente creciente para que el orden LRU no dependa de la resolución de time.time()
+        self._clock = max(time.time(), self._clock + 1e-6)
+        return self._clock
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def generate_embedding(self, text: str, task_type: str = "RETRIEVAL_DOCUMENT") -> List[float]:
+        emb = self.generate_embeddings([text], task_type=task_type)[0]
+        if emb is None:
+            raise RuntimeError("No se pudo generar el embedding.")
+        return emb
+
+    def generate_embeddings(self, texts: List[str], task_type: str = "RETRIEVAL_DOCUMENT") -> List[Optional[List[float]]]:
+        if not texts:
+            return []
+
+        hashes = [self._hash(t) for t in texts]
+        cached = self._get_many(task_type, hashes)
+        embeddings: List[Optional[List[float]]] = [cached.get(h) for h in hashes]
+
+        # Solo vamos a la red por los textos que no están en caché (sin repetir duplicados)
+        missing = {}
+        for i, h in enumerate(hashes):
+            if embeddings[i] is None and h not in missing:
+                missing[h] = i
+
+        hits = len(texts) - sum(1 for e in embeddings if e is None)
+        self.hits += hits
+        self.misses += len(missing)
+        metrics.inc("cache.hits", hits, cache="embeddings")
+        metrics.inc("cache.misses", len(missing), cache="embeddings")
+
+        if missing:
+            fresh = self.inner.generate_embeddings([texts[i] for i in missing.values()], task_type=task_type)
+            new_entries = {h: emb for h, emb in zip(missing, fresh) if emb is not None}
+            self._put_many(task_type, new_entries)
+            for i, h in enumerate(hashes):
+                if embeddings[i] is None:
+                    embeddings[i] = new_entries.get(h)
+
+        return embeddings
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size_bytes": self._size,
+        }
+
+    def _get_many(self, task_type: str, hashes: List[str]) -> dict:
+        unique = list(set(hashes))
+        found = {}
+        with self._lock:
+            # SQLite limita la cantidad de parámetros por query, así que consultamos por tramos
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND task_type = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, task_type, *chunk],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = array("f", blob).tolist()
+
+            if found:
+                now = self._tick()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND task_type = ? AND text_hash = ?",
+                    [(now, self.model_name, task_type, h) for h in found],
+                )
+                self._conn.commit()
+        return found
+
+    def _put_many(self, task_type: str, entries: dict) -> None:
+        if not entries:
+            return
+        now = self._tick()
+        rows = [(self.model_name, task_type, h, array("f", emb).tobytes(), now) for h, emb in entries.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, task_type, text_hash, vector, last_access) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._size += sum(len(r[3]) for r in rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        # LRU por tamaño: borramos las entradas menos usadas hasta volver a estar por debajo del límite
+        if self._size <= self.max_bytes:
+            return
+        self._size = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        cursor = self._conn.execute("SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_access ASC")
+        to_delete = []
+        for rowid, size in cursor:
+            if self._size <= self.max_bytes:
+                break
+            to_delete.append((rowid,))
+            self._size -= size
+        self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", to_delete)
+        logger.info(f"Caché de embeddings: {len(to_delete)} entradas eliminadas por LRU.")
@@ -1,22 +1,107 @@
-from google import genai
-from typing import List
+import functools
+from typing import Iterator, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from src.domain.interfaces import EmbeddingService
+from src.infrastructure.rate_limiter import get_limiter, estimate_tokens, is_rate_limit_error
 from src.config.settings import settings
+import logging
+
+logger = logging.getLogger(__name__)
 
 class GeminiEmbeddingService(EmbeddingService):
     def __init__(self):
-        self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
         self.model_name = settings.EMBEDDING_MODEL
+        self.batch_size = settings.EMBEDDING_BATCH_SIZE
+        self.batch_max_tokens = settings.EMBEDDING_BATCH_MAX_TOKENS
+        self.max_concurrency = settings.EMBEDDING_MAX_CONCURRENCY
+        self.max_retries = settings.EMBEDDING_MAX_RETRIES
+        self.limiter = get_limiter("embedding")
+
+    @functools.cached_property
+    def client(self):
+        # El SDK tarda cientos de ms en importarse: lo cargamos en la primera llamada, no al arrancar
+        from google import genai
+        return genai.Client(api_key=settings.GEMINI_API_KEY)
 
     def generate_embedding(self, text: str, task_type: str = "RETRIEVAL_DOCUMENT") -> List[float]:
         try:
-            result = self.client.models.embed_content(
-                model=self.model_name,
-                contents=text,
-                config={'task_type': task_type}
+            # El limitador compartido reintenta los 429 respetando el retry-after
+            result = self.limiter.call(
+                lambda: self.client.models.embed_content(
+                    model=self.model_name,
+                    contents=text,
+                    config={'task_type': task_type}
+                ),
+                tokens=estimate_tokens(text),
+                max_retries=self.max_retries,
             )
             return result.embeddings[0].values
         except Exception as e:
             # Handle logging usage in real implementation
             print(f"Error generando embedding: {e}")
             raise e
+
+    def generate_embeddings(self, texts: List[str], task_type: str = "RETRIEVAL_DOCUMENT") -> List[Optional[List[float]]]:
+        if not texts:
+            return []
+
+        # Partimos en lotes (por número de textos y por tokens) y los enviamos en paralelo con un máximo de requests simultáneos
+        batches = list(pack_batches(texts, self.batch_size, self.batch_max_tokens))
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+            futures = {executor.submit(self._embed_batch, batch, task_type): start for start, batch in batches}
+            for future in as_completed(futures):
+                start = futures[future]
+                # Reubicamos cada resultado en su posición original
+                for offset, emb in enumerate(future.result()):
+                    embeddings[start + offset] = emb
+
+        return embeddings
+
+    def _embed_batch(self, texts: List[str], task_type: str) -> List[Optional[List[float]]]:
+        try:
+            result = self.limiter.call(
+                lambda: self.client.models.embed_content(
+                    model=self.model_name,
+                    contents=texts,
+                    config={'task_type': task_type}
+                ),
+                tokens=sum(estimate_tokens(t) for t in texts),
+                max_retries=self.max_retries,
+                # Un error que no es de cuota suele venir de un ítem concreto: pasamos directo al modo por ítem
+                retry_transient=False,
+            )
+            return [e.values for e in result.embeddings]
+        except Exception as e:
+            if is_rate_limit_error(e):
+                # Cuota agotada tras los reintentos: pedir ítem por ítem multiplicaría las requests justo cuando
+                # hay que frenar. El limitador ya redujo el ritmo; estos textos se reintentan en la próxima ejecución
+                logger.warning(f"Lote de {len(texts)} embeddings descartado por límite de cuota: {e}")
+                return [None] * len(texts)
+            # El lote falló: reintentamos ítem por ítem para aislar el texto problemático
+            logger.warning(f"Lote de {len(texts)} embeddings fallido, reintentando por ítem: {e}")
+            return [self._embed_single(text, task_type) for text in texts]
+
+    def _embed_single(self, text: str, task_type: str) -> Optional[List[float]]:
+        try:
+            return self.generate_embedding(text, task_type=task_type)
+        except Exception:
+            logger.error(f"Embedding descartado tras {self.max_retries} intentos.")
+            return None
+
+def pack_batches(texts: List[str], max_items: int, max_tokens: int) -> Iterator[Tuple[int, List[str]]]:
+    """Agrupa textos consecutivos en lotes (posición inicial, textos) sin superar `max_items` ni `max_tokens`.
+
+    Un texto que por sí solo excede `max_tokens` va en un lote propio (el chunker ya acota su tamaño).
+    """
+    start, batch, batch_tokens = 0, [], 0
+    for position, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            yield start, batch
+            start, batch, batch_tokens = position, [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        yield start, batch
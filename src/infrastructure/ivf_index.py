@@ -0,0 +1,126 @@
+import logging
+import os
+from typing import List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class IVFIndex:
+    """Índice IVF (inverted file) para búsqueda aproximada sobre vectores normalizados.
+
+    Los vectores se agrupan con k-means esférico; cada consulta solo escanea las `nprobe`
+    listas cuyos centroides son más parecidos a la query. Más `nprobe` = más recall y más latencia.
+    """
+
+    def __init__(self, directory: str):
+        self.centroids_path = os.path.join(directory, "ivf_centroids.npy")
+        self.assignments_path = os.path.join(directory, "ivf_assignments.i32")
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+
+        if os.path.exists(self.centroids_path):
+            self.centroids = np.load(self.centroids_path)
+            self._lists = [[] for _ in range(len(self.centroids))]
+            if os.path.exists(self.assignments_path):
+                assignments = np.fromfile(self.assignments_path, dtype=np.int32)
+                for row, c in enumerate(assignments):
+                    self._lists[c].append(row)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def size(self) -> int:
+        return sum(len(members) for members in self._lists)
+
+    def train(self, vectors: np.ndarray, n_lists: int, iterations: int = 20, seed: int = 0) -> None:
+        """Entrena los centroides y reasigna todas las filas (reconstrucción completa)."""
+        n_lists = max(1, min(n_lists, len(vectors)))
+        self.centroids = self._kmeans(vectors, n_lists, iterations, seed)
+        assignments = self._assign(vectors, self.centroids)
+
+        self._lists = [[] for _ in range(n_lists)]
+        for row, c in enumerate(assignments):
+            self._lists[c].append(row)
+
+        np.save(self.centroids_path, self.centroids)
+        assignments.astype(np.int32).tofile(self.assignments_path)
+        logger.info(f"IVF reconstruido: {len(vectors)} vectores en {n_lists} listas.")
+
+    def add(self, vectors: np.ndarray, start_row: int) -> None:
+        """Asigna filas nuevas a su lista más cercana sin reentrenar."""
+        assignments = self._assign(vectors, self.centroids)
+        for offset, c in enumerate(assignments):
+            self._lists[c].append(start_row + offset)
+        with open(self.assignments_path, "ab") as f:
+            f.write(assignments.astype(np.int32).tobytes())
+
+    def reassign(self, rows: List[int], vectors: np.ndarray) -> None:
+        """Mueve filas cuyo vector cambió a su lista más cercana (sin reentrenar)."""
+        assignments = self._assign(vectors, self.centroids)
+        moved = set(rows)
+        for members in self._lists:
+            members[:] = [row for row in members if row not in moved]
+        with open(self.assignments_path, "r+b") as f:
+            for row, c in zip(rows, assignments):
+                self._lists[c].append(row)
+                # El archivo guarda una lista por fila en orden: sobrescribimos solo esa posición
+                f.seek(row * 4)
+                f.write(np.int32(c).tobytes())
+        for members in self._lists:
+            members.sort()
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Filas de las `nprobe` listas más cercanas a la query."""
+        nprobe = max(1, min(nprobe, len(self.centroids)))
+        sims = self.centroids @ query
+        probe = np.argpartition(-sims, nprobe - 1)[:nprobe]
+        members = [self._lists[c] for c in probe if self._lists[c]]
+        if not members:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.asarray(m, dtype=np.int64) for m in members])
+
+    @staticmethod
+    def default_lists(n: int) -> int:
+        # Regla habitual: ~4·sqrt(n) listas
+        return max(1, int(4 * np.sqrt(n)))
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+        # Procesamos por tramos para no materializar una matriz n x k completa
+        out = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk):
+            out[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+        return out
+
+    @classmethod
+    def _kmeans(cls, vectors: np.ndarray, k: int, iterations: int, seed: int, max_train: int = 100_000) -> np.ndarray:
+        rng = np.random.default_rng(seed)
+        data = np.asarray(vectors, dtype=np.float32)
+        if len(data) > max_train:
+            data = data[rng.choice(len(data), max_train, replace=False)]
+
+        centroids = data[rng.choice(len(data), k, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = cls._assign(data, centroids)
+            counts = np.bincount(assignments, minlength=k)
+
+            # Suma por cluster ordenando por asignación (mucho más rápido que np.add.at)
+            order = np.argsort(assignments, kind="stable")
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            filled = counts > 0
+            sums = np.zeros_like(centroids)
+            sums[filled] = np.add.reduceat(data[order], starts[filled], axis=0)
+
+            # Las listas vacías se reinician con un punto aleatorio
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+                counts[empty] = 1
+
+            centroids = sums / counts[:, None]
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (centroids / norms).astype(np.float32)
+        return centroids
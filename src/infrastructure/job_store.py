@@ -0,0 +1,142 @@
+import json
+import os
+from dataclasses import asdict
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+from src.domain.entities import IngestionJob, IngestionReport, InsightView
+from src.config.settings import settings
+
+class JobStore:
+    """Cola persistente de trabajos de ingesta en SQLite, compartida entre la UI y el worker.
+
+    SQLite serializa las escrituras entre procesos, así que encolar y reclamar un trabajo es atómico
+    aunque la UI y un worker externo usen el mismo archivo a la vez.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.INGEST_JOBS_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # isolation_level=None: manejamos las transacciones a mano (BEGIN IMMEDIATE)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                status TEXT NOT NULL,
+                source TEXT NOT NULL,
+                requested_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                progress TEXT NOT NULL DEFAULT '{}',
+                error TEXT,
+                report TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, source: str = "ui") -> IngestionJob:
+        """Encola una ingesta, salvo que ya haya una pendiente o en curso: entonces devuelve esa."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                cursor = conn.execute(
+                    "INSERT INTO jobs (status, source, requested_at) VALUES ('queued', ?, ?)", (source, time.time())
+                )
+                row = conn.execute("SELECT * FROM jobs WHERE id = ?", (cursor.lastrowid,)).fetchone()
+        return self._to_job(row)
+
+    def claim_next(self) -> Optional[IngestionJob]:
+        """Marca como `running` el trabajo pendiente más antiguo y lo devuelve."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), row[0]))
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row[0],)).fetchone()
+        return self._to_job(row)
+
+    def fail_orphans(self) -> int:
+        """Da por fallidos los `running` de un worker que murió (solo se llama con el lock de ingesta tomado)."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, error = 'Interrumpido: el worker terminó sin completar el trabajo.' "
+                "WHERE status = 'running'", (time.time(),)
+            )
+            return cursor.rowcount
+
+    def update_progress(self, job_id: int, progress: dict) -> None:
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress, ensure_ascii=False), job_id))
+
+    def finish(self, job_id: int, report: IngestionReport) -> None:
+        # Solo persistimos la proyección de cada artículo: el cuerpo completo vive en la base vectorial
+        report = report.compact()
+        payload = {"summary": report.summary, "articles": [asdict(a) for a in report.articles], "from_cache": report.from_cache}
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'succeeded', finished_at = ?, report = ? WHERE id = ?",
+                (time.time(), json.dumps(payload, ensure_ascii=False), job_id),
+            )
+
+    def fail(self, job_id: int, error: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?", (time.time(), error, job_id))
+
+    def get(self, job_id: int) -> Optional[IngestionJob]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def latest(self, status: Optional[str] = None) -> Optional[IngestionJob]:
+        with self._lock:
+            if status:
+                row = self._conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT 1", (status,)).fetchone()
+            else:
+                row = self._conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT 1").fetchone()
+        return self._to_job(row) if row else None
+
+    def recent(self, limit: int = 10) -> List[IngestionJob]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def heartbeat(self) -> None:
+        """El worker indica que sigue vivo (la UI avisa si nadie procesa la cola)."""
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('worker_heartbeat', ?)", (str(time.time()),))
+
+    def last_heartbeat(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'worker_heartbeat'").fetchone()
+        return float(row[0]) if row else None
+
+    @staticmethod
+    def _to_job(row: tuple) -> IngestionJob:
+        job_id, status, source, requested_at, started_at, finished_at, progress, error, report = row
+        payload = json.loads(report) if report else None
+        return IngestionJob(
+            id=job_id,
+            status=status,
+            source=source,
+            requested_at=requested_at,
+            started_at=started_at,
+            finished_at=finished_at,
+            progress=json.loads(progress or "{}"),
+            error=error,
+            report=IngestionReport(payload["summary"], [InsightView(**a) for a in payload["articles"]], payload["from_cache"]) if payload else None,
+        )
@@ -0,0 +1,88 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+from src.config.settings import settings
+
+class SqliteKVCache:
+    """Caché clave/valor persistente en SQLite con TTL opcional; los valores se guardan como JSON.
+
+    Las entradas vencidas se borran al abrir y al escribir, y cada namespace guarda como mucho
+    `max_entries` entradas: al superarlo se eliminan las usadas hace más tiempo (LRU).
+    """
+
+    def __init__(self, path: str, namespace: str, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None):
+        self.path = path
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries if max_entries is not None else settings.KV_CACHE_MAX_ENTRIES
+        self._clock = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS kv_cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        # Archivos creados antes del LRU no tienen la columna
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(kv_cache)")}
+        if "last_access" not in columns:
+            self._conn.execute("ALTER TABLE kv_cache ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE kv_cache SET last_access = created_at")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS kv_cache_created ON kv_cache (namespace, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS kv_cache_last_access ON kv_cache (namespace, last_access)")
+        with self._lock:
+            self._evict()
+            self._conn.commit()
+
+    def _tick(self) -> float:
+        # Reloj estrictamente creciente para que el orden LRU no dependa de la resolución de time.time()
+        self._clock = max(time.time(), self._clock + 1e-6)
+        return self._clock
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM kv_cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds is not None and time.time() - row[1] > self.ttl_seconds:
+                return None
+            self._conn.execute(
+                "UPDATE kv_cache SET last_access = ? WHERE namespace = ? AND key = ?", (self._tick(), self.namespace, key)
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        now = self._tick()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kv_cache (namespace, key, value, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        # Primero lo vencido; después, si el namespace sigue por encima del límite, lo menos usado
+        if self.ttl_seconds is not None:
+            self._conn.execute(
+                "DELETE FROM kv_cache WHERE namespace = ? AND created_at < ?", (self.namespace, time.time() - self.ttl_seconds)
+            )
+        if self.max_entries:
+            self._conn.execute(
+                """DELETE FROM kv_cache WHERE namespace = ? AND key IN (
+                       SELECT key FROM kv_cache WHERE namespace = ? ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                   )""",
+                (self.namespace, self.namespace, self.max_entries),
+            )
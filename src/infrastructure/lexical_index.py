@@ -0,0 +1,175 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.domain.entities import Insight
+from src.config.settings import settings
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[&.'][a-z0-9]+)*")
+
+# Palabras vacías frecuentes (inglés del Guardian y español de las consultas)
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+al con de del el en es la las lo los para por que se un una y
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Minúsculas, sin acentos y sin palabras vacías; conserva tickers y siglas como "s&p" o "u.s"."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [t for t in _TOKEN.findall(text) if t not in STOPWORDS]
+
+class LexicalIndex:
+    """Índice invertido BM25 persistente (SQLite) sobre título + contenido de los insights.
+
+    Se actualiza de forma incremental con `add_many` (idempotente por URL) y responde consultas
+    sin llamar a ningún servicio remoto. Las estadísticas del corpus (documentos y longitud media)
+    se leen de SQLite en cada consulta: otro proceso (el worker de ingesta) puede estar escribiendo.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    # El título pesa como si apareciera varias veces en el texto
+    TITLE_WEIGHT = 3
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.LEXICAL_INDEX_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                doc INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                insight_id INTEGER,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                category TEXT,
+                url TEXT,
+                length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc)
+            ) WITHOUT ROWID;
+            -- Para borrar los postings de un documento editado sin recorrer toda la tabla
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc);
+        """)
+        self._conn.commit()
+
+    @property
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def add_many(self, insights: Iterable[Insight]) -> int:
+        """Indexa los insights cuya URL (o título, si no tiene) aún no está en el índice."""
+        added = 0
+        with self._lock:
+            for insight in insights:
+                key = insight.url or insight.title
+                terms = Counter(tokenize(insight.title) * self.TITLE_WEIGHT + tokenize(insight.content))
+                length = sum(terms.values())
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO docs (key, insight_id, title, content, category, url, length) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, insight.id, insight.title, insight.content, insight.category, insight.url, length),
+                )
+                if cursor.rowcount == 0:
+                    continue
+                self._conn.executemany(
+                    "INSERT INTO postings (term, doc, tf) VALUES (?, ?, ?)",
+                    [(term, cursor.lastrowid, tf) for term, tf in terms.items()],
+                )
+                added += 1
+            self._conn.commit()
+        return added
+
+    def replace_many(self, insights: List[Insight]) -> int:
+        """Reindexa insights cuyo texto cambió: borra su documento anterior (si existe) y lo vuelve a añadir."""
+        with self._lock:
+            for insight in insights:
+                row = self._conn.execute("SELECT doc FROM docs WHERE key = ?", (insight.url or insight.title,)).fetchone()
+                if row is None:
+                    continue
+                self._conn.execute("DELETE FROM postings WHERE doc = ?", (row[0],))
+                self._conn.execute("DELETE FROM docs WHERE doc = ?", (row[0],))
+            self._conn.commit()
+        return self.add_many(insights)
+
+    def rebuild(self, insights: Iterable[Insight]) -> int:
+        """Vacía el índice y lo vuelve a construir con `insights`."""
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM docs")
+            self._conn.commit()
+        return self.add_many(insights)
+
+    def set_ids(self, ids: Dict[str, int]) -> None:
+        """Guarda el id de la base de datos de documentos indexados sin él (clave: URL o título)."""
+        with self._lock:
+            self._conn.executemany("UPDATE docs SET insight_id = ? WHERE key = ?", [(i, key) for key, i in ids.items()])
+            self._conn.commit()
+
+    def search(self, query: str, count: int = 5) -> List[Insight]:
+        """Top-`count` por BM25. Los resultados no traen embedding ni explicación."""
+        return [insight for insight, _ in self.search_scored(query, count)]
+
+    def search_scored(self, query: str, count: int = 5) -> List[Tuple[Insight, float]]:
+        """Como `search`, con la puntuación BM25 normalizada a [0, 1).
+
+        La normalización divide por el máximo alcanzable (cada término de la consulta con idf·(k1+1)),
+        así que la puntuación es comparable entre consultas: un documento que solo comparte una palabra
+        de una consulta larga queda cerca de 0 aunque sea el mejor del ranking.
+        """
+        terms = set(tokenize(query))
+        if not terms or count <= 0:
+            return []
+
+        with self._lock:
+            n, total_length = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+            if n == 0:
+                return []
+            avg_length = total_length / n
+            scores, max_score = defaultdict(float), 0.0
+            for term in terms:
+                postings = self._conn.execute(
+                    "SELECT p.doc, p.tf, d.length FROM postings p JOIN docs d ON d.doc = p.doc WHERE p.term = ?", (term,)
+                ).fetchall()
+                # Un término ausente del corpus tiene el idf máximo: la consulta queda menos cubierta
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                max_score += idf * (self.K1 + 1)
+                for doc, tf, length in postings:
+                    norm = self.K1 * (1 - self.B + self.B * length / avg_length)
+                    scores[doc] += idf * tf * (self.K1 + 1) / (tf + norm)
+
+            top = sorted(scores, key=scores.get, reverse=True)[:count]
+            rows = {row[0]: row for row in self._conn.execute(
+                f"SELECT doc, insight_id, title, content, category, url FROM docs WHERE doc IN ({','.join('?' * len(top))})", top
+            )} if top else {}
+
+        return [
+            (Insight(title=rows[doc][2], content=rows[doc][3], category=rows[doc][4], url=rows[doc][5], id=rows[doc][1]),
+             scores[doc] / max_score if max_score > 0 else 0.0)
+            for doc in top
+        ]
+
+def reciprocal_rank_fusion(rankings: List[List[Insight]], count: int, k: int = 60) -> List[Insight]:
+    """Fusiona rankings con RRF: cada documento suma 1 / (k + posición) por cada lista en que aparece.
+
+    Los documentos se identifican por URL (o título); se conserva el primer objeto visto, así que
+    conviene pasar primero el ranking cuyos Insight traen más información (p. ej. el id de la BD).
+    """
+    scores, insights = defaultdict(float), {}
+    for ranking in rankings:
+        for rank, insight in enumerate(ranking, start=1):
+            key = insight.url or insight.title
+            scores[key] += 1.0 / (k + rank)
+            insights.setdefault(key, insight)
+    top = sorted(scores, key=scores.get, reverse=True)[:count]
+    return [insights[key] for key in top]
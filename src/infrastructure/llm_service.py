@@ -1,22 +1,70 @@
-from google import genai
-from typing import List
+import functools
+from typing import Iterable, Iterator, List, Optional, Tuple
 from src.domain.interfaces import LLMService
+from src.infrastructure.rate_limiter import get_limiter, estimate_tokens
 from src.config.settings import settings
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_EXPLANATION = "Relacionado semánticamente con su búsqueda."
+FALLBACK_EXPLANATION = "Información relevante encontrada."
+
 class GeminiLLMService(LLMService):
     def __init__(self):
-        self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
         self.model_name = settings.GENERATION_MODEL
+        self.limiter = get_limiter("generation")
+
+    @functools.cached_property
+    def client(self):
+        # Importación diferida del SDK: solo se paga cuando se genera el primer texto
+        from google import genai
+        return genai.Client(api_key=settings.GEMINI_API_KEY)
 
     def generate_summary(self, texts: List[str]) -> str:
         if not texts:
             return "No hay textos suficientes para generar un resumen."
-            
+        
+        prompt = self._summary_prompt(texts)
+        max_retries = 3
+        try:
+            # El limitador compartido espera lo que indique el 429 (retry-after) con backoff y jitter
+            response = self.limiter.call(
+                lambda: self.client.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt
+                ),
+                tokens=estimate_tokens(prompt),
+                max_retries=max_retries,
+            )
+            return response.text
+        except Exception as e:
+            logger.error(f"Error generando resumen con GEMINI tras {max_retries} intentos: {e}")
+            return f"Error al generar el resumen de insights: {e}"
+
+    def stream_summary(self, texts: List[str]) -> Iterator[str]:
+        if not texts:
+            yield "No hay textos suficientes para generar un resumen."
+            return
+        
+        # Los errores se propagan: quien consume el stream ya mostró parte del texto y decide qué hacer
+        prompt = self._summary_prompt(texts)
+        chunks = self.limiter.stream(
+            lambda: self.client.models.generate_content_stream(
+                model=self.model_name,
+                contents=prompt
+            ),
+            tokens=estimate_tokens(prompt),
+        )
+        for chunk in chunks:
+            if chunk.text:
+                yield chunk.text
+
+    @staticmethod
+    def _summary_prompt(texts: List[str]) -> str:
         # Concatenamos los textos, limitando un poco para no explotar el contexto si son muchos
-        # Tomamos los primeros 500 caracteres de cada noticia para el resumen
+        # Tomamos los primeros 1000 caracteres de cada noticia para el resumen
         context = "\n\n".join([f"- {t[:1000]}..." for t in texts])
         
         prompt = f"""
@@ -32,47 +80,112 @@ class GeminiLLMService(LLMService):
         
         Salida en formato Markdown amigable.
         """
+        return prompt
+    
+    def summarize_article(self, title: str, content: str) -> str:
+        prompt = f"""
+        Resume la siguiente noticia en 3 frases como máximo, en español.
+        Conserva cifras, empresas y consecuencias económicas o tecnológicas concretas.
         
-        import time
+        Título: {title}
+        Texto: {content[:settings.SUMMARY_MAP_MAX_CHARS]}
+        """
         
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=prompt
-                )
-                return response.text
-            except Exception as e:
-                import traceback
-                error_msg = str(e)
-                print(f"Intento {attempt + 1}/{max_retries} fallido: {error_msg}")
-                
-                # Si es el último intento, hacemos log y devolvemos error
-                if attempt == max_retries - 1:
-                    traceback.print_exc()
-                    logger.error(f"Error generando resumen con GEMINI tras {max_retries} intentos: {e}")
-                    return f"Error al generar el resumen de insights: {e}"
-                
-                # Si es error de cuota (429), esperamos más
-                if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
-                    wait_time = (attempt + 1) * 10 # 10s, 20s...
-                    print(f"Detectado límite de cuota. Esperando {wait_time} segundos...")
-                    time.sleep(wait_time)
-                else:
-                    # Otro error, esperamos un poco por si acaso
-                    time.sleep(2)
+        response = self.limiter.call(
+            lambda: self.client.models.generate_content(
+                model=self.model_name,
+                contents=prompt
+            ),
+            tokens=estimate_tokens(prompt),
+            max_retries=3,
+        )
+        return response.text.strip()
     
+    def summarize_articles(self, articles: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """Fase "map" en lote: un solo prompt con varios artículos y un resumen de una línea por cada uno."""
+        if not articles:
+            return []
+        context = "\n\n".join(
+            f"Item {i}: Título: {title}\nTexto: {content[:settings.SUMMARY_MAP_MAX_CHARS]}"
+            for i, (title, content) in enumerate(articles)
+        )
+        prompt = f"""
+        Resume cada una de las siguientes noticias en 2 o 3 frases, en español, en UNA sola línea por noticia.
+        Conserva cifras, empresas y consecuencias económicas o tecnológicas concretas.
+        
+        {context}
+        
+        Formato de salida requerido (una línea por item, de 0 a {len(articles)-1}):
+        0: resumen...
+        1: resumen...
+        """
+        response = self.limiter.call(
+            lambda: self.client.models.generate_content(
+                model=self.model_name,
+                contents=prompt
+            ),
+            tokens=estimate_tokens(prompt),
+            max_retries=3,
+        )
+        # Los ítems que el modelo omita vuelven como None (el pipeline usa un fragmento sin cachearlo)
+        found = dict(parse_numbered_lines([response.text], len(articles)))
+        return [found.get(i) for i in range(len(articles))]
+
     def explain_relevance(self, query: str, insights: List[dict]) -> List[str]:
         if not insights:
             return []
-            
+        
+        prompt = self._relevance_prompt(query, insights)
+        try:
+            response = self.limiter.call(
+                lambda: self.client.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt
+                ),
+                tokens=estimate_tokens(prompt),
+                max_retries=2,
+            )
+            # Procesar la respuesta para extraer la lista
+            found = dict(parse_numbered_lines([response.text], len(insights)))
+            return [found.get(i, DEFAULT_EXPLANATION) for i in range(len(insights))]
+        except Exception as e:
+            logger.error(f"Error generando explanations: {e}")
+            return [FALLBACK_EXPLANATION] * len(insights)
+
+    def stream_explanations(self, query: str, insights: List[dict]) -> Iterator[Tuple[int, str]]:
+        if not insights:
+            return
+        
+        prompt = self._relevance_prompt(query, insights)
+        pending = set(range(len(insights)))
+        fallback = DEFAULT_EXPLANATION
+        try:
+            chunks = self.limiter.stream(
+                lambda: self.client.models.generate_content_stream(
+                    model=self.model_name,
+                    contents=prompt
+                ),
+                tokens=estimate_tokens(prompt),
+                max_retries=2,
+            )
+            # Cada línea "i: ..." se entrega en cuanto llega su salto de línea
+            for i, text in parse_numbered_lines((chunk.text or "" for chunk in chunks), len(insights)):
+                pending.discard(i)
+                yield i, text
+        except Exception as e:
+            logger.error(f"Error generando explanations: {e}")
+            fallback = FALLBACK_EXPLANATION
+        for i in sorted(pending):
+            yield i, fallback
+
+    @staticmethod
+    def _relevance_prompt(query: str, insights: List[dict]) -> str:
         # Construimos el prompt en lote
         context = ""
         for i, item in enumerate(insights):
             context += f"Item {i}: Title: '{item.title}', Content Fragment: '{item.content[:200]}...'\n"
             
-        prompt = f"""
+        return f"""
         Usuario busca: "{query}"
         
         Tengo estos artículos encontrados:
@@ -85,27 +198,31 @@ class GeminiLLMService(LLMService):
         0: explicación...
         1: explicación...
         """
-        
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt
-            )
-            # Procesar la respuesta para extraer la lista
-            lines = response.text.strip().split('\n')
-            # Intentar limpiar mapearlo
-            explanations = []
-            for i in range(len(insights)):
-                found = False
-                for line in lines:
-                    if line.strip().startswith(f"{i}:"):
-                        explanations.append(line.split(":", 1)[1].strip())
-                        found = True
-                        break
-                if not found:
-                    explanations.append("Relacionado semánticamente con su búsqueda.")
-            
-            return explanations
-        except Exception as e:
-            logger.error(f"Error generando explanations: {e}")
-            return ["Información relevante encontrada."] * len(insights)
+
+_NUMBERED_LINE = re.compile(r"^\s*(?:Item\s*)?(\d+)\s*:\s*(.+?)\s*$")
+
+def parse_numbered_lines(chunks: Iterable[str], count: int) -> Iterator[Tuple[int, str]]:
+    """Extrae las líneas "i: texto" de una respuesta que llega por fragmentos (cada índice una sola vez)."""
+    seen = set()
+    buffer = ""
+
+    def parse(line: str):
+        match = _NUMBERED_LINE.match(line)
+        if match:
+            index = int(match.group(1))
+            if index < count and index not in seen:
+                seen.add(index)
+                return index, match.group(2)
+        return None
+
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            item = parse(line)
+            if item:
+                yield item
+    # La última línea puede no terminar en salto de línea
+    item = parse(buffer)
+    if item:
+        yield item
@@ -0,0 +1,448 @@
+import argparse
+import json
+import os
+import threading
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+from src.domain.interfaces import VectorDatabase
+from src.domain.entities import Insight, WriteReport
+from src.domain.hashing import content_hash
+from src.infrastructure.ivf_index import IVFIndex
+from src.config.settings import settings
+from src.infrastructure.metrics import metrics
+
+class LocalVectorDatabase(VectorDatabase):
+    """Índice vectorial en proceso: matriz float32 contigua en un `.npy` mapeado en memoria.
+
+    Los vectores se guardan ya normalizados, así la similitud coseno es un producto punto.
+    Los metadatos viven en un `.jsonl` aparte; su número de líneas define cuántas filas son válidas.
+    Con `index_mode="ivf"` la búsqueda es aproximada (ver IVFIndex) una vez que hay suficientes filas.
+    Con `quantization="int8"` (o "float16") el barrido se hace sobre una copia compacta de la matriz
+    y solo los mejores candidatos se re-puntúan con los vectores float32.
+    Los artículos largos ocupan una fila por fragmento: la primera guarda los metadatos del artículo y
+    las demás apuntan a ella con `parent_id`; la búsqueda agrupa los fragmentos y devuelve cada artículo
+    una sola vez con la puntuación de su mejor fragmento.
+    """
+
+    INITIAL_CAPACITY = 1024
+    # Filas por bloque al barrer la copia cuantizada (acota la memoria temporal del upcast a float32)
+    SCAN_BLOCK = 65536
+
+    def __init__(self, directory: Optional[str] = None, index_mode: Optional[str] = None, quantization: Optional[str] = None):
+        self.directory = directory or settings.LOCAL_INDEX_DIR
+        self.index_mode = index_mode or settings.VECTOR_INDEX_MODE
+        self.quantization = quantization or settings.VECTOR_QUANTIZATION
+        if self.quantization not in ("none", "int8", "float16"):
+            raise ValueError(f"Cuantización desconocida: {self.quantization}")
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, "embeddings.npy")
+        self.quantized_path = os.path.join(self.directory, f"embeddings.{self.quantization}.npy")
+        self.scales_path = os.path.join(self.directory, "embeddings.int8_scales.npy")
+        self.metadata_path = os.path.join(self.directory, "metadata.jsonl")
+        self._lock = threading.RLock()
+
+        self._metadata: List[dict] = []
+        if os.path.exists(self.metadata_path):
+            with open(self.metadata_path, encoding="utf-8") as f:
+                self._metadata = [json.loads(line) for line in f if line.strip()]
+        # URL -> fila, para comprobar duplicados y leer un artículo sin recorrer los metadatos
+        self._urls = {m["url"]: row for row, m in enumerate(self._metadata) if m.get("url") and not m.get("deleted")}
+        # Fila -> fila del artículo al que pertenece (-1 si se reemplazó); la búsqueda agrupa con esto
+        self._parents = np.full(max(self.INITIAL_CAPACITY, self.count), -1, dtype=np.int64)
+        self._parents[:self.count] = [self._parent_of(row, m) for row, m in enumerate(self._metadata)]
+
+        self._vectors: Optional[np.memmap] = None
+        if os.path.exists(self.vectors_path):
+            self._vectors = np.load(self.vectors_path, mmap_mode="r+")
+
+        self._quantized: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        if self.quantization != "none" and self._vectors is not None:
+            self._load_quantized()
+
+        self._ivf: Optional[IVFIndex] = None
+        if self.index_mode == "ivf":
+            self._ivf = IVFIndex(self.directory)
+            # Filas escritas después de la última asignación (p. ej. si el proceso murió a mitad)
+            if self._ivf.is_trained and self._ivf.size < self.count:
+                self._ivf.add(self._vectors[self._ivf.size:self.count], self._ivf.size)
+
+    @property
+    def count(self) -> int:
+        return len(self._metadata)
+
+    def insert_insights(self, insights: List[Insight]) -> None:
+        insights = [i for i in insights if i.embedding is not None]
+        if not insights:
+            return
+
+        with self._lock:
+            start = self.count
+            entries = []
+            for insight in insights:
+                # El id del artículo es el de su primera fila (el que devuelve la búsqueda)
+                insight.id = start + len(entries) + 1
+                entries.extend(self._rows_for(insight, insight.id))
+            # Los embeddings ya son array('f'): los apilamos desde sus buffers sin pasar por floats de Python
+            matrix = self._normalize(np.stack([np.frombuffer(vector, dtype=np.float32) for _, vector in entries]))
+            self._ensure_capacity(start + len(entries), matrix.shape[1])
+
+            # Escribimos en las filas libres del memmap sin recargar el índice
+            self._vectors[start:start + len(entries)] = matrix
+            self._vectors.flush()
+            if self._quantized is not None:
+                self._write_quantized(matrix, start)
+
+            # Los metadatos van después: una fila solo es visible cuando su vector ya está en disco
+            self._set_parents(start, [self._parent_of(start + offset, meta) for offset, (meta, _) in enumerate(entries)])
+            with open(self.metadata_path, "a", encoding="utf-8") as f:
+                for offset, (meta, _) in enumerate(entries):
+                    f.write(json.dumps(meta, ensure_ascii=False) + "\n")
+                    self._metadata.append(meta)
+                    if meta.get("url"):
+                        self._urls[meta["url"]] = start + offset
+
+            if self._ivf is not None:
+                if self._ivf.is_trained:
+                    self._ivf.add(matrix, start)
+                elif self.count >= settings.IVF_MIN_TRAIN_SIZE:
+                    self.rebuild()
+
+    def update_insights(self, insights: List[Insight]) -> WriteReport:
+        """Reemplaza las URLs existentes; el resto se inserta.
+
+        Si el artículo conserva su número de fragmentos se sobrescriben sus filas en su sitio; si no,
+        las filas viejas quedan marcadas como borradas (la búsqueda las ignora) y se agregan las nuevas.
+        """
+        insights = [i for i in insights if i.embedding is not None]
+        with self._lock:
+            existing = [i for i in insights if i.url in self._urls]
+            new = [i for i in insights if i.url not in self._urls]
+            rows, vectors, appended = [], [], []
+            for insight in existing:
+                parent = self._urls[insight.url]
+                old_rows = np.flatnonzero(self._parents[:self.count] == parent)
+                insight.id = parent + 1
+                entries = self._rows_for(insight, insight.id)
+                if len(entries) == len(old_rows):
+                    for row, (meta, vector) in zip(old_rows, entries):
+                        self._metadata[row] = meta
+                        rows.append(int(row))
+                        vectors.append(vector)
+                else:
+                    for row in old_rows:
+                        self._metadata[row] = {**self._metadata[row], "deleted": True}
+                    self._parents[old_rows] = -1
+                    del self._urls[insight.url]
+                    appended.append(insight)
+
+            if rows:
+                matrix = self._normalize(np.stack([np.frombuffer(v, dtype=np.float32) for v in vectors]))
+                for row, vector in zip(rows, matrix):
+                    self._vectors[row] = vector
+                    if self._quantized is not None:
+                        self._write_quantized(vector[None, :], row, flush=False)
+                self._vectors.flush()
+                if self._quantized is not None:
+                    self._quantized.flush()
+                    if self._scales is not None:
+                        self._scales.flush()
+                if self._ivf is not None and self._ivf.is_trained:
+                    self._ivf.reassign(rows, matrix)
+            if existing:
+                self._rewrite_metadata()
+            self.insert_insights(new + appended)
+        return WriteReport(inserted=len(new), updated=len(existing))
+
+    def upsert_insights(self, insights: List[Insight]) -> WriteReport:
+        with self._lock:
+            new, urls = [], set()
+            for insight in insights:
+                # Omitimos URLs ya indexadas y repetidas dentro del mismo lote
+                if insight.url and (insight.url in self._urls or insight.url in urls):
+                    continue
+                urls.add(insight.url)
+                new.append(insight)
+            self.insert_insights(new)
+        return WriteReport(inserted=len(new), skipped=len(insights) - len(new))
+
+    @metrics.traced("local_index.search")
+    def search_insights(self, query_embedding: List[float], threshold: float = 0.5, count: int = 5, nprobe: Optional[int] = None) -> List[Insight]:
+        """Top-k por similitud coseno. `nprobe` regula recall/latencia en modo IVF (ignorado en modo exacto)."""
+        with self._lock:
+            n = self.count
+            vectors = self._vectors
+            quantized, scales = self._quantized, self._scales
+            parents = self._parents
+            ivf = self._ivf if self._ivf is not None and self._ivf.is_trained else None
+        if n == 0 or vectors is None or count <= 0:
+            return []
+
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32)[None, :])[0]
+        rows = None
+        if ivf is not None:
+            rows = ivf.candidates(query, nprobe or settings.IVF_NPROBE)
+            rows = rows[rows < n]
+            if len(rows) == 0:
+                return []
+
+        if quantized is not None:
+            rows, scores = self._rerank(query, rows, n, count, vectors, quantized, scales, parents)
+        elif rows is not None:
+            scores = vectors[rows] @ query
+        else:
+            rows = np.arange(n)
+            scores = vectors[:n] @ query
+
+        # Varias filas pueden ser del mismo artículo: nos quedamos con el mejor fragmento de cada uno
+        rows, scores, owners = self._best_per_article(rows, scores, parents, count)
+
+        # Misma semántica que match_insights: similitud > threshold, ordenado y limitado a count
+        return [self._to_insight(int(owner), int(row)) for row, score, owner in zip(rows, scores, owners) if score > threshold]
+
+    @staticmethod
+    def _best_per_article(rows: np.ndarray, scores: np.ndarray, parents: np.ndarray, count: int) -> tuple:
+        """Top-`count` artículos por su fragmento de mayor puntuación (filas borradas excluidas)."""
+        owners = parents[rows]
+        live = owners >= 0
+        rows, scores, owners = rows[live], scores[live], owners[live]
+        if len(rows) == 0:
+            return rows, scores, owners
+
+        # Top-k vectorizado: argpartition es O(n) y solo ordenamos los k candidatos. Si los k mejores
+        # fragmentos no alcanzan a cubrir `count` artículos distintos ampliamos la ventana
+        k = min(len(rows), count * max(1, settings.CHUNK_SEARCH_FANOUT))
+        while True:
+            top = np.argpartition(-scores, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            _, first = np.unique(owners[top], return_index=True)
+            if len(first) >= count or k == len(rows):
+                break
+            k = min(len(rows), k * 4)
+        best = top[np.sort(first)[:count]]
+        return rows[best], scores[best], owners[best]
+
+    def rebuild(self, n_lists: Optional[int] = None) -> None:
+        """Compacta la matriz al número real de filas y, en modo "ivf", reentrena el índice IVF desde cero."""
+        with self._lock:
+            if self.count == 0 or self._vectors is None:
+                return
+
+            # Compactación: reescribimos la matriz sin la capacidad sobrante
+            self._resize(self.count, self._vectors.shape[1])
+            if self.quantization != "none":
+                self._build_quantized()
+
+            # En modo exacto la búsqueda sigue siendo exhaustiva: no se entrena ningún IVF
+            if self.index_mode != "ivf":
+                return
+            if self._ivf is None:
+                self._ivf = IVFIndex(self.directory)
+            self._ivf.train(np.asarray(self._vectors), n_lists or settings.IVF_LISTS or IVFIndex.default_lists(self.count))
+
+    def get_existing_urls(self, urls: List[str]) -> List[str]:
+        return [url for url in urls if url in self._urls]
+
+    def get_content_hashes(self, urls: List[str]) -> Dict[str, Optional[str]]:
+        hashes = {}
+        for url in urls:
+            row = self._urls.get(url)
+            if row is not None:
+                meta = self._metadata[row]
+                # Índices anteriores no guardaban el hash: lo derivamos del texto almacenado
+                hashes[url] = meta.get("content_hash") or content_hash(meta["content"])
+        return hashes
+
+    def list_urls(self) -> List[str]:
+        return list(self._urls)
+
+    def list_insights(self) -> Iterator[Insight]:
+        # Un Insight por artículo vigente (sin fragmentos secundarios ni filas reemplazadas)
+        for row in range(self.count):
+            if self._parents[row] == row:
+                yield self._to_insight(row)
+
+    def get_insight(self, url: str) -> Optional[Insight]:
+        row = self._urls.get(url)
+        return self._to_insight(row) if row is not None else None
+
+    def _to_insight(self, row: int, chunk_row: Optional[int] = None) -> Insight:
+        """Insight del artículo en `row`; con `chunk_row` el contenido es solo el texto de ese fragmento."""
+        meta = self._metadata[row]
+        content = meta["content"]
+        span = self._metadata[chunk_row].get("span") if chunk_row is not None else None
+        if span:
+            content = content[span[0]:span[1]]
+        return Insight(
+            title=meta["title"],
+            content=content,
+            category=meta["category"],
+            url=meta.get("url"),
+            id=meta.get("id"),
+            content_hash=meta.get("content_hash"),
+        )
+
+    @staticmethod
+    def _rows_for(insight: Insight, first_id: int) -> List[tuple]:
+        """(metadatos, vector) de cada fila del artículo; el texto completo solo se guarda en la primera."""
+        meta = {
+            "id": first_id,
+            "title": insight.title,
+            "content": insight.content,
+            "category": insight.category,
+            "url": insight.url,
+            "content_hash": insight.content_hash or content_hash(insight.content),
+        }
+        if not insight.chunks or len(insight.chunks) < 2:
+            return [(meta, insight.embedding)]
+        rows = []
+        for offset, chunk in enumerate(insight.chunks):
+            span = {"chunk": chunk.index, "span": [chunk.start, chunk.end]}
+            if offset == 0:
+                rows.append(({**meta, **span}, chunk.embedding))
+            else:
+                rows.append(({"id": first_id + offset, "parent_id": first_id, **span}, chunk.embedding))
+        return rows
+
+    @staticmethod
+    def _parent_of(row: int, meta: dict) -> int:
+        if meta.get("deleted"):
+            return -1
+        # Filas sin `parent_id` (artículos de un fragmento o índices anteriores) son su propio artículo
+        return meta["parent_id"] - 1 if meta.get("parent_id") else row
+
+    def _set_parents(self, start: int, parents: List[int]) -> None:
+        required = start + len(parents)
+        if required > len(self._parents):
+            # Array nuevo en vez de resize: una búsqueda en curso conserva su copia válida
+            grown = np.full(max(required, len(self._parents) * 2), -1, dtype=np.int64)
+            grown[:start] = self._parents[:start]
+            self._parents = grown
+        self._parents[start:required] = parents
+
+    def _rewrite_metadata(self) -> None:
+        # Las actualizaciones no caben en un JSONL de solo-añadir: reescritura atómica completa
+        tmp_path = self.metadata_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for meta in self._metadata:
+                f.write(json.dumps(meta, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.metadata_path)
+
+    def _ensure_capacity(self, required: int, dim: int) -> None:
+        if self._vectors is not None:
+            if self._vectors.shape[1] != dim:
+                raise ValueError(f"Dimensión de embedding inválida: {dim} (el índice usa {self._vectors.shape[1]})")
+            if self._vectors.shape[0] >= required:
+                return
+
+        # Crecimiento geométrico: copiar la matriz es raro y amortizado entre muchas inserciones
+        capacity = max(self.INITIAL_CAPACITY, required)
+        if self._vectors is not None:
+            capacity = max(capacity, self._vectors.shape[0] * 2)
+        self._resize(capacity, dim)
+
+    def _resize(self, capacity: int, dim: int) -> None:
+        self._resize_file("_vectors", self.vectors_path, np.float32, (capacity, dim))
+        if self.quantization != "none":
+            self._resize_file("_quantized", self.quantized_path, self._quantized_dtype, (capacity, dim))
+            if self.quantization == "int8":
+                self._resize_file("_scales", self.scales_path, np.float32, (capacity,))
+
+    def _resize_file(self, attr: str, path: str, dtype, shape: tuple) -> None:
+        # Copiamos a un archivo temporal y lo reemplazamos de forma atómica
+        tmp_path = path + ".tmp"
+        resized = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+        current = getattr(self, attr)
+        if current is not None:
+            rows = min(self.count, current.shape[0])
+            resized[:rows] = current[:rows]
+        resized.flush()
+        del resized, current
+        setattr(self, attr, None)
+        os.replace(tmp_path, path)
+        setattr(self, attr, np.load(path, mmap_mode="r+"))
+
+    @property
+    def _quantized_dtype(self):
+        return np.int8 if self.quantization == "int8" else np.float16
+
+    def _load_quantized(self) -> None:
+        if os.path.exists(self.quantized_path) and (self.quantization != "int8" or os.path.exists(self.scales_path)):
+            self._quantized = np.load(self.quantized_path, mmap_mode="r+")
+            if self.quantization == "int8":
+                self._scales = np.load(self.scales_path, mmap_mode="r+")
+            if self._quantized.shape == self._vectors.shape:
+                return
+        # Copia ausente o de otra capacidad (p. ej. se activó la cuantización con el índice ya creado)
+        self._build_quantized()
+
+    def _build_quantized(self) -> None:
+        self._quantized, self._scales = None, None
+        shape = self._vectors.shape
+        self._resize_file("_quantized", self.quantized_path, self._quantized_dtype, shape)
+        if self.quantization == "int8":
+            self._resize_file("_scales", self.scales_path, np.float32, (shape[0],))
+        for start in range(0, self.count, self.SCAN_BLOCK):
+            self._write_quantized(np.asarray(self._vectors[start:start + self.SCAN_BLOCK]), start, flush=False)
+        self._quantized.flush()
+
+    def _write_quantized(self, matrix: np.ndarray, start: int, flush: bool = True) -> None:
+        end = start + len(matrix)
+        if self.quantization == "int8":
+            self._quantized[start:end], self._scales[start:end] = quantize_int8(matrix)
+        else:
+            self._quantized[start:end] = matrix.astype(np.float16)
+        if flush:
+            self._quantized.flush()
+            if self._scales is not None:
+                self._scales.flush()
+
+    def _rerank(self, query: np.ndarray, rows: Optional[np.ndarray], n: int, count: int,
+                vectors: np.ndarray, quantized: np.ndarray, scales: Optional[np.ndarray], parents: np.ndarray) -> tuple:
+        """Puntúa sobre la copia cuantizada y re-puntúa con float32 los mejores fragmentos de
+        `count * QUANT_RERANK_FACTOR` artículos distintos."""
+        total = n if rows is None else len(rows)
+        approx = np.empty(total, dtype=np.float32)
+        for start in range(0, total, self.SCAN_BLOCK):
+            stop = min(start + self.SCAN_BLOCK, total)
+            block_rows = slice(start, stop) if rows is None else rows[start:stop]
+            approx[start:stop] = quantized[block_rows].astype(np.float32) @ query
+            if scales is not None:
+                approx[start:stop] *= scales[block_rows]
+
+        # El presupuesto se cuenta en artículos: si los fragmentos de unos pocos artículos largos llenan
+        # la ventana, la ampliamos (como _best_per_article) hasta cubrir los artículos pedidos
+        articles = max(count, count * settings.QUANT_RERANK_FACTOR)
+        k = min(total, articles)
+        while True:
+            candidates = np.argpartition(-approx, k - 1)[:k] if k < total else np.arange(total)
+            candidates = candidates if rows is None else rows[candidates]
+            owners = parents[candidates]
+            if k == total or len(np.unique(owners[owners >= 0])) >= articles:
+                break
+            k = min(total, k * 4)
+        candidates = np.sort(candidates)
+        # Solo estas filas float32 se leen del disco (lecturas ordenadas sobre el memmap)
+        return candidates, vectors[candidates] @ query
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+def quantize_int8(matrix: np.ndarray) -> tuple:
+    """Cuantización escalar simétrica por fila: v ≈ q * scale con q en [-127, 127]."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantenimiento del índice vectorial local.")
+    parser.add_argument("command", choices=["rebuild"], help="rebuild: compacta la matriz y reentrena el IVF")
+    parser.add_argument("--lists", type=int, default=None, help="Número de listas IVF (por defecto ~4·sqrt(n))")
+    args = parser.parse_args()
+
+    db = LocalVectorDatabase(index_mode="ivf")
+    db.rebuild(n_lists=args.lists)
+    print(f"✅ Índice reconstruido: {db.count} vectores en {len(db._ivf.centroids) if db._ivf.is_trained else 0} listas.")
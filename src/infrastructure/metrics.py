@@ -0,0 +1,186 @@
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+@dataclass
+class _Stat:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    errors: int = 0
+
+    def add(self, value: float, error: bool = False) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.errors += int(error)
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "total": round(self.total, 6), "max": round(self.max, 6), "errors": self.errors}
+
+@dataclass
+class RunRecorder:
+    """Desglose de una ejecución concreta (una ingesta o una búsqueda) por nombre de span."""
+    name: str
+    started: float = field(default_factory=time.perf_counter)
+    duration: Optional[float] = None
+    spans: Dict[str, _Stat] = field(default_factory=dict)
+    counters: Dict[str, float] = field(default_factory=dict)
+
+    def breakdown(self) -> dict:
+        return {
+            "run": self.name,
+            "seconds": round(self.duration if self.duration is not None else time.perf_counter() - self.started, 4),
+            "spans": {name: stat.as_dict() for name, stat in sorted(self.spans.items(), key=lambda kv: -kv[1].total)},
+            "counters": dict(self.counters),
+        }
+
+_current_run: contextvars.ContextVar[Optional[RunRecorder]] = contextvars.ContextVar("current_run", default=None)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class MetricsRegistry:
+    """Registro en proceso de spans (duraciones), contadores y tamaños observados.
+
+    Todo es acumulativo desde el arranque y se exporta como JSON (`snapshot`) o en formato texto de
+    Prometheus (`to_prometheus`). Los spans de una ejecución enmarcada con `run()` también se
+    acumulan en su RunRecorder; el contexto se propaga a `asyncio.to_thread` pero no a los
+    ThreadPoolExecutor, cuyos spans solo cuentan en el registro global.
+    """
+
+    def __init__(self, max_runs: int = 20):
+        self._lock = threading.Lock()
+        self._spans: Dict[Tuple[str, Labels], _Stat] = {}
+        self._observations: Dict[Tuple[str, Labels], _Stat] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self.max_runs = max_runs
+        self.runs: List[RunRecorder] = []
+
+    @staticmethod
+    def _labels(labels: dict) -> Labels:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            key = (name, self._labels(labels))
+            with self._lock:
+                self._spans.setdefault(key, _Stat()).add(elapsed, error)
+                recorder = _current_run.get()
+                if recorder is not None:
+                    recorder.spans.setdefault(name, _Stat()).add(elapsed, error)
+
+    def traced(self, name: str, **labels):
+        """Decorador: cada llamada a la función se registra como un span `name`."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            recorder = _current_run.get()
+            if recorder is not None:
+                display = name + _format_labels(key[1])
+                recorder.counters[display] = recorder.counters.get(display, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Registra un tamaño (bytes, tokens, filas...) para ver cuenta, total y máximo."""
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._observations.setdefault(key, _Stat()).add(value)
+
+    @contextmanager
+    def run(self, name: str) -> Iterator[RunRecorder]:
+        """Enmarca una ejecución: los spans y contadores de este contexto se agregan a su desglose."""
+        recorder = RunRecorder(name)
+        token = _current_run.set(recorder)
+        try:
+            with self.span(name):
+                yield recorder
+        finally:
+            _current_run.reset(token)
+            recorder.duration = time.perf_counter() - recorder.started
+            with self._lock:
+                self.runs.append(recorder)
+                del self.runs[:-self.max_runs]
+
+    def last_run(self, name: Optional[str] = None) -> Optional[RunRecorder]:
+        with self._lock:
+            for recorder in reversed(self.runs):
+                if name is None or recorder.name == name:
+                    return recorder
+        return None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "spans": [{"name": n, "labels": dict(l), **s.as_dict()} for (n, l), s in sorted(self._spans.items())],
+                "counters": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self._counters.items())],
+                "observations": [{"name": n, "labels": dict(l), **s.as_dict()} for (n, l), s in sorted(self._observations.items())],
+                "runs": [r.breakdown() for r in self.runs],
+            }
+
+    def to_prometheus(self, prefix: str = "newsrag") -> str:
+        with self._lock:
+            spans = sorted(self._spans.items())
+            counters = sorted(self._counters.items())
+            observations = sorted(self._observations.items())
+
+        lines = [f"# TYPE {prefix}_span_seconds summary"]
+        for (name, labels), stat in spans:
+            span_labels = _format_labels((("span", name),) + labels)
+            lines.append(f"{prefix}_span_seconds_count{span_labels} {stat.count}")
+            lines.append(f"{prefix}_span_seconds_sum{span_labels} {stat.total:.6f}")
+        lines.append(f"# TYPE {prefix}_span_errors_total counter")
+        for (name, labels), stat in spans:
+            lines.append(f"{prefix}_span_errors_total{_format_labels((('span', name),) + labels)} {stat.errors}")
+
+        # Una sola línea TYPE por métrica aunque tenga varias combinaciones de etiquetas
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{prefix}_{name.replace('.', '_')}_total"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+        for (name, labels), stat in observations:
+            metric = f"{prefix}_{name.replace('.', '_')}"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} summary")
+            lines.append(f"{metric}_count{_format_labels(labels)} {stat.count}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {stat.total:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+            self._observations.clear()
+            self.runs.clear()
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+# Registro compartido por todo el proceso
+metrics = MetricsRegistry()
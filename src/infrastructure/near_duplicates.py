@@ -0,0 +1,181 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from src.domain.entities import Insight
+from src.infrastructure.lexical_index import tokenize
+from src.config.settings import settings
+
+BITS = 64
+
+def simhash(text: str, shingle_size: int = 3, min_tokens: int = 30) -> Optional[int]:
+    """SimHash de 64 bits sobre shingles de palabras del texto normalizado (None si es demasiado corto).
+
+    Textos casi iguales (una frase cambiada, un párrafo añadido) dan firmas a pocos bits de distancia.
+    """
+    tokens = tokenize(text)
+    if len(tokens) < max(min_tokens, 1):
+        return None
+    shingles = Counter(" ".join(tokens[i:i + shingle_size]) for i in range(max(len(tokens) - shingle_size + 1, 1)))
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles],
+        dtype=np.uint64,
+    )
+    weights = np.fromiter(shingles.values(), dtype=np.float64, count=len(shingles))
+    # Cada shingle vota +peso/-peso en cada bit; el signo del total fija el bit de la firma
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = weights @ (bits.astype(np.float64) * 2 - 1)
+    return int(np.packbits(votes > 0, bitorder="little").view(np.uint64)[0])
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+def _to_sql(value: int) -> int:
+    # SQLite guarda enteros con signo de 64 bits
+    return value - (1 << BITS) if value >= 1 << (BITS - 1) else value
+
+def _from_sql(value: int) -> int:
+    return value + (1 << BITS) if value < 0 else value
+
+class NearDuplicateIndex:
+    """Índice persistente (SQLite) de firmas SimHash con LSH por bandas.
+
+    La firma se parte en `max_distance + 1` bandas: dos firmas a distancia <= max_distance coinciden
+    por fuerza en al menos una banda completa (palomar), así que basta buscar candidatos por banda y
+    comprobar la distancia exacta solo con ellos. Cada URL queda enlazada a su artículo canónico
+    (el primero visto); los duplicados no entran en las bandas para que los grupos no se encadenen.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_distance: Optional[int] = None,
+                 shingle_size: Optional[int] = None, min_tokens: Optional[int] = None):
+        self.path = path or settings.NEAR_DUP_PATH
+        self.max_distance = max_distance if max_distance is not None else settings.NEAR_DUP_MAX_DISTANCE
+        self.shingle_size = shingle_size or settings.NEAR_DUP_SHINGLE_SIZE
+        self.min_tokens = min_tokens if min_tokens is not None else settings.NEAR_DUP_MIN_TOKENS
+        if not 0 <= self.max_distance < BITS // 4:
+            raise ValueError(f"NEAR_DUP_MAX_DISTANCE fuera de rango: {self.max_distance}")
+        self.bands = self.max_distance + 1
+        self._band_bits = BITS // self.bands
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                url TEXT PRIMARY KEY,
+                simhash INTEGER NOT NULL,
+                canonical_url TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS signatures_canonical ON signatures (canonical_url);
+            CREATE TABLE IF NOT EXISTS bands (
+                band INTEGER NOT NULL,
+                key INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                PRIMARY KEY (band, key, url)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+        self._reband_if_needed()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def backfilled(self) -> bool:
+        """Si ya se cargó lo existente en la base (los textos cortos no dejan firma, así que `count` no basta)."""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM meta WHERE key = 'backfilled'").fetchone() is not None
+
+    def assign_many(self, items: Iterable[Tuple[Optional[str], str]]) -> List[Optional[str]]:
+        """Registra cada (url, texto) y devuelve la URL canónica de la que es casi-duplicado, o None.
+
+        Es idempotente por URL: una URL ya registrada devuelve su enlace previo (None si es canónica).
+        Los ítems se procesan en orden, así que dentro de un mismo lote el primero es el canónico.
+        """
+        results = []
+        with self._lock:
+            for url, text in items:
+                results.append(self._assign(url, text) if url else None)
+            self._conn.commit()
+        return results
+
+    def canonical(self, url: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT canonical_url FROM signatures WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def duplicates_of(self, canonical_url: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url FROM signatures WHERE canonical_url = ? AND url != canonical_url ORDER BY url", (canonical_url,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def rebuild(self, insights: Iterable[Insight]) -> int:
+        """Vacía el índice y registra `insights` (p. ej. lo que ya hay en la base vectorial)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM signatures")
+            self._conn.execute("DELETE FROM bands")
+            self._count = 0
+            self._conn.commit()
+        self.assign_many((i.url, i.content) for i in insights)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('backfilled', '1')")
+            self._conn.commit()
+        return self.count
+
+    def _assign(self, url: str, text: str) -> Optional[str]:
+        row = self._conn.execute("SELECT canonical_url FROM signatures WHERE url = ?", (url,)).fetchone()
+        if row:
+            return row[0] if row[0] != url else None
+
+        signature = simhash(text, self.shingle_size, self.min_tokens)
+        if signature is None:
+            return None
+        match = self._find(signature)
+        canonical_url = match or url
+        self._conn.execute("INSERT INTO signatures (url, simhash, canonical_url) VALUES (?, ?, ?)", (url, _to_sql(signature), canonical_url))
+        if match is None:
+            self._conn.executemany("INSERT OR IGNORE INTO bands (band, key, url) VALUES (?, ?, ?)",
+                                   [(band, key, url) for band, key in self._band_keys(signature)])
+        self._count += 1
+        return match
+
+    def _find(self, signature: int) -> Optional[str]:
+        best, best_distance = None, self.max_distance + 1
+        for band, key in self._band_keys(signature):
+            rows = self._conn.execute(
+                "SELECT s.url, s.simhash FROM bands b JOIN signatures s ON s.url = b.url WHERE b.band = ? AND b.key = ?",
+                (band, key),
+            ).fetchall()
+            for url, other in rows:
+                distance = hamming(signature, _from_sql(other))
+                if distance < best_distance:
+                    best, best_distance = url, distance
+        return best
+
+    def _band_keys(self, signature: int) -> List[Tuple[int, int]]:
+        keys = []
+        for band in range(self.bands):
+            shift = band * self._band_bits
+            # La última banda se queda con los bits sobrantes
+            width = BITS - shift if band == self.bands - 1 else self._band_bits
+            keys.append((band, (signature >> shift) & ((1 << width) - 1)))
+        return keys
+
+    def _reband_if_needed(self) -> None:
+        """Si cambió NEAR_DUP_MAX_DISTANCE (y con él el número de bandas) recalculamos las claves."""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'bands'").fetchone()
+        if row is not None and int(row[0]) == self.bands:
+            return
+        self._conn.execute("DELETE FROM bands")
+        canonicals = self._conn.execute("SELECT url, simhash FROM signatures WHERE url = canonical_url").fetchall()
+        self._conn.executemany("INSERT OR IGNORE INTO bands (band, key, url) VALUES (?, ?, ?)",
+                               [(band, key, url) for url, sig in canonicals for band, key in self._band_keys(_from_sql(sig))])
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('bands', ?)", (str(self.bands),))
+        self._conn.commit()
@@ -0,0 +1,191 @@
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Optional, TypeVar
+from src.config.settings import settings
+from src.infrastructure.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class TokenBucket:
+    """Cubeta de tokens con recarga continua (`rate_per_minute` tokens por minuto)."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> None:
+        # Una petición más grande que la cubeta nunca entraría: la limitamos a la capacidad
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+
+class RateLimitError(Exception):
+    pass
+
+class AdaptiveRateLimiter:
+    """Limitador por servicio: presupuesto de requests/min y tokens/min más concurrencia AIMD.
+
+    Cada éxito sube el límite de concurrencia de forma aditiva; cada 429 lo reduce a la mitad y
+    pausa a todos los llamadores durante el retry-after indicado por la API (o un backoff con jitter).
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: float, max_concurrency: int, min_concurrency: int = 1):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.throttled = 0
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, tokens: int = 0):
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+        try:
+            # Si un 429 reciente pidió esperar, todos los llamadores respetan esa pausa
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+            self.requests.acquire(1)
+            if tokens:
+                self.tokens.acquire(tokens)
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self) -> None:
+        with self._cond:
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def on_throttle(self, retry_after: Optional[float]) -> None:
+        metrics.inc("gemini.throttled", service=self.name)
+        with self._cond:
+            self.throttled += 1
+            self.limit = max(self.min_concurrency, self.limit / 2)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def call(self, fn: Callable[[], T], tokens: int = 0, max_retries: int = 3, retry_transient: bool = True) -> T:
+        """Ejecuta `fn` dentro del presupuesto, reintentando cuotas agotadas y (opcionalmente) otros errores."""
+        if tokens:
+            metrics.observe("gemini.request_tokens", tokens, service=self.name)
+        for attempt in range(max_retries):
+            try:
+                with self.slot(tokens):
+                    with metrics.span("gemini.request", service=self.name):
+                        result = fn()
+                self.on_success()
+                return result
+            except Exception as e:
+                if attempt == max_retries - 1 or not (is_rate_limit_error(e) or retry_transient):
+                    self._throttle_if_rate_limited(e)
+                    raise
+                metrics.inc("gemini.retries", service=self.name)
+                time.sleep(self._retry_delay(e, attempt, max_retries))
+
+    def stream(self, fn: Callable[[], Iterable[T]], tokens: int = 0, max_retries: int = 3) -> Iterator[T]:
+        """Como `call` para respuestas en streaming: solo se reintenta si todavía no llegó ningún fragmento."""
+        if tokens:
+            metrics.observe("gemini.request_tokens", tokens, service=self.name)
+        for attempt in range(max_retries):
+            started = False
+            try:
+                with self.slot(tokens):
+                    with metrics.span("gemini.stream", service=self.name):
+                        for chunk in fn():
+                            started = True
+                            yield chunk
+                self.on_success()
+                return
+            except Exception as e:
+                # Reintentar a mitad de respuesta duplicaría el texto ya entregado
+                if started or attempt == max_retries - 1:
+                    self._throttle_if_rate_limited(e)
+                    raise
+                metrics.inc("gemini.retries", service=self.name)
+                time.sleep(self._retry_delay(e, attempt, max_retries))
+
+    def _throttle_if_rate_limited(self, e: Exception) -> None:
+        # El 429 que agota los reintentos también debe frenar a los demás llamadores
+        if is_rate_limit_error(e):
+            self.on_throttle(parse_retry_after(e))
+
+    def _retry_delay(self, e: Exception, attempt: int, max_retries: int) -> float:
+        if is_rate_limit_error(e):
+            retry_after = parse_retry_after(e)
+            self.on_throttle(retry_after)
+            delay = retry_after if retry_after else backoff_delay(attempt, base=5.0)
+            logger.warning(f"[{self.name}] Límite de cuota, reintento {attempt + 1}/{max_retries} en {delay:.1f}s (concurrencia: {int(self.limit)})")
+        else:
+            delay = backoff_delay(attempt)
+            logger.warning(f"[{self.name}] Intento {attempt + 1}/{max_retries} fallido: {e}")
+        return delay
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    # Backoff exponencial con "full jitter" para que los llamadores no reintenten sincronizados
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def is_rate_limit_error(e: Exception) -> bool:
+    if isinstance(e, RateLimitError) or getattr(e, "code", None) == 429:
+        return True
+    message = str(e)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message
+
+def parse_retry_after(e: Exception) -> Optional[float]:
+    """Extrae el tiempo de espera sugerido (cabecera Retry-After, RetryInfo de Gemini o el mensaje)."""
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    match = re.search(r"retry(?:Delay| in)['\"]?\s*[:=]?\s*['\"]?(\d+(?:\.\d+)?)s", str(e), re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+def estimate_tokens(text: str) -> int:
+    # Aproximación habitual: ~4 caracteres por token
+    return max(1, len(text) // 4)
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(name: str) -> AdaptiveRateLimiter:
+    """Limitador compartido por todo el proceso para `name` ("embedding" o "generation")."""
+    with _limiters_lock:
+        if name not in _limiters:
+            if name == "embedding":
+                _limiters[name] = AdaptiveRateLimiter(name, settings.GEMINI_EMBEDDING_RPM, settings.GEMINI_EMBEDDING_TPM, settings.EMBEDDING_MAX_CONCURRENCY)
+            elif name == "generation":
+                _limiters[name] = AdaptiveRateLimiter(name, settings.GEMINI_GENERATION_RPM, settings.GEMINI_GENERATION_TPM, settings.GENERATION_MAX_CONCURRENCY)
+            else:
+                raise ValueError(f"Limitador desconocido: {name}")
+        return _limiters[name]
@@ -0,0 +1,61 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+from src.config.settings import settings
+
+class RecentArticleStore:
+    """Ventana persistente (SQLite) de las noticias recientes sobre la que se arma el informe ejecutivo.
+
+    La ingesta incremental solo trae lo modificado desde la marca de agua; el informe, en cambio, debe
+    cubrir los últimos RECENT_WINDOW_DAYS días como una ingesta completa. Cada ejecución suma lo que
+    trajo y la ventana se lee de aquí, anclada en la publicación más reciente guardada.
+    """
+
+    def __init__(self, path: Optional[str] = None, window_days: Optional[int] = None):
+        self.path = path or settings.RECENT_ARTICLES_PATH
+        self.window_days = window_days or settings.RECENT_WINDOW_DAYS
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS recent_articles (
+                key TEXT PRIMARY KEY,
+                published_at TEXT NOT NULL,
+                article TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS recent_articles_published ON recent_articles (published_at)")
+        self._conn.commit()
+
+    def add_many(self, items: Iterable[Tuple[dict, Optional[datetime]]]) -> None:
+        """Guarda (o reemplaza, si se editó) cada (artículo, fecha de publicación)."""
+        now = datetime.now(timezone.utc)
+        rows = [
+            (item.get('url') or item.get('title') or "", self._iso(published_at or now), json.dumps(item, ensure_ascii=False))
+            for item, published_at in items
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO recent_articles (key, published_at, article) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def window(self) -> List[dict]:
+        """Artículos de la ventana, de más nuevo a más viejo; lo anterior a la ventana se descarta."""
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(published_at) FROM recent_articles").fetchone()
+            if row[0] is None:
+                return []
+            start = self._iso(datetime.fromisoformat(row[0]) - timedelta(days=self.window_days))
+            self._conn.execute("DELETE FROM recent_articles WHERE published_at < ?", (start,))
+            self._conn.commit()
+            rows = self._conn.execute("SELECT article FROM recent_articles ORDER BY published_at DESC, key").fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    @staticmethod
+    def _iso(value: datetime) -> str:
+        # Siempre en UTC y con el mismo formato: así el orden de los textos es el orden cronológico
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -0,0 +1,36 @@
+import json
+import os
+import threading
+from typing import Any, Optional
+from src.config.settings import settings
+
+class StateStore:
+    """Pequeño almacén clave/valor en JSON para estado de la ingesta que debe sobrevivir entre ejecuciones."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.INGEST_STATE_PATH
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._load().get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            state = self._load()
+            state[key] = value
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Escritura atómica: nunca dejamos un JSON a medio escribir
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
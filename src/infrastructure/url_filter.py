@@ -0,0 +1,118 @@
+import hashlib
+import math
+import os
+import threading
+from typing import Iterable, List, Optional, Tuple
+from src.config.settings import settings
+from src.infrastructure.file_lock import SingleFlightLock
+
+class UrlSeenFilter:
+    """Filtro de Bloom persistente con las URLs ya ingeridas.
+
+    "No está" es definitivo (la URL es nueva); "quizás está" debe confirmarse contra la base de datos.
+    Así la consulta a Supabase se reduce a las URLs que probablemente ya se vieron.
+
+    Varios procesos (el worker embebido de la UI y `run-once`) pueden compartir el archivo: cada escritura
+    toma un lock de archivo y une (OR) los bits del disco antes de guardar, y `refresh()` trae los que
+    agregaron los demás, así ninguno borra las URLs del otro.
+    """
+
+    HEADER = b"URLBLOOM1"
+
+    def __init__(self, path: Optional[str] = None, capacity: Optional[int] = None, error_rate: Optional[float] = None):
+        self.path = path or settings.URL_FILTER_PATH
+        capacity = capacity or settings.URL_FILTER_CAPACITY
+        error_rate = error_rate or settings.URL_FILTER_ERROR_RATE
+        self._lock = threading.Lock()
+        self._file_lock = SingleFlightLock(self.path + ".lock")
+
+        # Tamaño óptimo: m = -n·ln(p)/ln(2)², k = m/n·ln(2)
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.loaded = self._load()
+
+    def _positions(self, url: str) -> List[int]:
+        # Doble hashing (Kirsch-Mitzenmacher) a partir de un único digest
+        digest = hashlib.sha256(url.encode("utf-8")).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, url: str) -> bool:
+        return all(self._bits[p >> 3] & (1 << (p & 7)) for p in self._positions(url))
+
+    def add_many(self, urls: Iterable[str]) -> None:
+        self._write(urls, merge=True)
+
+    def rebuild(self, urls: Iterable[str]) -> None:
+        """Reconstruye el filtro desde cero (p. ej. con todas las URLs de la tabla)."""
+        with self._lock:
+            self._bits = bytearray(len(self._bits))
+            self.count = 0
+        self._write(urls, merge=False)
+        self.loaded = True
+
+    def refresh(self) -> None:
+        """Une las URLs que otros procesos guardaron en el archivo desde que se cargó."""
+        with self._lock:
+            stored = self._read()
+            if stored is not None:
+                self._merge(*stored)
+
+    def _write(self, urls: Iterable[str], merge: bool) -> None:
+        with self._lock:
+            self._file_lock.acquire(blocking=True)
+            try:
+                stored = self._read() if merge else None
+                if stored is not None:
+                    self._merge(*stored)
+                for url in urls:
+                    if not url:
+                        continue
+                    for p in self._positions(url):
+                        self._bits[p >> 3] |= 1 << (p & 7)
+                    self.count += 1
+                self._save()
+            finally:
+                self._file_lock.release()
+
+    def _merge(self, count: int, bits: bytes) -> None:
+        # El archivo ya contiene todo lo que este proceso guardó: su contador es el total
+        merged = int.from_bytes(self._bits, "little") | int.from_bytes(bits, "little")
+        self._bits = bytearray(merged.to_bytes(len(self._bits), "little"))
+        self.count = max(self.count, count)
+
+    def _load(self) -> bool:
+        stored = self._read()
+        if stored is None:
+            return False
+        self.count, bits = stored
+        self._bits = bytearray(bits)
+        return True
+
+    def _read(self) -> Optional[Tuple[int, bytes]]:
+        """(contador, bits) del archivo, o None si no existe o no corresponde a estos parámetros."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            data = f.read()
+        header_len = len(self.HEADER) + 16
+        if not data.startswith(self.HEADER) or len(data) != header_len + len(self._bits):
+            # Parámetros distintos o archivo corrupto: hay que reconstruir
+            return None
+        num_bits = int.from_bytes(data[len(self.HEADER):len(self.HEADER) + 8], "little")
+        if num_bits != self.num_bits:
+            return None
+        return int.from_bytes(data[len(self.HEADER) + 8:header_len], "little"), data[header_len:]
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.HEADER)
+            f.write(self.num_bits.to_bytes(8, "little"))
+            f.write(self.count.to_bytes(8, "little"))
+            f.write(self._bits)
+        os.replace(tmp_path, self.path)
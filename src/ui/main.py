@@ -1,18 +1,26 @@
 import streamlit as st
 import sys
 import os
+import json
+import threading
+import time
 
 # Ensure src is in python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
 from src.config.settings import settings
-from src.infrastructure.database import SupabaseDatabase
-from src.infrastructure.embeddings import GeminiEmbeddingService
-from src.infrastructure.llm_service import GeminiLLMService
-import importlib
+from src.infrastructure.metrics import metrics
+from src.infrastructure.job_store import JobStore
+from src.domain.entities import InsightView
 import src.application.pipeline
-importlib.reload(src.application.pipeline)
-from src.application.pipeline import SearchPipeline, IngestionPipeline
+import src.application.services
+if settings.DEV_RELOAD:
+    # Recarga en caliente para desarrollo; en producción los módulos se importan una sola vez
+    import importlib
+    importlib.reload(src.application.pipeline)
+    importlib.reload(src.application.services)
+from src.application.services import ServiceRegistry
+from src.application.ingestion_worker import IngestionWorker
 
 # 1. Configuración de página e Identidad
 st.set_page_config(page_title="Tech-Insights AI", layout="wide", page_icon="🚀")
@@ -82,33 +90,48 @@ def apply_custom_style():
 
 apply_custom_style()
 
-# 2. Inicialización de servicios (Cached)
+# 2. Servicios: un registro perezoso compartido por todas las sesiones.
+# Cada cliente (Gemini, Supabase, índices locales) se construye la primera vez que se usa.
 @st.cache_resource(show_spinner=False)
-def init_services():
-    try:
-        settings.validate()
-        db = SupabaseDatabase()
-        emb_service = GeminiEmbeddingService()
-        llm_service = GeminiLLMService()
-        
-        search_pipe = SearchPipeline(emb_service, db, llm_service)
-        ingest_pipe = IngestionPipeline(emb_service, db, llm_service)
-        
-        return search_pipe, ingest_pipe
-    except Exception as e:
-        st.error(f"Error de inicialización: {e}")
-        return None, None
-
-if "services_loaded" not in st.session_state:
-    with st.status("Inicializando sistema neuronal...", expanded=True) as status:
-        s_pipe, i_pipe = init_services()
-        if s_pipe and i_pipe:
-            st.session_state.search_pipeline = s_pipe
-            st.session_state.ingest_pipeline = i_pipe
-            st.session_state.services_loaded = True
-            status.update(label="✅ Sistema Online", state="complete", expanded=False)
-        else:
-            st.stop()
+def service_registry():
+    return ServiceRegistry()
+
+if settings.DEV_RELOAD:
+    # Las clases recargadas solo se usan si el registro se reconstruye
+    service_registry.clear()
+
+@st.cache_resource(show_spinner=False)
+def job_store():
+    return JobStore()
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_report(job_id):
+    """Informe de un trabajo, compartido por todas las sesiones (cada sesión solo guarda el id)."""
+    job = job_store().get(job_id)
+    return job.report if job else None
+
+@st.cache_resource(show_spinner=False)
+def start_embedded_worker():
+    """Modo `embedded`: un único hilo de fondo por proceso atiende la cola (sobrevive a los reruns)."""
+    worker = IngestionWorker(service_registry().ingest_pipeline, job_store())
+    threading.Thread(target=worker.serve, args=(settings.INGEST_SCHEDULE_MINUTES,), name="ingestion-worker", daemon=True).start()
+    return worker
+
+def ensure_ingestion_worker():
+    if settings.INGEST_WORKER_MODE == "embedded":
+        start_embedded_worker()
+
+try:
+    # Solo comprobamos la configuración: los servicios se construyen al usarlos
+    settings.validate()
+except ValueError as e:
+    st.error(f"Error de inicialización: {e}")
+    st.stop()
+
+# El worker embebido arranca si hay ingestas programadas o trabajos pendientes (p. ej. tras reiniciar la app)
+latest_job = job_store().latest()
+if settings.INGEST_SCHEDULE_MINUTES > 0 or (latest_job is not None and latest_job.active):
+    ensure_ingestion_worker()
 
 # 3. Interfaz Principal
 st.title(settings.APP_TITLE)
@@ -116,37 +139,114 @@ st.markdown("Plataforma de inteligencia de mercado impulsada por RAG y Agentes A
 
 tab1, tab2 = st.tabs(["🔎 Buscador Semántico", "🧠 Análisis de Mercado (AI)"])
 
+def render_result_card(placeholder, res):
+    # La tarjeta solo necesita la proyección ligera (fragmento de 300 caracteres, sin cuerpo ni embedding)
+    res = InsightView.from_insight(res)
+    content_display = f"🤖 <b>AI Insight:</b> {res.relevance}" if res.relevance else res.snippet
+    
+    # Link handling
+    id_html = f" | 🆔 ID: {res.id}" if res.id is not None else ""
+    link_html = f'<a href="{res.url}" target="_blank" style="color: #60a5fa; text-decoration: none; font-weight: bold;">🔗 Leer noticia completa</a>' if res.url else "<span style='color: #64748b;'>Sin enlace disponible</span>"
+    
+    placeholder.markdown(f"""
+    <div class="stCard">
+        <h3>{res.title}</h3>
+        <p style="color: #94a3b8; font-size: 0.9em;">📂 {res.category}{id_html}</p>
+        <p style="margin-bottom: 15px; font-style: italic; color: #e2e8f0;">{content_display}</p>
+        {link_html}
+    </div>
+    """, unsafe_allow_html=True)
+
+@st.fragment
+def render_lazy_results(query, results):
+    """Pinta los resultados y los completa con las explicaciones a medida que están en caché."""
+    pipeline = service_registry().search_pipeline
+    pending = pipeline.fill_explanations(query, results)
+    background = settings.SEARCH_EXPLAIN_MODE == "background"
+    if background and pending:
+        pipeline.explain_in_background(query, results)
+
+    for i, res in enumerate(results):
+        render_result_card(st.empty(), res)
+        if not background and i in pending:
+            if st.button("🤖 Explicar relevancia", key=f"explain_{i}_{res.id}"):
+                with st.spinner("Generando explicación..."):
+                    pipeline.explain(query, res)
+                st.rerun(scope="fragment")
+
+    # Sondeamos solo este fragmento (no toda la página) hasta que llegan las explicaciones
+    if background and pending:
+        time.sleep(0.5)
+        st.rerun(scope="fragment")
+
+@st.fragment(run_every=1)
+def render_ingestion_status():
+    """Sondea el trabajo de ingesta más reciente y muestra su progreso y el resumen parcial."""
+    jobs = job_store()
+    job = jobs.latest()
+    if job is None:
+        return
+    if job.active:
+        progress = job.progress
+        stage_labels = {"fetch": "Extrayendo", "dedupe": "Filtrando duplicados", "embed": "Vectorizando",
+                        "write": "Guardando", "summarize": "Analizando", "done": "Finalizando"}
+        label = stage_labels.get(progress.get("stage"), "En cola") if job.status == "running" else "En cola"
+        st.info(f"🤖 Ingesta #{job.id}: {label}... "
+                f"(leídas {progress.get('fetched', 0)}, nuevas {progress.get('embedded', 0)}, guardadas {progress.get('inserted', 0)})")
+        if progress.get("partial_summary"):
+            st.markdown(progress["partial_summary"])
+        if settings.INGEST_WORKER_MODE == "external":
+            heartbeat = jobs.last_heartbeat()
+            if heartbeat is None or time.time() - heartbeat > max(30, settings.INGEST_WORKER_POLL_SECONDS * 5):
+                st.warning("No hay ningún worker activo. Inícialo con `python -m src.application.ingestion_worker daemon`.")
+    elif job.status == "failed":
+        st.error(f"Error en el pipeline de análisis: {job.error}")
+
+    latest = jobs.latest("succeeded")
+    if latest and st.session_state.get("seen_job_id") != latest.id and not job.active:
+        if "seen_job_id" in st.session_state:
+            st.success("¡Análisis completado exitosamente!")
+            if settings.INGEST_WORKER_MODE == "external":
+                # El worker externo escribió en otro proceso: reabrimos los índices locales para ver las filas nuevas
+                service_registry().reset()
+        st.session_state.seen_job_id = latest.id
+        st.rerun()
+
 # --- TAB 1: BUSCADOR ---
 with tab1:
     st.markdown("### Explorar Base de Conocimiento")
     query = st.text_input("¿Qué tendencia o tecnología deseas investigar hoy?", placeholder="Ej: Impacto de la IA en la economía...")
 
-    if query:
-        with st.spinner("Realizando búsqueda vectorial..."):
-            try:
-                results = st.session_state.search_pipeline.search(query)
-                
-                if results:
-                    st.subheader(f"Resultados Relevantes")
-                    for i, res in enumerate(results):
-                        # Generamos un pequeño resumen visual (1ros 300 caracteres)
-                        content_display = f"🤖 <b>AI Insight:</b> {res.relevance}" if res.relevance else (res.content[:300] + "..." if len(res.content) > 300 else res.content)
-                        
-                        # Link handling
-                        link_html = f'<a href="{res.url}" target="_blank" style="color: #60a5fa; text-decoration: none; font-weight: bold;">🔗 Leer noticia completa</a>' if res.url else "<span style='color: #64748b;'>Sin enlace disponible</span>"
-                        
-                        st.markdown(f"""
-                        <div class="stCard">
-                            <h3>{res.title}</h3>
-                            <p style="color: #94a3b8; font-size: 0.9em;">📂 {res.category} | 🆔 ID: {res.id}</p>
-                            <p style="margin-bottom: 15px; font-style: italic; color: #e2e8f0;">{content_display}</p>
-                            {link_html}
-                        </div>
-                        """, unsafe_allow_html=True)
-                else:
-                    st.info("No se encontraron resultados relevantes en la base de datos.")
-            except Exception as e:
-                st.error(f"Error durante la búsqueda: {e}")
+    if query and settings.SEARCH_EXPLAIN_MODE != "stream":
+        try:
+            # Modo perezoso: la búsqueda solo espera la consulta vectorial
+            with st.spinner("Realizando búsqueda vectorial..."):
+                results = service_registry().search_pipeline.search(query, explain=False)
+            
+            if results:
+                st.subheader(f"Resultados Relevantes")
+                render_lazy_results(query, results)
+            else:
+                st.info("No se encontraron resultados relevantes en la base de datos.")
+        except Exception as e:
+            st.error(f"Error durante la búsqueda: {e}")
+    elif query:
+        try:
+            with st.spinner("Realizando búsqueda vectorial..."):
+                results, explanations = service_registry().search_pipeline.search_stream(query)
+            
+            if results:
+                st.subheader(f"Resultados Relevantes")
+                # Las tarjetas se pintan ya con el fragmento y se completan cuando llega su explicación
+                cards = [st.empty() for _ in results]
+                for card, res in zip(cards, results):
+                    render_result_card(card, res)
+                for i, _ in explanations:
+                    render_result_card(cards[i], results[i])
+            else:
+                st.info("No se encontraron resultados relevantes en la base de datos.")
+        except Exception as e:
+            st.error(f"Error durante la búsqueda: {e}")
 
 # --- TAB 2: ANÁLISIS AI ---
 with tab2:
@@ -158,17 +258,20 @@ with tab2:
     with col_btn:
         st.write("") # Spacer
         if st.button("🔄 Ejecutar Análisis en Vivo"):
-            with st.spinner("🤖 Agente AI trabajando: Extrayendo, Vectorizando y Analizando..."):
-                try:
-                    summary, news_used = st.session_state.ingest_pipeline.run()
-                    st.session_state.last_summary = summary
-                    st.session_state.last_news = news_used
-                    st.success("¡Análisis completado exitosamente!")
-                except Exception as e:
-                    st.error(f"Error en el pipeline de análisis: {e}")
+            # La UI solo encola: el worker hace el trabajo y una sola ingesta corre a la vez
+            try:
+                ensure_ingestion_worker()
+                job = job_store().enqueue("ui")
+                st.toast(f"Ingesta #{job.id} en cola.")
+            except Exception as e:
+                st.error(f"Error en el pipeline de análisis: {e}")
+
+    # El progreso y el último informe se leen del almacén de trabajos (sobreviven a recargas de la página)
+    render_ingestion_status()
 
     # Mostrar Resultados si existen
-    if "last_summary" in st.session_state:
+    report = load_report(st.session_state.seen_job_id) if "seen_job_id" in st.session_state else None
+    if report is not None:
         st.markdown("---")
         
         # Columna Izquierda: Resumen (70%), Columna Derecha: Fuentes (30%)
@@ -176,19 +279,25 @@ with tab2:
         
         with col_summary:
             st.markdown("## 📊 Informe Ejecutivo de IA")
+            if report.from_cache:
+                st.caption("♻️ Informe servido desde caché: las noticias no cambiaron desde el último análisis.")
             st.markdown(f"""
             <div style="background-color: rgba(30, 41, 59, 0.8); padding: 25px; border-radius: 15px; border-left: 5px solid #8b5cf6;">
-                {st.session_state.last_summary}
+                {report.summary}
             </div>
             """, unsafe_allow_html=True)
             
         with col_sources:
             st.markdown("### 📰 Fuentes Analizadas")
-            if "last_news" in st.session_state and st.session_state.last_news:
-                for item in st.session_state.last_news:
-                    with st.expander(f"🔹 {item['title'][:50]}..."):
-                        st.caption(f"Categoría: {item['category']}")
-                        st.write(item['content'][:300] + "...")
+            if report.articles:
+                for i, item in enumerate(report.articles):
+                    with st.expander(f"🔹 {item.title[:50]}..."):
+                        st.caption(f"Categoría: {item.category}")
+                        st.write(item.snippet)
+                        # El cuerpo completo no vive en la sesión: se lee de la base solo si se pide
+                        if item.url and st.button("📄 Ver texto completo", key=f"full_text_{i}"):
+                            insight = service_registry().database.get_insight(item.url)
+                            st.write(insight.content if insight else "El texto completo no está disponible.")
             else:
                 st.write("No hay fuentes disponibles.")
 
@@ -198,3 +307,22 @@ st.sidebar.markdown(f"**Engine**: {settings.GENERATION_MODEL}")
 st.sidebar.markdown("**Data Source**: The Guardian API")
 st.sidebar.markdown("**Author**: Junior Andres Flores")
 st.sidebar.success("Sistema Operativo")
+
+# --- Métricas de rendimiento ---
+with st.sidebar.expander("⏱️ Rendimiento", expanded=False):
+    for run_name, label in (("ingestion", "Última ingesta"), ("search", "Última búsqueda")):
+        recorder = metrics.last_run(run_name)
+        if recorder is None:
+            continue
+        breakdown = recorder.breakdown()
+        st.markdown(f"**{label}**: {breakdown['seconds']} s")
+        st.dataframe(
+            [{"etapa": name, "llamadas": stat["count"], "total s": stat["total"], "máx s": stat["max"]}
+             for name, stat in breakdown["spans"].items() if name != run_name],
+            hide_index=True, use_container_width=True,
+        )
+        if breakdown["counters"]:
+            st.caption(" · ".join(f"{name}: {value:g}" for name, value in breakdown["counters"].items()))
+    snapshot = metrics.snapshot()
+    st.download_button("Descargar métricas (JSON)", json.dumps(snapshot, indent=2, ensure_ascii=False), file_name="metrics.json", mime="application/json")
+    st.download_button("Descargar métricas (Prometheus)", metrics.to_prometheus(), file_name="metrics.prom", mime="text/plain")
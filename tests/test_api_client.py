@@ -0,0 +1,66 @@
+import sys
+import os
+import httpx
+from datetime import datetime, timezone
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.infrastructure.api_client import DataProvider
+
+def guardian_handler(pages, failing_page=None, modified=None, requested=None):
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params["page"])
+        if requested is not None:
+            requested.append(page)
+        if page == failing_page:
+            return httpx.Response(500)
+        results = [
+            {"webTitle": f"P{page}-{i}", "sectionName": "Technology", "webUrl": f"https://g/{page}/{i}",
+             "fields": {"bodyText": "body", "lastModified": (modified or {}).get((page, i), f"2026-01-0{page}T10:0{i}:00Z")}}
+            for i in range(2)
+        ]
+        return httpx.Response(200, json={"response": {"pages": pages, "currentPage": page, "results": results}})
+    return handler
+
+def test_iter_articles_walks_all_pages(monkeypatch):
+    """El generador recorre todas las páginas con el cliente compartido y normaliza cada artículo."""
+    client = httpx.Client(transport=httpx.MockTransport(guardian_handler(pages=4)))
+    monkeypatch.setattr(DataProvider, "_client", client)
+
+    articles = list(DataProvider.iter_articles())
+    assert len(articles) == 8
+    assert {a["title"] for a in articles} == {f"P{p}-{i}" for p in range(1, 5) for i in range(2)}
+    assert articles[0]["title"] == "P1-0"
+    assert articles[0]["url"] == "https://g/1/0"
+    assert articles[0]["content"] == "body"
+
+def test_failed_page_is_skipped(monkeypatch):
+    """Una página con error no corta la ingesta del resto."""
+    client = httpx.Client(transport=httpx.MockTransport(guardian_handler(pages=3, failing_page=2)))
+    monkeypatch.setattr(DataProvider, "_client", client)
+
+    titles = {a["title"] for a in DataProvider.iter_articles()}
+    assert titles == {"P1-0", "P1-1", "P3-0", "P3-1"}
+
+def test_incremental_window_uses_watermark():
+    """Con marca de agua se consulta por fecha de modificación desde la marca menos el solape."""
+    window = DataProvider._build_window(datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc))
+    assert window["from-date"] == "2026-01-01T11:30:00Z"
+    assert window["use-date"] == "last-modified"
+    # Filtrar y ordenar por la misma fecha: si no, Guardian ordena por publicación
+    assert window["order-date"] == "last-modified" and window["order-by"] == "oldest"
+    assert "to-date" not in window
+
+def test_truncated_incremental_run_stops_at_last_fetched_page(monkeypatch):
+    """Con más páginas que GUARDIAN_MAX_PAGES no se entrega nada modificado después de la última página leída."""
+    monkeypatch.setattr("src.config.settings.settings.GUARDIAN_MAX_PAGES", 3)
+    requested = []
+    # Una edición posterior a la página 3 aparece (fuera de orden) en la página 2
+    handler = guardian_handler(pages=5, modified={(2, 1): "2026-01-09T10:00:00Z"}, requested=requested)
+    monkeypatch.setattr(DataProvider, "_client", httpx.Client(transport=httpx.MockTransport(handler)))
+
+    articles = list(DataProvider.iter_articles(since=datetime(2026, 1, 1, tzinfo=timezone.utc)))
+    assert sorted(requested) == [1, 2, 3]
+    assert {a["title"] for a in articles} == {"P1-0", "P1-1", "P2-0", "P3-0", "P3-1"}
+    assert max(a["last_modified"] for a in articles) == "2026-01-03T10:01:00Z"
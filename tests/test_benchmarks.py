@@ -0,0 +1,57 @@
+import sys
+import os
+from argparse import Namespace
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "benchmarks")))
+
+import run_benchmarks
+from run_benchmarks import run
+
+def make_args(**overrides):
+    args = dict(articles=60, queries=10, dim=16, search_mode="hybrid", lazy_explanations=False,
+                fetch_latency_ms=0, embed_latency_ms=0, db_latency_ms=0, llm_latency_ms=0,
+                duplicate_rate=0.0, fetch_failure_rate=0.0, embed_failure_rate=0.0, db_failure_rate=0.0)
+    args.update(overrides)
+    return Namespace(**args)
+
+def test_benchmark_runs_offline_and_counts_calls(monkeypatch):
+    """El benchmark corre sin red, ingiere todo y cuenta las llamadas por servicio."""
+    monkeypatch.setattr("src.config.settings.settings.SEARCH_MODE", "hybrid")
+    monkeypatch.setattr("src.config.settings.settings.INCREMENTAL_INGESTION", False)
+    result = run(make_args())
+    assert result["ingest"]["error"] is None and result["ingest"]["stored"] == 60
+    assert result["search"]["errors"] == 0 and result["search"]["latency_ms"]["p50"] is not None
+    # 60 artículos en páginas de 50 -> 2 páginas; 10 búsquedas -> 10 embeddings de consulta
+    assert result["calls"]["guardian"] == {"fetch_page": 2}
+    assert result["calls"]["embedding"]["embed"] == 10
+
+def test_injected_failures_are_deterministic(monkeypatch):
+    """Con la misma tasa de fallos dos ejecuciones pierden exactamente los mismos artículos."""
+    monkeypatch.setattr("src.config.settings.settings.SEARCH_MODE", "hybrid")
+    monkeypatch.setattr("src.config.settings.settings.INCREMENTAL_INGESTION", False)
+    first = run(make_args(embed_failure_rate=0.3))
+    second = run(make_args(embed_failure_rate=0.3))
+    assert first["ingest"]["stored"] == second["ingest"]["stored"] < 60
+    assert first["calls"] == second["calls"]
+
+def test_fake_database_supports_in_place_updates():
+    """El doble de la base implementa el puerto completo: las ediciones se re-escriben en su fila."""
+    from fakes import FakeVectorDatabase
+    from src.domain.entities import Insight
+    db = FakeVectorDatabase()
+    db.insert_insights([Insight("T", "viejo", "Tech", "https://g/1", embedding=[1.0, 0.0], content_hash="h1")])
+    report = db.update_insights([Insight("T", "nuevo", "Tech", "https://g/1", embedding=[0.0, 1.0], content_hash="h2")])
+    assert (report.inserted, report.updated) == (0, 1)
+    assert db.count == 1 and db.get_insight("https://g/1").content == "nuevo"
+    assert db.get_content_hashes(["https://g/1", "https://g/2"]) == {"https://g/1": "h2"}
+
+def test_unresolved_commit_requires_output(monkeypatch):
+    """Sin commit resoluble no se escribe un JSON genérico: hay que pasar --output."""
+    monkeypatch.setattr(run_benchmarks, "git_commit", lambda: None)
+    monkeypatch.setattr(sys, "argv", ["run_benchmarks.py", "--articles", "1"])
+    with pytest.raises(SystemExit):
+        run_benchmarks.main()
+    assert not os.path.exists(os.path.join(run_benchmarks.RESULTS_DIR, "None.json"))
@@ -0,0 +1,34 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.domain.chunking import CHARS_PER_TOKEN, iter_chunk_spans
+
+def make_text(sentences):
+    return " ".join(f"La frase número {i} habla de chips, nubes y modelos de lenguaje." for i in range(sentences))
+
+def test_short_text_is_a_single_chunk():
+    """Un texto que entra en el presupuesto se devuelve entero."""
+    assert list(iter_chunk_spans("Hola mundo", max_tokens=10)) == [(0, 10)]
+    assert list(iter_chunk_spans("", max_tokens=10)) == [(0, 0)]
+
+def test_chunks_are_bounded_overlapping_and_cover_the_text():
+    """Ningún fragmento supera el límite, los consecutivos se solapan y juntos cubren todo el texto."""
+    text = make_text(60)
+    spans = list(iter_chunk_spans(text, max_tokens=64, overlap_tokens=16))
+
+    assert len(spans) > 1
+    assert all(end - start <= 64 * CHARS_PER_TOKEN for start, end in spans)
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    for (_, prev_end), (start, _) in zip(spans, spans[1:]):
+        assert start < prev_end
+    # Los cortes caen al final de una oración siempre que se pueda
+    assert all(text[end - 1] == "." for _, end in spans)
+
+def test_long_word_is_split_hard():
+    """Una palabra más larga que el tramo se corta en seco sin bucles infinitos."""
+    text = "x" * 100 + " fin"
+    spans = list(iter_chunk_spans(text, max_tokens=10, overlap_tokens=2))
+    assert spans == [(0, 40), (40, 80), (80, len(text))]
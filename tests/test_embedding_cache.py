@@ -0,0 +1,54 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.domain.interfaces import EmbeddingService
+from src.infrastructure.embedding_cache import CachedEmbeddingService
+
+class CountingEmbeddingService(EmbeddingService):
+    model_name = "fake-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_embedding(self, text, task_type="RETRIEVAL_DOCUMENT"):
+        self.calls += 1
+        return [float(len(text)), 0.5, -0.25]
+
+def test_cache_hits_skip_network(tmp_path):
+    """Un texto ya visto (incluso tras reabrir la caché) no vuelve a llamar al servicio."""
+    inner = CountingEmbeddingService()
+    path = str(tmp_path / "emb.sqlite3")
+    cache = CachedEmbeddingService(inner, path=path)
+
+    first = cache.generate_embeddings(["hola", "mundo", "hola"])
+    assert first == [[4.0, 0.5, -0.25], [5.0, 0.5, -0.25], [4.0, 0.5, -0.25]]
+    assert inner.calls == 2
+
+    reopened = CachedEmbeddingService(inner, path=path)
+    assert reopened.generate_embedding("mundo") == [5.0, 0.5, -0.25]
+    assert inner.calls == 2
+    assert reopened.stats()["hits"] == 1
+
+    # El task_type forma parte de la clave
+    reopened.generate_embedding("mundo", task_type="RETRIEVAL_QUERY")
+    assert inner.calls == 3
+
+def test_lru_eviction(tmp_path):
+    """Al superar el tamaño máximo se elimina la entrada menos usada recientemente."""
+    inner = CountingEmbeddingService()
+    # Cada vector ocupa 12 bytes: caben dos
+    cache = CachedEmbeddingService(inner, path=str(tmp_path / "emb.sqlite3"), max_bytes=24)
+
+    cache.generate_embedding("a")
+    cache.generate_embedding("bb")
+    cache.generate_embedding("a")  # "a" pasa a ser la más reciente
+    cache.generate_embedding("ccc")  # desaloja "bb"
+    assert inner.calls == 3
+
+    cache.generate_embedding("a")
+    assert inner.calls == 3
+    cache.generate_embedding("bb")
+    assert inner.calls == 4
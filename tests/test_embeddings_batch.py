@@ -0,0 +1,68 @@
+import sys
+import os
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.infrastructure.embeddings import GeminiEmbeddingService, pack_batches
+from src.infrastructure.rate_limiter import AdaptiveRateLimiter
+
+class FakeModels:
+    """Simula `client.models` de Gemini: falla cualquier request que contenga 'boom'."""
+    def __init__(self):
+        self.calls = []
+
+    def embed_content(self, model, contents, config):
+        texts = contents if isinstance(contents, list) else [contents]
+        self.calls.append(list(texts))
+        if any("boom" in t for t in texts):
+            raise RuntimeError("500 INTERNAL")
+        if any("quota" in t for t in texts):
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=[float(len(t))]) for t in texts])
+
+def make_service(batch_size=2, batch_max_tokens=16000):
+    service = GeminiEmbeddingService.__new__(GeminiEmbeddingService)
+    service.client = SimpleNamespace(models=FakeModels())
+    service.model_name = "fake"
+    service.batch_size = batch_size
+    service.batch_max_tokens = batch_max_tokens
+    service.max_concurrency = 3
+    service.max_retries = 1
+    service.limiter = AdaptiveRateLimiter("test", requests_per_minute=60000, tokens_per_minute=1e9, max_concurrency=3)
+    return service
+
+def test_batches_preserve_order():
+    """Los embeddings vuelven en el mismo orden que los textos aunque los lotes terminen desordenados."""
+    service = make_service()
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+    embeddings = service.generate_embeddings(texts)
+    assert embeddings == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    # 5 textos en lotes de 2 -> 3 requests
+    assert len(service.client.models.calls) == 3
+
+def test_failed_item_is_isolated():
+    """Si un lote falla solo el ítem problemático queda sin embedding."""
+    service = make_service()
+    embeddings = service.generate_embeddings(["ok", "boom", "fine"])
+    assert embeddings == [[2.0], None, [4.0]]
+
+def test_rate_limited_batch_is_not_split_per_item(monkeypatch):
+    """Un lote rechazado por cuota no se reintenta ítem por ítem: sus textos quedan sin embedding."""
+    monkeypatch.setattr("time.sleep", lambda _: None)
+    service = make_service(batch_size=3)
+    embeddings = service.generate_embeddings(["quota", "a", "b"])
+    assert embeddings == [None, None, None]
+    assert all(len(call) == 3 for call in service.client.models.calls)
+
+def test_batches_respect_token_budget():
+    """Un lote se corta al llegar al límite de tokens aunque queden plazas; un texto enorme va solo."""
+    texts = ["a" * 40, "b" * 40, "c" * 40, "d" * 400, "e" * 4]
+    batches = list(pack_batches(texts, max_items=10, max_tokens=25))
+    # ~4 caracteres por token: 10 + 10 caben, el tercero ya no
+    assert [(start, len(batch)) for start, batch in batches] == [(0, 2), (2, 1), (3, 1), (4, 1)]
+
+    service = make_service(batch_size=10, batch_max_tokens=25)
+    assert service.generate_embeddings(texts) == [[40.0], [40.0], [40.0], [400.0], [4.0]]
+    assert sorted(len(call) for call in service.client.models.calls) == [1, 1, 1, 2]
@@ -0,0 +1,26 @@
+import sys
+import os
+from array import array
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.domain.entities import Insight, InsightView, IngestionReport
+
+def test_insight_is_slotted_with_array_embedding():
+    """Insight no tiene __dict__ y guarda el embedding como array('f'), venga de lista o de ndarray."""
+    from_list = Insight("T", "C", "Tech", embedding=[0.5, 1.5])
+    from_numpy = Insight("T", "C", "Tech", embedding=np.array([0.5, 1.5], dtype=np.float64))
+    assert not hasattr(from_list, "__dict__")
+    assert from_list.embedding == from_numpy.embedding == array("f", [0.5, 1.5])
+    assert Insight("T", "C", "Tech").embedding is None
+
+def test_report_compact_keeps_only_snippets():
+    """La proyección recorta el cuerpo: su tamaño no depende de lo largo que sea el artículo."""
+    article = {"title": "T", "category": "Tech", "url": "https://x/1", "content": "x" * 100_000}
+    report = IngestionReport("Resumen", [article]).compact()
+    view = report.articles[0]
+    assert isinstance(view, InsightView)
+    assert view.url == "https://x/1" and len(view.snippet) == InsightView.SNIPPET_CHARS + 3
+    assert report.compact().articles[0] is view
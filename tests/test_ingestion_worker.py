@@ -0,0 +1,84 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.infrastructure.api_client import DataProvider
+from src.infrastructure.file_lock import SingleFlightLock
+from src.infrastructure.job_store import JobStore
+from src.application.ingestion_worker import IngestionWorker
+from test_pipeline import FakeGuardian, make_article, make_pipeline
+
+def make_worker(tmp_path, monkeypatch, articles):
+    monkeypatch.setattr(DataProvider, "iter_articles", FakeGuardian(articles))
+    pipeline, _ = make_pipeline(tmp_path)
+    jobs = JobStore(str(tmp_path / "jobs.sqlite3"))
+    return IngestionWorker(pipeline, jobs, SingleFlightLock(str(tmp_path / "ingestion.lock"))), jobs
+
+def test_enqueue_is_single_flight(tmp_path):
+    """Mientras hay un trabajo pendiente o en curso, encolar devuelve ese mismo trabajo."""
+    jobs = JobStore(str(tmp_path / "jobs.sqlite3"))
+    first = jobs.enqueue("ui")
+    assert jobs.enqueue("scheduler").id == first.id
+
+    claimed = jobs.claim_next()
+    assert claimed.id == first.id and claimed.status == "running"
+    assert jobs.claim_next() is None
+    assert jobs.enqueue("ui").id == first.id
+
+    jobs.fail(first.id, "boom")
+    assert jobs.enqueue("ui").id != first.id
+
+def test_lock_is_exclusive(tmp_path):
+    """Solo un holder del lock a la vez; al liberarlo otro puede tomarlo."""
+    path = str(tmp_path / "ingestion.lock")
+    a, b = SingleFlightLock(path), SingleFlightLock(path)
+    assert a.acquire()
+    assert not b.acquire()
+    a.release()
+    assert b.acquire()
+    b.release()
+
+def test_worker_persists_report_and_progress(tmp_path, monkeypatch):
+    """El worker ejecuta el trabajo y deja el informe y los contadores en el almacén."""
+    worker, jobs = make_worker(tmp_path, monkeypatch, [make_article(i, f"2026-01-01T1{i}:00:00Z") for i in range(3)])
+
+    job = worker.run_once(source="test")
+
+    assert job.status == "succeeded"
+    assert job.report.summary == "Resumen de 3 noticias"
+    # Se persiste la proyección ligera, no el cuerpo completo
+    assert [a.title for a in job.report.articles] == ["Noticia 2", "Noticia 1", "Noticia 0"]
+    assert job.report.articles[0].snippet == "Contenido de la noticia 2"
+    assert job.progress["stage"] == "done"
+    assert job.progress["fetched"] == 3 and job.progress["inserted"] == 3
+    assert jobs.latest("succeeded").id == job.id
+
+def test_worker_skips_when_lock_is_held(tmp_path, monkeypatch):
+    """Si otro proceso tiene el lock, el trabajo queda en cola sin ejecutarse."""
+    worker, jobs = make_worker(tmp_path, monkeypatch, [make_article(1, "2026-01-01T10:00:00Z")])
+    other = SingleFlightLock(str(tmp_path / "ingestion.lock"))
+    assert other.acquire()
+    try:
+        job = worker.run_once()
+        assert job.status == "queued"
+    finally:
+        other.release()
+    assert worker.process_pending() == 1
+    assert jobs.get(job.id).status == "succeeded"
+
+def test_failed_ingestion_and_orphans_are_recorded(tmp_path, monkeypatch):
+    """Un fallo del pipeline queda registrado y los `running` huérfanos se cierran como fallidos."""
+    worker, jobs = make_worker(tmp_path, monkeypatch, [make_article(1, "2026-01-01T10:00:00Z")])
+    # Simula un worker que murió con un trabajo a medias
+    orphan = jobs.enqueue("ui")
+    jobs.claim_next()
+
+    def broken_insert(insights):
+        raise RuntimeError("payload too large")
+    monkeypatch.setattr(worker.pipeline.database, "insert_insights", broken_insert)
+
+    job = worker.run_once()
+    assert jobs.get(orphan.id).status == "failed"
+    assert job.status == "failed" and "payload too large" in job.error
@@ -0,0 +1,43 @@
+import sys
+import os
+import sqlite3
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.infrastructure.kv_cache import SqliteKVCache
+
+def rows(path, namespace):
+    with sqlite3.connect(path) as conn:
+        return {key for (key,) in conn.execute("SELECT key FROM kv_cache WHERE namespace = ?", (namespace,))}
+
+def test_expired_entries_are_deleted(tmp_path, monkeypatch):
+    """Lo vencido no solo deja de leerse: se borra al escribir y al abrir la caché."""
+    path = str(tmp_path / "kv.sqlite3")
+    now = [1000.0]
+    monkeypatch.setattr("time.time", lambda: now[0])
+    cache = SqliteKVCache(path, "reports", ttl_seconds=60)
+    cache.set("viejo", "a")
+    now[0] += 120
+    assert cache.get("viejo") is None
+    cache.set("nuevo", "b")
+    assert rows(path, "reports") == {"nuevo"}
+
+    now[0] += 120
+    SqliteKVCache(path, "reports", ttl_seconds=60)
+    assert rows(path, "reports") == set()
+
+def test_entries_are_capped_with_lru(tmp_path):
+    """Por encima de max_entries se descartan las entradas usadas hace más tiempo, solo en su namespace."""
+    path = str(tmp_path / "kv.sqlite3")
+    other = SqliteKVCache(path, "reports", max_entries=1)
+    other.set("informe", 1)
+    cache = SqliteKVCache(path, "article_summaries", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert rows(path, "article_summaries") == {"a", "c"}
+    assert cache.get("b") is None
+    assert other.get("informe") == 1
@@ -0,0 +1,63 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.domain.entities import Insight
+from src.infrastructure.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+def make_insight(i, title, content):
+    return Insight(title=title, content=content, category="Business", url=f"https://g/{i}")
+
+def test_tokenize_normalizes_accents_and_keeps_tickers():
+    """Minúsculas, sin acentos ni palabras vacías, y los tickers/siglas quedan enteros."""
+    assert tokenize("La Economía de EE.UU. y el S&P 500") == ["economia", "ee.uu", "s&p", "500"]
+
+def test_bm25_ranks_exact_terms_and_persists(tmp_path):
+    """Un término raro (ticker) pesa más que uno común y el índice sobrevive a un reinicio."""
+    path = str(tmp_path / "lexical.sqlite3")
+    index = LexicalIndex(path)
+    added = index.add_many([
+        make_insight(1, "Markets rally", "Stocks rally as markets open higher"),
+        make_insight(2, "Chipmaker results", "Nvidia NVDA beats forecasts; markets react"),
+        make_insight(3, "Oil prices", "Crude oil falls as markets weigh demand"),
+    ])
+    assert added == 3
+    # Idempotente por URL
+    assert index.add_many([make_insight(1, "Markets rally", "otra versión")]) == 0
+
+    reopened = LexicalIndex(path)
+    assert reopened.count == 3
+    assert [r.url for r in reopened.search("NVDA markets", count=2)][0] == "https://g/2"
+    assert reopened.search("inexistente") == []
+
+def test_rrf_rewards_documents_in_both_rankings():
+    """Un documento presente en ambos rankings supera a los que solo están arriba en uno."""
+    a, b, c = (make_insight(i, f"T{i}", "x") for i in range(3))
+    fused = reciprocal_rank_fusion([[a, b], [c, b]], count=3)
+    assert fused[0] is b and {i.url for i in fused} == {a.url, b.url, c.url}
+
+def test_stats_are_read_at_query_time(tmp_path):
+    """Otra instancia (otro proceso) que escribe en el mismo archivo se refleja en count y en los puntajes."""
+    path = str(tmp_path / "lexical.sqlite3")
+    reader = LexicalIndex(path)
+    assert reader.count == 0
+    LexicalIndex(path).add_many([
+        make_insight(1, "Chipmaker results", "Nvidia NVDA beats forecasts"),
+        make_insight(2, "Oil prices", "Crude oil falls as markets weigh demand"),
+    ])
+    assert reader.count == 2
+    scored = reader.search_scored("NVDA", count=5)
+    assert [i.url for i, _ in scored] == ["https://g/1"]
+    # Normalizado: cubrir un solo término de una consulta larga pesa poco
+    assert 0 < scored[0][1] <= 1
+    assert reader.search_scored("NVDA ventas globales récord", count=5)[0][1] < scored[0][1] / 2
+
+def test_set_ids_fills_missing_database_ids(tmp_path):
+    """Los documentos indexados sin id de la base lo reciben después con set_ids."""
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    index.add_many([make_insight(1, "Chipmaker results", "Nvidia NVDA beats forecasts")])
+    assert index.search("NVDA")[0].id is None
+    index.set_ids({"https://g/1": 42})
+    assert index.search("NVDA")[0].id == 42
@@ -0,0 +1,101 @@
+import sys
+import os
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.domain.entities import Insight, WriteReport
+from src.domain.interfaces import EmbeddingService, LLMService, VectorDatabase
+from src.infrastructure.llm_service import GeminiLLMService, parse_numbered_lines, DEFAULT_EXPLANATION
+from src.infrastructure.rate_limiter import AdaptiveRateLimiter
+from src.application.pipeline import SearchPipeline
+
+def test_lines_are_parsed_as_soon_as_they_complete():
+    """Una línea se entrega al llegar su salto de línea aunque venga partida en varios fragmentos."""
+    chunks = iter(["0: primera ex", "plicación\n1", ": segunda\nbasura\n", "2: sin salto final"])
+    parsed = parse_numbered_lines(chunks, 3)
+    assert next(parsed) == (0, "primera explicación")
+    assert next(parsed) == (1, "segunda")
+    assert list(parsed) == [(2, "sin salto final")]
+
+def test_parser_ignores_out_of_range_and_repeated_indices():
+    """Índices inexistentes o repetidos no sobrescriben explicaciones ya entregadas."""
+    assert list(parse_numbered_lines(["Item 0: a\n5: fuera\n0: b\n"], 2)) == [(0, "a")]
+
+class FakeStreamingModels:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def generate_content_stream(self, model, contents):
+        return (SimpleNamespace(text=c) for c in self.chunks)
+
+def make_llm(chunks):
+    service = GeminiLLMService.__new__(GeminiLLMService)
+    service.client = SimpleNamespace(models=FakeStreamingModels(chunks))
+    service.model_name = "fake"
+    service.limiter = AdaptiveRateLimiter("test", requests_per_minute=60000, tokens_per_minute=1e9, max_concurrency=2)
+    return service
+
+def test_gemini_stream_fills_missing_explanations():
+    """Los ítems que el modelo no explicó reciben el texto por defecto al final del stream."""
+    insights = [Insight(title=f"T{i}", content="c", category="x") for i in range(3)]
+    llm = make_llm(["1: uno\n", "0: cero\n"])
+    assert list(llm.stream_explanations("q", insights)) == [(1, "uno"), (0, "cero"), (2, DEFAULT_EXPLANATION)]
+    assert "".join(make_llm(["Hola ", "mundo"]).stream_summary(["texto"])) == "Hola mundo"
+
+class FakeEmbeddingService(EmbeddingService):
+    def generate_embedding(self, text, task_type="RETRIEVAL_DOCUMENT"):
+        return [1.0]
+
+class FakeDatabase(VectorDatabase):
+    def insert_insights(self, insights):
+        pass
+
+    def search_insights(self, query_embedding, threshold=0.5, count=5):
+        return [Insight(title=f"T{i}", content="c", category="x") for i in range(2)]
+
+    def get_existing_urls(self, urls):
+        return []
+
+    def list_urls(self):
+        return []
+
+    def list_insights(self):
+        return iter([])
+
+    def update_insights(self, insights):
+        return WriteReport(updated=len(insights))
+
+    def get_insight(self, url):
+        return None
+
+class FakeStreamingLLM(LLMService):
+    def __init__(self):
+        self.streams = 0
+
+    def generate_summary(self, texts):
+        return ""
+
+    def explain_relevance(self, query, insights):
+        return []
+
+    def stream_explanations(self, query, insights):
+        self.streams += 1
+        yield 1, "segunda"
+        yield 0, "primera"
+
+def test_search_stream_fills_results_incrementally():
+    """Los resultados llegan antes que las explicaciones y se cachean completos al terminar el stream."""
+    llm = FakeStreamingLLM()
+    pipeline = SearchPipeline(FakeEmbeddingService(), FakeDatabase(), llm)
+    results, explanations = pipeline.search_stream("ia")
+    assert [r.relevance for r in results] == [None, None]
+
+    assert next(explanations) == (1, "segunda")
+    assert [r.relevance for r in results] == [None, "segunda"]
+    list(explanations)
+
+    cached, rest = pipeline.search_stream("ia")
+    assert [r.relevance for r in cached] == ["primera", "segunda"]
+    assert list(rest) == [] and llm.streams == 1
@@ -0,0 +1,181 @@
+import sys
+import os
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.domain.entities import Chunk, Insight
+from src.infrastructure.local_vector_db import LocalVectorDatabase
+
+def make_insight(i, embedding):
+    return Insight(title=f"T{i}", content=f"Contenido {i}", category="Technology", url=f"https://x/{i}", embedding=embedding)
+
+def test_search_matches_exact_cosine(tmp_path):
+    """El top-k local coincide con la similitud coseno calculada a mano y respeta threshold/count."""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 16)).astype(np.float32)
+    db = LocalVectorDatabase(directory=str(tmp_path))
+    db.insert_insights([make_insight(i, v.tolist()) for i, v in enumerate(vectors)])
+
+    query = rng.normal(size=16).astype(np.float32)
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normed @ (query / np.linalg.norm(query))
+    expected = [f"T{i}" for i in np.argsort(-scores) if scores[i] > 0.1][:5]
+
+    results = db.search_insights(query.tolist(), threshold=0.1, count=5)
+    assert [r.title for r in results] == expected
+    assert db.search_insights(query.tolist(), threshold=0.99, count=5) == []
+
+def test_insert_appends_and_persists(tmp_path, monkeypatch):
+    """Las inserciones crecen el índice por encima de la capacidad inicial y sobreviven a reabrirlo."""
+    monkeypatch.setattr(LocalVectorDatabase, "INITIAL_CAPACITY", 4)
+    db = LocalVectorDatabase(directory=str(tmp_path))
+    for batch in range(3):
+        db.insert_insights([make_insight(batch * 3 + j, [1.0, float(batch * 3 + j)]) for j in range(3)])
+    assert db.count == 9
+
+    reopened = LocalVectorDatabase(directory=str(tmp_path))
+    assert reopened.count == 9
+    assert reopened.get_existing_urls(["https://x/0", "https://x/8", "https://x/99"]) == ["https://x/0", "https://x/8"]
+    assert reopened.search_insights([1.0, 8.0], threshold=0.0, count=1)[0].title == "T8"
+
+def test_ivf_full_probe_matches_exact(tmp_path, monkeypatch):
+    """Con nprobe igual al número de listas el IVF devuelve lo mismo que la búsqueda exacta."""
+    monkeypatch.setattr("src.config.settings.settings.IVF_MIN_TRAIN_SIZE", 100)
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(300, 8)).astype(np.float32)
+    exact = LocalVectorDatabase(directory=str(tmp_path / "exact"), index_mode="exact")
+    ann = LocalVectorDatabase(directory=str(tmp_path / "ivf"), index_mode="ivf")
+    for db in (exact, ann):
+        db.insert_insights([make_insight(i, v.tolist()) for i, v in enumerate(vectors[:200])])
+        # Inserción incremental después del entrenamiento
+        db.insert_insights([make_insight(i, v.tolist()) for i, v in enumerate(vectors[200:], start=200)])
+    ann.rebuild(n_lists=10)
+
+    query = rng.normal(size=8).tolist()
+    expected = [r.title for r in exact.search_insights(query, threshold=-1.0, count=10)]
+    assert [r.title for r in ann.search_insights(query, threshold=-1.0, count=10, nprobe=10)] == expected
+
+    # Reabrir conserva centroides y asignaciones
+    reopened = LocalVectorDatabase(directory=str(tmp_path / "ivf"), index_mode="ivf")
+    assert [r.title for r in reopened.search_insights(query, threshold=-1.0, count=10, nprobe=10)] == expected
+
+def test_rebuild_keeps_exact_mode_exhaustive(tmp_path):
+    """rebuild() en modo exacto solo compacta: los resultados no cambian y no se entrena ningún IVF."""
+    rng = np.random.default_rng(2)
+    vectors = rng.normal(size=(300, 8)).astype(np.float32)
+    db = LocalVectorDatabase(directory=str(tmp_path), index_mode="exact")
+    db.insert_insights([make_insight(i, v.tolist()) for i, v in enumerate(vectors)])
+    queries = rng.normal(size=(10, 8))
+    before = [[r.id for r in db.search_insights(q.tolist(), threshold=-1.0, count=10)] for q in queries]
+
+    db.rebuild(n_lists=10)
+    assert db._ivf is None
+    assert [[r.id for r in db.search_insights(q.tolist(), threshold=-1.0, count=10)] for q in queries] == before
+
+def test_quantized_search_reranks_with_float32(tmp_path, monkeypatch):
+    """int8/float16 barren la copia compacta y el top-k final (re-puntuado en float32) coincide con el exacto."""
+    monkeypatch.setattr(LocalVectorDatabase, "INITIAL_CAPACITY", 16)
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(200, 32)).astype(np.float32)
+    insights = [make_insight(i, v.tolist()) for i, v in enumerate(vectors)]
+    exact = LocalVectorDatabase(directory=str(tmp_path / "exact"))
+    exact.insert_insights(insights)
+    query = rng.normal(size=32).tolist()
+    expected = exact.search_insights(query, threshold=-1.0, count=5)
+
+    for mode in ("int8", "float16"):
+        db = LocalVectorDatabase(directory=str(tmp_path / mode), quantization=mode)
+        db.insert_insights(insights[:100])
+        db.insert_insights(insights[100:])
+        results = db.search_insights(query, threshold=-1.0, count=5)
+        assert [r.id for r in results] == [r.id for r in expected]
+        assert db._quantized.dtype == (np.int8 if mode == "int8" else np.float16)
+
+    # Activar la cuantización sobre un índice existente construye la copia al abrirlo
+    upgraded = LocalVectorDatabase(directory=str(tmp_path / "exact"), quantization="int8")
+    assert [r.id for r in upgraded.search_insights(query, threshold=-1.0, count=5)] == [r.id for r in expected]
+
+def test_quantized_search_covers_count_articles_with_long_chunks(tmp_path, monkeypatch):
+    """Aunque los fragmentos de artículos largos llenen la ventana de re-puntuado, vuelven `count` artículos."""
+    monkeypatch.setattr("src.config.settings.settings.QUANT_RERANK_FACTOR", 1)
+    rng = np.random.default_rng(11)
+    query = rng.normal(size=16).astype(np.float32)
+    insights = []
+    for i in range(3):
+        # Doce fragmentos casi iguales a la consulta: acaparan los primeros puestos
+        chunks = [Chunk(k, k, k + 1, (query + 0.05 * rng.normal(size=16)).astype(np.float32).tolist()) for k in range(12)]
+        insights.append(Insight(title=f"L{i}", content="x" * 12, category="Technology", url=f"https://x/l{i}",
+                                embedding=chunks[0].embedding, chunks=chunks))
+    insights += [make_insight(i, rng.normal(size=16).tolist()) for i in range(20)]
+
+    for mode in ("none", "int8"):
+        db = LocalVectorDatabase(directory=str(tmp_path / mode), quantization=mode)
+        db.insert_insights(insights)
+        results = db.search_insights(query.tolist(), threshold=-1.0, count=5)
+        assert len({r.url for r in results}) == 5
+        assert {r.url for r in results[:3]} == {"https://x/l0", "https://x/l1", "https://x/l2"}
+
+def test_get_insight_by_url(tmp_path):
+    """El texto completo se recupera por URL, también tras reabrir el índice."""
+    db = LocalVectorDatabase(directory=str(tmp_path))
+    db.insert_insights([make_insight(i, [1.0, float(i)]) for i in range(3)])
+    reopened = LocalVectorDatabase(directory=str(tmp_path))
+    assert reopened.get_insight("https://x/2").content == "Contenido 2"
+    assert reopened.get_insight("https://x/99") is None
+
+def test_update_overwrites_vector_and_hash(tmp_path, monkeypatch):
+    """update_insights sobrescribe el vector en su fila (también en IVF) y persiste el nuevo hash."""
+    monkeypatch.setattr("src.config.settings.settings.IVF_MIN_TRAIN_SIZE", 4)
+    db = LocalVectorDatabase(directory=str(tmp_path), index_mode="ivf")
+    db.insert_insights([make_insight(i, [1.0, 0.0] if i % 2 else [0.0, 1.0]) for i in range(6)])
+    before = db.get_content_hashes(["https://x/1"])["https://x/1"]
+
+    edited = Insight(title="T1", content="Contenido editado", category="Technology", url="https://x/1", embedding=[0.0, 1.0])
+    assert db.update_insights([edited]).updated == 1
+
+    reopened = LocalVectorDatabase(directory=str(tmp_path), index_mode="ivf")
+    assert reopened.count == 6
+    assert reopened.get_content_hashes(["https://x/1"])["https://x/1"] != before
+    assert reopened.get_insight("https://x/1").content == "Contenido editado"
+    top = reopened.search_insights([0.0, 1.0], threshold=0.9, count=10)
+    assert "https://x/1" in [r.url for r in top]
+
+def make_chunked(i, chunk_vectors):
+    content = " ".join(f"parte{k}" for k in range(len(chunk_vectors)))
+    spans = [(content.index(f"parte{k}"), content.index(f"parte{k}") + len(f"parte{k}")) for k in range(len(chunk_vectors))]
+    chunks = [Chunk(k, start, end, v) for k, ((start, end), v) in enumerate(zip(spans, chunk_vectors))]
+    return Insight(title=f"T{i}", content=content, category="Technology", url=f"https://x/{i}",
+                   embedding=np.mean(chunk_vectors, axis=0).tolist(), chunks=chunks)
+
+def test_chunks_are_aggregated_per_article(tmp_path, monkeypatch):
+    """Cada artículo aparece una vez, con la puntuación y el texto de su mejor fragmento."""
+    monkeypatch.setattr("src.config.settings.settings.CHUNK_SEARCH_FANOUT", 1)
+    db = LocalVectorDatabase(directory=str(tmp_path))
+    db.insert_insights([
+        make_chunked(0, [[0.0, 1.0], [1.0, 0.1], [1.0, 0.0]]),
+        make_insight(1, [1.0, 0.5]),
+        make_chunked(2, [[0.0, 1.0], [1.0, 1.0]]),
+    ])
+    assert db.count == 6
+
+    results = db.search_insights([1.0, 0.0], threshold=0.0, count=3)
+    assert [r.url for r in results] == ["https://x/0", "https://x/1", "https://x/2"]
+    assert results[0].content == "parte2" and results[2].content == "parte1"
+    assert results[0].id == 1
+
+    reopened = LocalVectorDatabase(directory=str(tmp_path))
+    assert [i.url for i in reopened.list_insights()] == ["https://x/0", "https://x/1", "https://x/2"]
+    assert reopened.get_insight("https://x/0").content == "parte0 parte1 parte2"
+
+def test_update_with_different_chunk_count_replaces_rows(tmp_path):
+    """Si cambia el número de fragmentos las filas viejas dejan de aparecer en la búsqueda."""
+    db = LocalVectorDatabase(directory=str(tmp_path))
+    db.insert_insights([make_chunked(0, [[1.0, 0.0], [0.9, 0.1]]), make_insight(1, [0.0, 1.0])])
+
+    assert db.update_insights([make_chunked(0, [[0.0, 1.0], [0.1, 0.9], [0.2, 0.8]])]).updated == 1
+    reopened = LocalVectorDatabase(directory=str(tmp_path))
+    assert reopened.search_insights([1.0, 0.0], threshold=0.5, count=5) == []
+    assert sorted(r.url for r in reopened.search_insights([0.0, 1.0], threshold=0.5, count=5)) == ["https://x/0", "https://x/1"]
+    assert [i.url for i in reopened.list_insights()] == ["https://x/1", "https://x/0"]
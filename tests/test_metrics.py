@@ -0,0 +1,52 @@
+import sys
+import os
+import asyncio
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.infrastructure.metrics import MetricsRegistry
+
+def test_run_breakdown_collects_spans_across_threads():
+    """Los spans de asyncio.to_thread cuentan en el desglose de la ejecución; los errores quedan marcados."""
+    registry = MetricsRegistry()
+
+    def stage():
+        with registry.span("stage.embed", service="fake"):
+            registry.inc("cache.hits", 2, cache="embeddings")
+
+    async def main():
+        await asyncio.gather(asyncio.to_thread(stage), asyncio.to_thread(stage))
+
+    with registry.run("ingestion"):
+        asyncio.run(main())
+        with pytest.raises(ValueError):
+            with registry.span("stage.write"):
+                raise ValueError("boom")
+
+    breakdown = registry.last_run("ingestion").breakdown()
+    assert breakdown["spans"]["stage.embed"]["count"] == 2
+    assert breakdown["spans"]["stage.write"]["errors"] == 1
+    assert breakdown["counters"] == {'cache.hits{cache="embeddings"}': 4}
+
+    # Fuera de una ejecución solo se acumula en el registro global
+    with registry.span("stage.embed", service="fake"):
+        pass
+    spans = {s["name"]: s for s in registry.snapshot()["spans"]}
+    assert spans["stage.embed"]["count"] == 3 and registry.last_run("ingestion").spans["stage.embed"].count == 2
+
+def test_prometheus_declares_each_metric_once():
+    """El formato texto de Prometheus declara cada métrica una vez aunque tenga varias etiquetas."""
+    registry = MetricsRegistry()
+    registry.inc("cache.hits", cache="search")
+    registry.inc("cache.hits", cache="reports")
+    registry.observe("supabase.upsert_rows", 100)
+    with registry.span("search.vector"):
+        pass
+
+    text = registry.to_prometheus()
+    assert text.count("# TYPE newsrag_cache_hits_total counter") == 1
+    assert 'newsrag_cache_hits_total{cache="reports"} 1' in text
+    assert 'newsrag_span_seconds_count{span="search.vector"} 1' in text
+    assert "newsrag_supabase_upsert_rows_sum 100" in text
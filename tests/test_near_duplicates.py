@@ -0,0 +1,52 @@
+import sys
+import os
+import random
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.infrastructure.api_client import DataProvider
+from src.infrastructure.near_duplicates import NearDuplicateIndex, hamming, simhash
+from test_pipeline import FakeGuardian, make_article, make_pipeline
+
+def body(seed, words=200):
+    rng = random.Random(seed)
+    return " ".join(f"term{rng.randrange(500)}" for _ in range(words))
+
+def test_simhash_is_close_for_edits_and_far_for_other_texts():
+    """Una edición menor cambia pocos bits; un texto distinto, alrededor de la mitad."""
+    original = body(1)
+    edited = original + " Updated with new figures."
+    assert hamming(simhash(original), simhash(edited)) <= 3
+    assert hamming(simhash(original), simhash(body(2))) > 16
+    assert simhash("texto corto") is None
+
+def test_index_links_duplicates_to_canonical(tmp_path):
+    """El primero visto es el canónico; los casi-duplicados quedan enlazados y persisten al reabrir."""
+    path = str(tmp_path / "near_dup.sqlite3")
+    index = NearDuplicateIndex(path, max_distance=3)
+    original = body(1)
+    assert index.assign_many([("u/1", original), ("u/2", original + " Live update."), ("u/3", body(2))]) == [None, "u/1", None]
+    # Idempotente por URL: volver a ver la canónica no la marca como duplicado de nadie
+    assert index.assign_many([("u/1", original), ("u/2", "")]) == [None, "u/1"]
+
+    reopened = NearDuplicateIndex(path, max_distance=2)
+    assert reopened.canonical("u/2") == "u/1"
+    assert reopened.duplicates_of("u/1") == ["u/2"]
+    # Con otro umbral cambian las bandas, pero las firmas guardadas siguen encontrándose
+    assert reopened.assign_many([("u/4", original + " Second update.")]) == ["u/1"]
+
+def test_pipeline_skips_near_duplicates_before_embedding(tmp_path, monkeypatch):
+    """Un republicado con otra URL no se vectoriza, no se guarda ni entra al resumen."""
+    articles = [make_article(i, f"2026-01-01T1{i}:00:00Z") for i in range(3)]
+    articles[0]["content"] = body(1)
+    articles[1]["content"] = body(1) + " Updated with the latest figures."
+    articles[2]["content"] = body(2)
+    monkeypatch.setattr(DataProvider, "iter_articles", FakeGuardian(articles))
+    pipeline, emb = make_pipeline(tmp_path)
+
+    summary, news = pipeline.run()
+    assert sorted(n["title"] for n in news) == ["Noticia 0", "Noticia 2"]
+    assert summary == "Resumen de 2 noticias"
+    assert len(emb.texts) == 2 and pipeline.database.count == 2
+    assert pipeline.near_duplicate_index.canonical("https://g/1") == "https://g/0"
@@ -0,0 +1,368 @@
+import sys
+import os
+import pytest
+from datetime import datetime, timezone
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.domain.interfaces import EmbeddingService, LLMService
+from src.infrastructure.api_client import DataProvider
+from src.infrastructure.local_vector_db import LocalVectorDatabase
+from src.infrastructure.state_store import StateStore
+from src.infrastructure.url_filter import UrlSeenFilter
+from src.infrastructure.kv_cache import SqliteKVCache
+from src.infrastructure.lexical_index import LexicalIndex
+from src.infrastructure.near_duplicates import NearDuplicateIndex
+from src.infrastructure.recent_articles import RecentArticleStore
+from src.application.pipeline import IngestionPipeline, SearchPipeline
+from src.application.query_cache import QueryResultCache
+
+def make_article(i, modified):
+    return {
+        "title": f"Noticia {i}",
+        "content": f"Contenido de la noticia {i}",
+        "category": "Technology",
+        "url": f"https://g/{i}",
+        "published_at": modified,
+        "last_modified": modified,
+    }
+
+class FakeEmbeddingService(EmbeddingService):
+    def __init__(self):
+        self.texts = []
+
+    def generate_embedding(self, text, task_type="RETRIEVAL_DOCUMENT"):
+        self.texts.append(text)
+        return [float(len(text)), 1.0]
+
+class FakeLLMService(LLMService):
+    def __init__(self):
+        self.summarized = []
+        self.reports = 0
+
+    def generate_summary(self, texts):
+        self.reports += 1
+        return f"Resumen de {len(texts)} noticias"
+
+    def summarize_article(self, title, content):
+        self.summarized.append(title)
+        return f"Resumen de {title}"
+
+    def explain_relevance(self, query, insights):
+        return ["relevante"] * len(insights)
+
+class FakeGuardian:
+    """Sustituye a DataProvider.iter_articles y registra el `since` de cada llamada."""
+    def __init__(self, articles):
+        self.articles = articles
+        self.calls = []
+
+    def __call__(self, since=None, on_error=None):
+        self.calls.append(since)
+        for art in self.articles:
+            ts = datetime.fromisoformat(art["last_modified"])
+            if since is None or ts >= since:
+                yield art
+
+def make_pipeline(tmp_path):
+    emb = FakeEmbeddingService()
+    db = LocalVectorDatabase(directory=str(tmp_path / "index"))
+    state = StateStore(path=str(tmp_path / "state.json"))
+    url_filter = UrlSeenFilter(path=str(tmp_path / "urls.bloom"), capacity=1000)
+    summary_cache = SqliteKVCache(str(tmp_path / "kv.sqlite3"), "article_summaries")
+    report_cache = SqliteKVCache(str(tmp_path / "kv.sqlite3"), "reports", ttl_seconds=60)
+    return IngestionPipeline(emb, db, FakeLLMService(), state_store=state, url_filter=url_filter,
+                             summary_cache=summary_cache, report_cache=report_cache,
+                             lexical_index=LexicalIndex(str(tmp_path / "lexical.sqlite3")),
+                             near_duplicate_index=NearDuplicateIndex(str(tmp_path / "near_dup.sqlite3")),
+                             recent_articles=RecentArticleStore(str(tmp_path / "recent.sqlite3"))), emb
+
+def test_watermark_limits_next_run(tmp_path, monkeypatch):
+    """La segunda ejecución solo pide desde la marca de agua y no re-procesa lo ya ingerido."""
+    guardian = FakeGuardian([make_article(1, "2026-01-01T10:00:00Z"), make_article(2, "2026-01-01T12:00:00Z")])
+    monkeypatch.setattr(DataProvider, "iter_articles", guardian)
+    pipeline, emb = make_pipeline(tmp_path)
+
+    summary, news = pipeline.run()
+    assert summary == "Resumen de 2 noticias"
+    assert len(emb.texts) == 2
+    assert guardian.calls == [None]
+
+    guardian.articles.append(make_article(3, "2026-01-01T15:00:00Z"))
+    summary, news = pipeline.run()
+    assert guardian.calls[1] == datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    # La noticia 2 entra por el solape pero ya existe: solo se vectoriza la 3
+    assert len(emb.texts) == 3
+    # El informe cubre toda la ventana reciente, no solo lo traído en esta ejecución
+    assert summary == "Resumen de 3 noticias"
+    assert [n["title"] for n in news] == ["Noticia 3", "Noticia 2", "Noticia 1"]
+
+    # Sin novedades se repite el mismo informe (desde la caché), no un "no hay noticias"
+    reports = pipeline.llm_service.reports
+    summary, news = pipeline.run()
+    assert summary == "Resumen de 3 noticias" and len(news) == 3
+    assert pipeline.llm_service.reports == reports
+
+def test_write_error_propagates_without_advancing_watermark(tmp_path, monkeypatch):
+    """Si una etapa falla, run() lanza el error y la marca de agua no avanza."""
+    guardian = FakeGuardian([make_article(i, f"2026-01-01T1{i}:00:00Z") for i in range(3)])
+    monkeypatch.setattr(DataProvider, "iter_articles", guardian)
+    pipeline, _ = make_pipeline(tmp_path)
+
+    def broken_insert(insights):
+        raise RuntimeError("payload too large")
+    monkeypatch.setattr(pipeline.database, "insert_insights", broken_insert)
+
+    with pytest.raises(RuntimeError, match="payload too large"):
+        pipeline.run()
+    assert pipeline.state_store.get(IngestionPipeline.WATERMARK_KEY) is None
+
+def test_failing_article_holds_watermark_until_given_up(tmp_path, monkeypatch):
+    """Una noticia que nunca se vectoriza retiene la marca de agua justo antes de ella y, tras
+    INGEST_MAX_ITEM_ATTEMPTS ejecuciones, deja de frenar la ingesta; los cuerpos vacíos ni se intentan."""
+    monkeypatch.setattr("src.config.settings.settings.INGEST_MAX_ITEM_ATTEMPTS", 2)
+    articles = [make_article(i, f"2026-01-01T1{i}:00:00Z") for i in range(4)]
+    articles[1]["content"] = "rota"
+    articles[3]["content"] = "   "
+    monkeypatch.setattr(DataProvider, "iter_articles", FakeGuardian(articles))
+    pipeline, emb = make_pipeline(tmp_path)
+    embed = emb.generate_embedding
+    def flaky(text, task_type="RETRIEVAL_DOCUMENT"):
+        if text == "rota":
+            raise RuntimeError("400 INVALID_ARGUMENT")
+        return embed(text, task_type)
+    monkeypatch.setattr(emb, "generate_embedding", flaky)
+    watermark = lambda: pipeline.state_store.get(IngestionPipeline.WATERMARK_KEY)
+
+    pipeline.run()
+    assert watermark() == "2026-01-01T10:59:59+00:00"
+    assert pipeline.database.count == 2
+    assert "   " not in emb.texts
+
+    pipeline.run()
+    assert watermark() == "2026-01-01T12:00:00+00:00"
+    assert pipeline.state_store.get(IngestionPipeline.FAILED_URLS_KEY) == {"https://g/1": 2}
+
+def test_url_filter_skips_db_for_new_urls(tmp_path, monkeypatch):
+    """Solo las URLs que el filtro marca como "quizás vistas" se consultan a la base de datos."""
+    guardian = FakeGuardian([make_article(i, "2026-01-01T10:00:00Z") for i in range(3)])
+    monkeypatch.setattr(DataProvider, "iter_articles", guardian)
+    monkeypatch.setattr("src.config.settings.settings.INCREMENTAL_INGESTION", False)
+    pipeline, emb = make_pipeline(tmp_path)
+
+    asked = []
+    original = pipeline.database.get_content_hashes
+    def spy(urls):
+        asked.extend(urls)
+        return original(urls)
+    monkeypatch.setattr(pipeline.database, "get_content_hashes", spy)
+
+    pipeline.run()
+    # Primera ejecución: el filtro está vacío, así que no hace falta preguntar nada
+    assert [u for u in asked if u.startswith("https://g/")] == []
+
+    guardian.articles.append(make_article(3, "2026-01-01T11:00:00Z"))
+    pipeline.run()
+    assert sorted(u for u in asked if u.startswith("https://g/")) == ["https://g/0", "https://g/1", "https://g/2"]
+    assert len(emb.texts) == 4
+
+def test_search_cache_is_invalidated_by_ingestion(tmp_path, monkeypatch):
+    """Una búsqueda repetida sale de la caché hasta que la ingesta inserta filas nuevas."""
+    guardian = FakeGuardian([make_article(1, "2026-01-01T10:00:00Z")])
+    monkeypatch.setattr(DataProvider, "iter_articles", guardian)
+    ingest, emb = make_pipeline(tmp_path)
+    ingest.run()
+
+    cache = QueryResultCache(version_provider=ingest.corpus_version)
+    search = SearchPipeline(emb, ingest.database, FakeLLMService(), cache=cache)
+    first = search.search("Noticia 1", threshold=-1.0)
+    calls = len(emb.texts)
+
+    first[0].relevance = "modificado por quien llama"
+    again = search.search("  noticia 1 ", threshold=-1.0)
+    assert len(emb.texts) == calls
+    assert again[0].relevance == "relevante"
+
+    guardian.articles.append(make_article(2, "2026-01-01T11:00:00Z"))
+    ingest.run()
+    calls = len(emb.texts)
+    assert len(search.search("Noticia 1", threshold=-1.0)) == 2
+    assert len(emb.texts) == calls + 1
+
+def test_article_summaries_are_cached(tmp_path, monkeypatch):
+    """El resumen "map" de cada artículo se reutiliza si su contenido no cambió."""
+    monkeypatch.setattr("src.config.settings.settings.INCREMENTAL_INGESTION", False)
+    monkeypatch.setattr("src.config.settings.settings.SUMMARY_MODE", "map_reduce")
+    guardian = FakeGuardian([make_article(1, "2026-01-01T10:00:00Z"), make_article(2, "2026-01-01T12:00:00Z")])
+    monkeypatch.setattr(DataProvider, "iter_articles", guardian)
+    pipeline, _ = make_pipeline(tmp_path)
+
+    summary, _ = pipeline.run()
+    assert summary == "Resumen de 2 noticias"
+    assert len(pipeline.llm_service.summarized) == 2
+
+    # Un artículo nuevo cambia el informe, pero solo ese artículo pasa por el "map"
+    guardian.articles.append(make_article(3, "2026-01-01T13:00:00Z"))
+    summary, _ = pipeline.run()
+    assert summary == "Resumen de 3 noticias"
+    assert len(pipeline.llm_service.summarized) == 3
+
+def test_identical_article_set_reuses_report(tmp_path, monkeypatch):
+    """Repetir la ejecución con los mismos artículos sirve el informe desde la caché sin llamar al LLM."""
+    monkeypatch.setattr("src.config.settings.settings.INCREMENTAL_INGESTION", False)
+    guardian = FakeGuardian([make_article(1, "2026-01-01T10:00:00Z"), make_article(2, "2026-01-01T12:00:00Z")])
+    monkeypatch.setattr(DataProvider, "iter_articles", guardian)
+    pipeline, _ = make_pipeline(tmp_path)
+
+    first = pipeline.run_report()
+    second = pipeline.run_report()
+    assert not first.from_cache and second.from_cache
+    assert second.summary == first.summary
+    assert pipeline.llm_service.reports == 1
+
+def test_summary_chunks_are_streamed_to_callback(tmp_path, monkeypatch):
+    """Con on_summary_chunk el resumen llega por fragmentos y el informe final los concatena."""
+    monkeypatch.setattr("src.config.settings.settings.INCREMENTAL_INGESTION", False)
+    monkeypatch.setattr(DataProvider, "iter_articles", FakeGuardian([make_article(1, "2026-01-01T10:00:00Z")]))
+    pipeline, _ = make_pipeline(tmp_path)
+
+    chunks = []
+    report = pipeline.run_report(on_summary_chunk=chunks.append)
+    assert "".join(chunks) == report.summary == "Resumen de 1 noticias"
+
+    # Desde la caché el informe completo llega como un único fragmento
+    chunks.clear()
+    report = pipeline.run_report(on_summary_chunk=chunks.append)
+    assert report.from_cache and chunks == [report.summary]
+
+class CountingLLMService(FakeLLMService):
+    def __init__(self):
+        super().__init__()
+        self.explained = []
+
+    def explain_relevance(self, query, insights):
+        self.explained.append(len(insights))
+        return [f"explicación de {i.title}" for i in insights]
+
+def test_lazy_search_defers_explanations(tmp_path, monkeypatch):
+    """Con explain=False la búsqueda no llama al LLM; las explicaciones se piden aparte y quedan cacheadas."""
+    monkeypatch.setattr(DataProvider, "iter_articles", FakeGuardian([make_article(1, "2026-01-01T10:00:00Z"), make_article(2, "2026-01-01T11:00:00Z")]))
+    ingest, emb = make_pipeline(tmp_path)
+    ingest.run()
+
+    llm = CountingLLMService()
+    search = SearchPipeline(emb, ingest.database, llm)
+    results = search.search("Noticia", threshold=-1.0, explain=False)
+    assert llm.explained == [] and all(r.relevance is None for r in results)
+
+    # Bajo demanda: una sola tarjeta
+    assert search.explain("Noticia", results[0]) == f"explicación de {results[0].title}"
+    assert search.fill_explanations("noticia ", results) == [1]
+
+    # En segundo plano: solo se pide lo que falta, en una única llamada
+    search.explain_in_background("Noticia", results).result()
+    assert llm.explained == [1, 1]
+    again = search.search("Noticia", threshold=-1.0, explain=False)
+    assert [r.relevance for r in again] == [f"explicación de {r.title}" for r in again]
+    assert search.explain_in_background("Noticia", again) is None
+
+class FailingQueryEmbeddings(FakeEmbeddingService):
+    def generate_embedding(self, text, task_type="RETRIEVAL_DOCUMENT"):
+        if task_type == "RETRIEVAL_QUERY":
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+        return super().generate_embedding(text, task_type)
+
+def test_hybrid_search_falls_back_to_lexical(tmp_path, monkeypatch):
+    """Si el embedding de la consulta falla, el modo híbrido responde con el índice BM25 que llenó la ingesta."""
+    monkeypatch.setattr("src.config.settings.settings.SEARCH_MODE", "hybrid")
+    articles = [make_article(1, "2026-01-01T10:00:00Z"), make_article(2, "2026-01-01T11:00:00Z")]
+    articles[1]["content"] = "Nvidia (NVDA) supera previsiones"
+    monkeypatch.setattr(DataProvider, "iter_articles", FakeGuardian(articles))
+    ingest, _ = make_pipeline(tmp_path)
+    ingest.run()
+    assert ingest.lexical_index.count == 2
+
+    search = SearchPipeline(FailingQueryEmbeddings(), ingest.database, lexical_index=ingest.lexical_index)
+    results = search.search("nvda", threshold=-1.0)
+    assert [r.url for r in results] == ["https://g/2"]
+    # El id de la base viaja al índice léxico en la escritura
+    assert results[0].id == ingest.database.get_insight("https://g/2").id
+    # El resultado degradado no se cachea
+    assert search.cache.hits == 0 and len(search.cache._entries) == 0
+
+def test_hybrid_search_drops_weak_lexical_only_hits(tmp_path, monkeypatch):
+    """Un acierto BM25 que cubre poco de la consulta y que la búsqueda vectorial no vio no entra a la fusión."""
+    monkeypatch.setattr("src.config.settings.settings.SEARCH_MODE", "hybrid")
+    articles = [make_article(1, "2026-01-01T10:00:00Z"), make_article(2, "2026-01-01T11:00:00Z")]
+    articles[1]["content"] = "Nvidia (NVDA) supera previsiones"
+    monkeypatch.setattr(DataProvider, "iter_articles", FakeGuardian(articles))
+    ingest, emb = make_pipeline(tmp_path)
+    ingest.run()
+
+    search = SearchPipeline(emb, ingest.database, lexical_index=ingest.lexical_index)
+    # Con un threshold inalcanzable la búsqueda vectorial no devuelve nada
+    assert search.search("nvda previsiones", threshold=1.1, explain=False)[0].url == "https://g/2"
+    assert search.search("nvda aranceles acero europeo", threshold=1.1, explain=False) == []
+
+def test_edited_articles_are_reembedded_in_place(tmp_path, monkeypatch):
+    """Solo las noticias cuyo texto cambió se vuelven a vectorizar y sobrescriben su fila."""
+    guardian = FakeGuardian([make_article(i, "2026-01-01T10:00:00Z") for i in range(3)])
+    monkeypatch.setattr(DataProvider, "iter_articles", guardian)
+    monkeypatch.setattr("src.config.settings.settings.INCREMENTAL_INGESTION", False)
+    pipeline, emb = make_pipeline(tmp_path)
+    pipeline.run()
+    version = pipeline.corpus_version()
+
+    guardian.articles[1]["content"] = "Contenido corregido de la noticia 1"
+    emb.texts.clear()
+    pipeline.run()
+
+    assert emb.texts == ["Contenido corregido de la noticia 1"]
+    assert pipeline.database.count == 3
+    assert pipeline.database.get_insight("https://g/1").content == "Contenido corregido de la noticia 1"
+    assert pipeline.corpus_version() == version + 1
+    assert [r.url for r in pipeline.lexical_index.search("corregido")] == ["https://g/1"]
+
+def test_long_articles_are_chunked_and_found_once(tmp_path, monkeypatch):
+    """Un cuerpo largo se vectoriza por fragmentos acotados y la búsqueda devuelve el artículo una sola vez."""
+    long_article = make_article(1, "2026-01-01T10:00:00Z")
+    long_article["content"] = " ".join(f"Frase {i} sobre semiconductores y centros de datos." for i in range(20))
+    monkeypatch.setattr(DataProvider, "iter_articles", FakeGuardian([long_article, make_article(2, "2026-01-01T11:00:00Z")]))
+    monkeypatch.setattr("src.config.settings.settings.CHUNK_MAX_TOKENS", 40)
+    monkeypatch.setattr("src.config.settings.settings.CHUNK_OVERLAP_TOKENS", 8)
+    pipeline, emb = make_pipeline(tmp_path)
+    pipeline.run()
+
+    chunk_texts = emb.texts[:-1]
+    assert len(chunk_texts) > 1 and all(len(t) <= 40 * 4 for t in chunk_texts)
+    assert emb.texts[-1] == "Contenido de la noticia 2"
+    assert pipeline.database.count == len(emb.texts)
+    assert pipeline.database.get_insight("https://g/1").content == long_article["content"]
+
+    results = pipeline.database.search_insights([1.0, 0.0], threshold=0.0, count=5)
+    assert sorted(r.url for r in results) == ["https://g/1", "https://g/2"]
+
+def test_recent_window_drops_old_articles(tmp_path):
+    """La ventana del informe se ancla en la publicación más reciente y descarta lo anterior."""
+    store = RecentArticleStore(str(tmp_path / "recent.sqlite3"), window_days=3)
+    old, fresh = make_article(1, "2026-01-01T10:00:00Z"), make_article(2, "2026-01-05T10:00:00Z")
+    store.add_many((a, datetime.fromisoformat(a["published_at"])) for a in (old, fresh))
+    assert [a["title"] for a in store.window()] == ["Noticia 2"]
+
+def test_map_phase_batches_articles_per_prompt(tmp_path, monkeypatch):
+    """El "map" agrupa varios artículos por llamada en lugar de una llamada por artículo."""
+    monkeypatch.setattr("src.config.settings.settings.INCREMENTAL_INGESTION", False)
+    monkeypatch.setattr("src.config.settings.settings.SUMMARY_MODE", "map_reduce")
+    monkeypatch.setattr("src.config.settings.settings.SUMMARY_MAP_BATCH_SIZE", 2)
+    monkeypatch.setattr(DataProvider, "iter_articles", FakeGuardian([make_article(i, "2026-01-01T10:00:00Z") for i in range(5)]))
+    pipeline, _ = make_pipeline(tmp_path)
+    batches = []
+    def summarize_articles(articles):
+        batches.append(len(articles))
+        return [f"Resumen de {title}" for title, _ in articles]
+    monkeypatch.setattr(pipeline.llm_service, "summarize_articles", summarize_articles)
+
+    summary, _ = pipeline.run()
+    assert summary == "Resumen de 5 noticias"
+    assert sorted(batches) == [1, 2, 2]
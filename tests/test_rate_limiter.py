@@ -0,0 +1,92 @@
+import sys
+import os
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.infrastructure.rate_limiter import AdaptiveRateLimiter, RateLimitError, TokenBucket, parse_retry_after
+
+def test_parse_retry_after_from_gemini_message():
+    """Reconoce el retryDelay de Gemini y el texto 'retry in'."""
+    assert parse_retry_after(Exception("429 RESOURCE_EXHAUSTED ... 'retryDelay': '17s'")) == 17.0
+    assert parse_retry_after(Exception("Quota exceeded. Please retry in 2.5s.")) == 2.5
+    assert parse_retry_after(Exception("500 INTERNAL")) is None
+
+def test_throttle_halves_concurrency_and_honors_retry_after(monkeypatch):
+    """Un 429 reduce la concurrencia a la mitad y la espera usa el retry-after indicado."""
+    sleeps = []
+    monkeypatch.setattr("time.sleep", sleeps.append)
+    limiter = AdaptiveRateLimiter("test", requests_per_minute=60000, tokens_per_minute=1e9, max_concurrency=8)
+
+    attempts = []
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RateLimitError("429 Please retry in 3s")
+        return "ok"
+
+    assert limiter.call(flaky, max_retries=3) == "ok"
+    assert 3.0 in sleeps
+    assert limiter.limit < 8 and limiter.throttled == 1
+
+    # Los éxitos recuperan la concurrencia de forma aditiva
+    for _ in range(40):
+        limiter.call(lambda: None)
+    assert limiter.limit == 8
+
+def test_non_rate_limit_errors_can_skip_retries(monkeypatch):
+    """Con retry_transient=False un error que no es de cuota se propaga al primer intento."""
+    monkeypatch.setattr("time.sleep", lambda _: None)
+    limiter = AdaptiveRateLimiter("test", requests_per_minute=60000, tokens_per_minute=1e9, max_concurrency=2)
+    calls = []
+    def broken():
+        calls.append(1)
+        raise ValueError("invalid input")
+    with pytest.raises(ValueError):
+        limiter.call(broken, max_retries=3, retry_transient=False)
+    assert len(calls) == 1
+
+def test_token_bucket_waits_for_refill(monkeypatch):
+    """Sin tokens disponibles la cubeta espera el tiempo justo de recarga."""
+    clock = [1000.0]
+    sleeps = []
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+    monkeypatch.setattr("time.monotonic", lambda: clock[0])
+    monkeypatch.setattr("time.sleep", fake_sleep)
+
+    bucket = TokenBucket(rate_per_minute=60)
+    bucket.acquire(60)
+    assert sleeps == []
+    bucket.acquire(30)
+    assert sum(sleeps) == pytest.approx(30.0)
+
+def test_stream_does_not_retry_after_first_chunk(monkeypatch):
+    """Un stream que falla antes de entregar texto se reintenta; a mitad de respuesta el error se propaga."""
+    monkeypatch.setattr("time.sleep", lambda _: None)
+    limiter = AdaptiveRateLimiter("test", requests_per_minute=60000, tokens_per_minute=1e9, max_concurrency=2)
+    attempts = []
+    def flaky_stream():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RateLimitError("429")
+        yield "a"
+        raise RuntimeError("corte")
+
+    received = []
+    with pytest.raises(RuntimeError):
+        for chunk in limiter.stream(flaky_stream, max_retries=3):
+            received.append(chunk)
+    assert received == ["a"] and len(attempts) == 2
+
+def test_final_rate_limit_failure_still_backs_off(monkeypatch):
+    """Si el último intento también es un 429, el limitador reduce la concurrencia antes de propagarlo."""
+    monkeypatch.setattr("time.sleep", lambda _: None)
+    limiter = AdaptiveRateLimiter("test", requests_per_minute=60000, tokens_per_minute=1e9, max_concurrency=8)
+    def exhausted():
+        raise RateLimitError("429 RESOURCE_EXHAUSTED")
+    with pytest.raises(RateLimitError):
+        limiter.call(exhausted, max_retries=2)
+    assert limiter.throttled == 2
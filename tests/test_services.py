@@ -0,0 +1,29 @@
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "benchmarks")))
+
+from src.application.services import ServiceRegistry
+from startup import measure
+
+def test_search_startup_does_not_import_sdks():
+    """Preparar el buscador no importa los SDKs ni construye el pipeline de ingesta."""
+    result = measure(runs=1)
+    assert result["heavy_modules"] == []
+    assert "search_pipeline" in result["built"] and "ingest_pipeline" not in result["built"]
+
+def test_services_are_built_once(tmp_path, monkeypatch):
+    """Accesos concurrentes comparten una única instancia; reset() obliga a reconstruirla."""
+    monkeypatch.setattr("src.config.settings.settings.INGEST_STATE_PATH", str(tmp_path / "state.json"))
+    registry = ServiceRegistry()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        stores = list(executor.map(lambda _: registry.state_store, range(32)))
+    assert all(store is stores[0] for store in stores)
+    assert registry.built() == ["state_store"]
+
+    registry.reset()
+    assert registry.built() == []
+    assert registry.state_store is not stores[0]
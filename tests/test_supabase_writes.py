@@ -0,0 +1,176 @@
+import sys
+import os
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.domain.entities import Insight
+from src.domain.hashing import content_hash
+from src.infrastructure.database import SupabaseDatabase
+
+class FakeTable:
+    """Simula el upsert de PostgREST: omite URLs existentes y falla una vez en el tramo indicado."""
+    def __init__(self, existing, fail_once_on=None, hash_column=True):
+        self.existing = set(existing)
+        self.fail_once_on = fail_once_on
+        self.hash_column = hash_column
+        self.calls = []
+        self._rows = None
+
+    def upsert(self, rows, on_conflict, ignore_duplicates):
+        assert on_conflict == "url" and ignore_duplicates
+        self._rows = rows
+        return self
+
+    def execute(self):
+        self.calls.append(len(self._rows))
+        if self.fail_once_on is not None and len(self.calls) - 1 == self.fail_once_on:
+            self.fail_once_on = None
+            raise RuntimeError("timeout")
+        if not self.hash_column and "content_hash" in self._rows[0]:
+            raise RuntimeError("{'code': 'PGRST204', 'message': \"Could not find the 'content_hash' column of 'tech_insights' in the schema cache\"}")
+        inserted = [r for r in self._rows if r["url"] not in self.existing]
+        self.existing.update(r["url"] for r in inserted)
+        return SimpleNamespace(data=[{**r, "id": len(self.existing) - len(inserted) + k + 1} for k, r in enumerate(inserted)])
+
+def make_db(table, monkeypatch, max_rows=2):
+    monkeypatch.setattr("src.config.settings.settings.SUPABASE_UPSERT_MAX_ROWS", max_rows)
+    monkeypatch.setattr("time.sleep", lambda _: None)
+    db = SupabaseDatabase.__new__(SupabaseDatabase)
+    db.client = SimpleNamespace(table=lambda name: table)
+    db.table_name = "tech_insights"
+    db.chunks_table = ""
+    return db
+
+def insights(n):
+    return [Insight(title=f"T{i}", content="c", category="Tech", url=f"https://g/{i}", embedding=[0.1]) for i in range(n)]
+
+def test_upsert_in_chunks_reports_counts(monkeypatch):
+    """Cada tramo se envía por separado y el reporte suma insertadas y omitidas."""
+    table = FakeTable(existing={"https://g/1", "https://g/4"})
+    report = make_db(table, monkeypatch).upsert_insights(insights(5))
+    assert table.calls == [2, 2, 1]
+    assert (report.inserted, report.skipped, report.failed) == (3, 2, 0)
+
+def test_failed_chunk_is_retried_alone(monkeypatch):
+    """Un tramo que falla se reintenta sin reenviar los demás."""
+    table = FakeTable(existing=set(), fail_once_on=1)
+    report = make_db(table, monkeypatch).upsert_insights(insights(4))
+    assert table.calls == [2, 2, 2]
+    assert report.inserted == 4
+
+def test_missing_hash_column_is_dropped_and_retried(monkeypatch):
+    """Sin migrations/002 el tramo se reenvía sin content_hash y las escrituras siguientes ya no lo incluyen."""
+    table = FakeTable(existing=set(), hash_column=False)
+    db = make_db(table, monkeypatch)
+    report = db.upsert_insights(insights(3))
+    assert table.calls == [2, 2, 1]
+    assert (report.inserted, report.failed) == (3, 0)
+    assert db.content_hash_column is False and "content_hash" not in table._rows[0]
+
+class FakeChunkTable:
+    """Registra los fragmentos borrados e insertados por parent_id."""
+    def __init__(self):
+        self.deleted, self.inserted = [], []
+
+    def delete(self):
+        return self
+
+    def in_(self, column, ids):
+        self.deleted.extend(ids)
+        return self
+
+    def insert(self, rows):
+        self.inserted.extend(rows)
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=[])
+
+def test_chunks_are_written_only_for_inserted_urls(monkeypatch):
+    """Las URLs que el upsert omitió conservan sus fragmentos: solo se reescriben los de las filas insertadas."""
+    table, chunks = FakeTable(existing={"https://g/1"}), FakeChunkTable()
+    db = make_db(table, monkeypatch)
+    db.chunks_table = "tech_insight_chunks"
+    db.client = SimpleNamespace(table=lambda name: chunks if name == db.chunks_table else table)
+    written = insights(3)
+    db.upsert_insights(written)
+
+    assert [i.id for i in written] == [2, None, 3]
+    assert sorted(chunks.deleted) == [2, 3]
+    assert sorted(row["parent_id"] for row in chunks.inserted) == [2, 3]
+
+class FakeHashTable:
+    """Simula select/in_/update/eq sobre filas {url: {content, content_hash}}."""
+    def __init__(self, rows, hash_column=True):
+        self.rows = rows
+        self.hash_column = hash_column
+        self.content_reads = 0
+        self._query = None
+
+    def select(self, columns):
+        self._query = ("select", [c.strip() for c in columns.split(",")])
+        return self
+
+    def in_(self, column, urls):
+        self._urls = urls
+        return self
+
+    def update(self, values):
+        self._query = ("update", values)
+        return self
+
+    def eq(self, column, url):
+        self._urls = [url]
+        return self
+
+    def execute(self):
+        kind, arg = self._query
+        if kind == "update":
+            for url in self._urls:
+                self.rows[url].update(arg)
+            return SimpleNamespace(data=[])
+        if "content_hash" in arg and not self.hash_column:
+            raise RuntimeError("column tech_insights.content_hash does not exist")
+        self.content_reads += "content" in arg
+        return SimpleNamespace(data=[{"url": u, **{c: self.rows[u].get(c) for c in arg if c != "url"}} for u in self._urls if u in self.rows])
+
+def test_legacy_hashes_are_computed_once_and_stored(monkeypatch):
+    """El hash de una fila antigua se calcula de su texto una sola vez y queda guardado en la tabla."""
+    table = FakeHashTable({"https://g/1": {"content": "texto  viejo", "content_hash": None}, "https://g/2": {"content": "b", "content_hash": "h2"}})
+    db = make_db(table, monkeypatch)
+    first = db.get_content_hashes(["https://g/1", "https://g/2", "https://g/3"])
+    assert first == {"https://g/1": content_hash("texto viejo"), "https://g/2": "h2"}
+    assert table.rows["https://g/1"]["content_hash"] == content_hash("texto viejo")
+
+    assert db.get_content_hashes(["https://g/1", "https://g/2"]) == first
+    assert table.content_reads == 1
+
+def test_hashes_without_column_fall_back_to_content(monkeypatch):
+    """Sin la columna los hashes salen del texto y no se intenta guardarlos."""
+    table = FakeHashTable({"https://g/1": {"content": "a"}}, hash_column=False)
+    db = make_db(table, monkeypatch)
+    assert db.get_content_hashes(["https://g/1"]) == {"https://g/1": content_hash("a")}
+    assert db.content_hash_column is False and "content_hash" not in table.rows["https://g/1"]
+
+def test_chunk_search_returns_each_article_once(monkeypatch):
+    """Con tabla de fragmentos, cada artículo aparece una vez con su mejor fragmento."""
+    chunks = [
+        {"parent_id": 1, "title": "A", "content": "a2", "category": "Tech", "url": "https://g/a", "similarity": 0.9},
+        {"parent_id": 1, "title": "A", "content": "a1", "category": "Tech", "url": "https://g/a", "similarity": 0.8},
+        {"parent_id": 2, "title": "B", "content": "b1", "category": "Tech", "url": "https://g/b", "similarity": 0.7},
+        {"parent_id": 3, "title": "C", "content": "c1", "category": "Tech", "url": "https://g/c", "similarity": 0.6},
+    ]
+    calls = []
+    def rpc(name, params):
+        calls.append((name, params["match_count"]))
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=chunks))
+
+    monkeypatch.setattr("src.config.settings.settings.CHUNK_SEARCH_FANOUT", 4)
+    db = make_db(FakeTable(existing=set()), monkeypatch)
+    db.chunks_table = "tech_insight_chunks"
+    db.client = SimpleNamespace(rpc=rpc)
+    results = db.search_insights([0.1], threshold=0.5, count=2)
+    assert calls == [("match_insight_chunks", 8)]
+    assert [(r.id, r.content) for r in results] == [(1, "a2"), (2, "b1")]
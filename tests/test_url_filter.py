@@ -0,0 +1,47 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.infrastructure.url_filter import UrlSeenFilter
+
+def test_bloom_filter_membership_and_persistence(tmp_path):
+    """Las URLs añadidas siempre se reconocen (también tras reabrir) y la tasa de falsos positivos es baja."""
+    path = str(tmp_path / "urls.bloom")
+    seen = [f"https://www.theguardian.com/technology/{i}" for i in range(2000)]
+    url_filter = UrlSeenFilter(path=path, capacity=5000, error_rate=0.01)
+    assert not url_filter.loaded
+    url_filter.add_many(seen)
+
+    reopened = UrlSeenFilter(path=path, capacity=5000, error_rate=0.01)
+    assert reopened.loaded
+    assert all(url in reopened for url in seen)
+
+    unseen = [f"https://www.theguardian.com/business/{i}" for i in range(5000)]
+    false_positives = sum(url in reopened for url in unseen)
+    assert false_positives / len(unseen) < 0.03
+
+def test_changed_parameters_force_rebuild(tmp_path):
+    """Si cambia la capacidad configurada el archivo existente no se reutiliza."""
+    path = str(tmp_path / "urls.bloom")
+    UrlSeenFilter(path=path, capacity=100).add_many(["https://a"])
+    assert not UrlSeenFilter(path=path, capacity=10000).loaded
+
+def test_concurrent_writers_keep_each_others_urls(tmp_path):
+    """Dos procesos con el mismo archivo (UI y run-once) no se borran las URLs al guardar."""
+    path = str(tmp_path / "urls.bloom")
+    ui = UrlSeenFilter(path=path, capacity=1000)
+    ui.rebuild([])
+    cli = UrlSeenFilter(path=path, capacity=1000)
+
+    cli.add_many(["https://g/cli"])
+    ui.add_many(["https://g/ui"])
+    assert "https://g/cli" in ui
+
+    reopened = UrlSeenFilter(path=path, capacity=1000)
+    assert "https://g/cli" in reopened and "https://g/ui" in reopened
+    # Quien no escribió ve lo nuevo al refrescar (al inicio de cada ingesta)
+    assert "https://g/ui" not in cli
+    cli.refresh()
+    assert "https://g/ui" in cli